@@ -4,7 +4,7 @@ from typing import List
 from langchain_core.prompts import PromptTemplate
 
 from agents.AgentWrapper import AgentWrapper
-from llms import Llm
+from llms import Llm, SemanticCache
 from util import TableIndexer
 
 
@@ -53,23 +53,36 @@ class SmartLookUpAgent(AgentWrapper):
 
     DEFAULT_MAX_TOOL_ATTEMPTS = 2
 
+    # A template rather than a formatted string, so that semantic caches can match questions within it
+    DECOMPOSE_PROMPT = """
+            Break up the following question into multiple simple questions, each on its own line.
+            ===
+            {query}
+            """
+
     @staticmethod
     def look_up_database(agent: "SmartLookUpAgent", query: str) -> str:
         logging.info(f"\n*** search: {query}")
+
+        scope = ("look_up_database", id(agent.table))
+        if agent.semantic_cache is not None:
+            response = agent.semantic_cache.get(scope, query)
+            if response is not None:
+                logging.info(f"\n*** cached search response: {response}")
+                return response
+
         response = agent.table.query(query)
         logging.info(f"\n*** search response: {response}")
+
+        if agent.semantic_cache is not None:
+            agent.semantic_cache.put(scope, query, response)
         return response
 
     @staticmethod
     def decompose_question(agent: "SmartLookUpAgent", query: str) -> List[str]:
         logging.info(f"\n*** decompose: {query}")
 
-        prompt = f"""
-            Break up the following question into multiple simple questions, each on its own line.
-            ===
-            {query}
-            """
-        response = agent.llm.invoke(prompt)["content"]
+        response = agent.llm.invoke(agent.DECOMPOSE_PROMPT, arguments={"query": query})["content"]
 
         logging.info(response)
         return response.split("\n")
@@ -80,8 +93,14 @@ class SmartLookUpAgent(AgentWrapper):
             table: TableIndexer,
             prompt: str = DEFAULT_PROMPT,
             concise_final_answer: bool = True,
+            semantic_cache: SemanticCache = None,
             **kwargs
     ):
+        """
+        Args:
+            semantic_cache: Reuses the database look-ups of near-duplicate queries.  Set `Llm.semantic_cache` to also
+                reuse decompositions of near-duplicate questions.
+        """
 
         # Manipulate prompt template
         self.prompt = PromptTemplate.from_template(prompt or self.DEFAULT_PROMPT).partial(
@@ -117,5 +136,6 @@ class SmartLookUpAgent(AgentWrapper):
 
         # Data member initialization
         self.table: TableIndexer = table
+        self.semantic_cache = semantic_cache
 
 
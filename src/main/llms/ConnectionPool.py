@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import threading
+import time
+import weakref
+from typing import Any, Callable
+
+
+class ConnectionPool:
+    """
+    Inference clients shared across Llm instances, one per (provider, base_url, api_key).
+
+    Reusing clients keeps their HTTP connections alive, so only the first call to a provider pays for connection
+    and TLS setup.  Async clients hold connections bound to an event loop, so they are shared per event loop.
+    `Llm.run_coroutine()` runs every batch on one long-lived loop, so that its clients stay warm between batches.
+    Clients unused for longer than `idle_timeout` seconds are dropped, since servers close idle connections anyway.
+    """
+
+    DEFAULT_POOL_SIZE = 16
+    DEFAULT_IDLE_TIMEOUT = 90.0
+
+    pool_size = DEFAULT_POOL_SIZE
+    idle_timeout = DEFAULT_IDLE_TIMEOUT
+
+    __clients: dict[tuple, list] = {}     # key -> [client, last used]
+    __async_clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()   # event loop -> {key -> [client, last used]}
+    __lock = threading.Lock()
+    __http_configured = False
+
+    @classmethod
+    def configure(cls, pool_size: int = None, idle_timeout: float = None):
+        """
+        Args:
+            pool_size: Maximum number of keep-alive connections per host
+            idle_timeout: Seconds after which an unused client and its connections are dropped
+        """
+        with cls.__lock:
+            cls.pool_size = pool_size or cls.pool_size
+            cls.idle_timeout = idle_timeout or cls.idle_timeout
+            cls.__http_configured = False
+            cls.__clients.clear()
+
+    @classmethod
+    def __key_of(cls, kwargs: dict) -> tuple:
+        return tuple(sorted((k, repr(v)) for k, v in kwargs.items()))
+
+    @classmethod
+    def limits(cls) -> Any:
+        """Connection limits of the HTTP clients, with as many keep-alive connections as `pool_size`"""
+        httpx = cls.__httpx()
+        return httpx.Limits(max_connections=cls.pool_size, max_keepalive_connections=cls.pool_size)
+
+    @classmethod
+    def __httpx(cls) -> Any:
+        """The HTTP client package of huggingface_hub: httpx2 from version 2, httpx before"""
+        import huggingface_hub
+
+        if int(huggingface_hub.__version__.split(".")[0]) >= 2:
+            import httpx2
+            return httpx2
+
+        import httpx
+        return httpx
+
+    @classmethod
+    def __configure_http(cls):
+        if cls.__http_configured:
+            return
+        cls.__http_configured = True
+
+        import huggingface_hub
+
+        if hasattr(huggingface_hub, "set_client_factory"):
+            from huggingface_hub.utils import _http
+
+            httpx = cls.__httpx()
+
+            # Sync inference clients share one HTTP client.  Async ones each have their own.
+            huggingface_hub.set_client_factory(cls.__pooled(_http.default_client_factory, httpx.Client))
+            huggingface_hub.set_async_client_factory(
+                cls.__pooled(_http.default_async_client_factory, httpx.AsyncClient)
+            )
+
+        elif hasattr(huggingface_hub, "configure_http_backend"):
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            def session_factory() -> requests.Session:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=cls.pool_size, pool_maxsize=cls.pool_size)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                return session
+
+            huggingface_hub.configure_http_backend(backend_factory=session_factory)
+
+        else:
+            logging.warning(
+                f"huggingface_hub {huggingface_hub.__version__} has no known way to configure its HTTP clients.  "
+                f"The pool size {cls.pool_size} is not applied."
+            )
+
+    @classmethod
+    def __pooled(cls, default_factory: Callable[[], Any], client_class: type) -> Callable[[], Any]:
+        """
+        A factory of HTTP clients set up as the default ones of huggingface_hub, e.g., with its event hooks and
+        timeouts, but with `limits()`.  Limits are given to the transport of a client, so they cannot be changed on a
+        default client.
+        """
+        def factory() -> Any:
+            # The default client is never opened, so it holds no connection to close
+            default = default_factory()
+            return client_class(
+                limits=cls.limits(),
+                event_hooks=default.event_hooks,
+                timeout=default.timeout,
+                follow_redirects=default.follow_redirects,
+                headers=default.headers,
+                trust_env=default.trust_env,
+            )
+
+        return factory
+
+    @classmethod
+    def __evict_idle(cls, clients: dict, now: float) -> list:
+        idle = [k for k, (_, last_used) in clients.items() if now - last_used > cls.idle_timeout]
+        return [clients.pop(k)[0] for k in idle]
+
+    @classmethod
+    def get_client(cls, **kwargs) -> Any:
+        """A shared `InferenceClient` created with the given arguments."""
+        from huggingface_hub import InferenceClient
+
+        key = cls.__key_of(kwargs)
+        now = time.monotonic()
+
+        with cls.__lock:
+            cls.__configure_http()
+            cls.__evict_idle(cls.__clients, now)
+
+            entry = cls.__clients.get(key)
+            if entry is None:
+                entry = cls.__clients[key] = [InferenceClient(**kwargs), now]
+            entry[1] = now
+            return entry[0]
+
+    @classmethod
+    async def get_async_client(cls, **kwargs) -> Any:
+        """A shared `AsyncInferenceClient` for the running event loop, created with the given arguments."""
+        from huggingface_hub import AsyncInferenceClient
+
+        key = cls.__key_of(kwargs)
+        now = time.monotonic()
+
+        with cls.__lock:
+            clients = cls.__async_clients.setdefault(asyncio.get_running_loop(), {})
+            idle = cls.__evict_idle(clients, now)
+
+            entry = clients.get(key)
+            if entry is None:
+                entry = clients[key] = [AsyncInferenceClient(**kwargs), now]
+            entry[1] = now
+
+        for client in idle:
+            await client.close()
+
+        return entry[0]
+
+    @classmethod
+    async def aclose(cls):
+        """Close the async clients of the running event loop, and their connections"""
+        with cls.__lock:
+            clients = cls.__async_clients.pop(asyncio.get_running_loop(), {})
+
+        for client, _ in clients.values():
+            await client.close()
+
+    @classmethod
+    def clear(cls):
+        with cls.__lock:
+            cls.__clients.clear()
+            cls.__async_clients.clear()
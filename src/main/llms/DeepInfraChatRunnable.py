@@ -1,26 +1,56 @@
-from typing import Optional
+from typing import Optional, Iterator, AsyncIterator
 
-from huggingface_hub import InferenceClient
 from langchain.schema.runnable import Runnable
 from langchain_core.messages.utils import convert_to_openai_messages
 from langchain_core.runnables import RunnableConfig
 from langchain_core.runnables.utils import Input
 
+from llms.ConnectionPool import ConnectionPool
+
 
 class DeepInfraChatRunnable(Runnable):
 
     def __init__(self, model_name: str, api_url: str, api_key: str, **kwargs):
         self.model_name = model_name
 
-        self.client = InferenceClient(
-            base_url=api_url,
-            api_key=api_key,
-            **kwargs
-        )
+        # Clients are shared with other models of the same provider
+        self.client_args = dict(base_url=api_url, api_key=api_key, **kwargs)
+
+    @classmethod
+    def __openai_messages_of(cls, text: Input) -> list:
+        # A single string or message converts into a single message, not a list
+        messages = convert_to_openai_messages(text)
+        return [messages] if isinstance(messages, dict) else messages
+
+    @property
+    def client(self):
+        return ConnectionPool.get_client(**self.client_args)
 
     def invoke(self, text: Input, config: Optional[RunnableConfig] = None, **kwargs) -> str:
         # Convert the prompt into a chat completion format
-        messages = convert_to_openai_messages(text)
+        messages = self.__openai_messages_of(text)
         kwargs["model"] = self.model_name
         completion = self.client.chat_completion(messages=messages, **kwargs)
         return completion.choices[0].message["content"]
+
+    async def ainvoke(self, text: Input, config: Optional[RunnableConfig] = None, **kwargs) -> str:
+        messages = self.__openai_messages_of(text)
+        kwargs["model"] = self.model_name
+        client = await ConnectionPool.get_async_client(**self.client_args)
+        completion = await client.chat_completion(messages=messages, **kwargs)
+        return completion.choices[0].message["content"]
+
+    def stream(self, text: Input, config: Optional[RunnableConfig] = None, **kwargs) -> Iterator[str]:
+        messages = self.__openai_messages_of(text)
+        kwargs["model"] = self.model_name
+        for chunk in self.client.chat_completion(messages=messages, stream=True, **kwargs):
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    async def astream(self, text: Input, config: Optional[RunnableConfig] = None, **kwargs) -> AsyncIterator[str]:
+        messages = self.__openai_messages_of(text)
+        kwargs["model"] = self.model_name
+        client = await ConnectionPool.get_async_client(**self.client_args)
+        async for chunk in await client.chat_completion(messages=messages, stream=True, **kwargs):
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
@@ -6,29 +6,15 @@ from langchain_core.language_models import BaseLanguageModel
 from langchain_core.runnables import Runnable
 
 from llms.Llm import Llm
+from llms.ModelCatalog import ModelCatalog
 from llms.DeepInfraChatRunnable import DeepInfraChatRunnable
 from llms.RunnableToLLMAdapter import RunnableToLLMAdapter
 
 
 class DeepInfraLlm(Llm):
 
-    SUPPORTED_MODELS = [
-        "Sao10K/L3.3-70B-Euryale-v2.3",
-        "meta-llama/Llama-3.3-70B-Instruct",
-        "microsoft/WizardLM-2-8x22B",
-        "google/gemini-2.0-flash-001",
-        "deepseek-ai/DeepSeek-V3-0324",
-        "meta-llama/Llama-4-Maverick-17B-128E-Instruct-FP8",
-    ]
-
-    MODEL_ALIASES = {
-        "llama-4": "meta-llama/Llama-4-Maverick-17B-128E-Instruct-FP8",
-        "euryale": "Sao10K/L3.3-70B-Euryale-v2.3",
-        "llama-3": "meta-llama/Llama-3.3-70B-Instruct",
-        "wizardlm-2": "microsoft/WizardLM-2-8x22B",
-        "gemini-2": "google/gemini-2.0-flash-001",
-        "deepseek-v3": "deepseek-ai/DeepSeek-V3-0324",
-    }
+    SUPPORTED_MODELS = ModelCatalog.SUPPORTED_MODELS["DeepInfraLlm"]
+    MODEL_ALIASES = ModelCatalog.MODEL_ALIASES["DeepInfraLlm"]
 
     __MODEL_TOKEN_LIMITS = {
         "Sao10K/L3.3-70B-Euryale-v2.3": 131_072,
@@ -40,7 +26,7 @@ class DeepInfraLlm(Llm):
 
     __API_URL = "https://api.deepinfra.com/v1/openai/chat/completions"
 
-    def __init__(self, model_name: str = "llama-2", model_key: str = None, **kwargs):
+    def __init__(self, model_name: str = "llama-2", model_key: str = None, base_url: str = None, **kwargs):
         self.model_name = model_name
         self.role_names = ["system", "user", "assistant"]
 
@@ -59,7 +45,7 @@ class DeepInfraLlm(Llm):
         self.llm = DeepInfraChatRunnable(
             model_name=self.model_name,
             api_key=self.model_key,
-            api_url=self.__API_URL,
+            api_url=base_url or self.__API_URL,
         )
 
         super().__init__(llm=self.llm)
@@ -8,21 +8,15 @@ from langchain_core.messages import AIMessage
 from langchain_core.runnables import Runnable
 
 from llms.Llm import Llm
+from llms.ModelCatalog import ModelCatalog
 from llms.HuggingFaceChatRunnable import HuggingFaceChatRunnable
 from llms.RunnableToLLMAdapter import RunnableToLLMAdapter
 
 
 class DeepSeekLlm(Llm):
 
-    SUPPORTED_MODELS = [
-        "deepseek-ai/DeepSeek-R1",
-        "deepseek-ai/DeepSeek-R1-Distill-Qwen-32B",
-    ]
-
-    MODEL_ALIASES = {
-        "deepseek": "deepseek-ai/DeepSeek-R1",
-        "deepseek-gwen": "deepseek-ai/DeepSeek-R1-Distill-Qwen-32B",
-    }
+    SUPPORTED_MODELS = ModelCatalog.SUPPORTED_MODELS["DeepSeekLlm"]
+    MODEL_ALIASES = ModelCatalog.MODEL_ALIASES["DeepSeekLlm"]
 
     __MODEL_TOKEN_LIMITS = {
         "deepseek-ai/DeepSeek-R1": 8000,
@@ -31,7 +25,87 @@ class DeepSeekLlm(Llm):
 
     __URL_PREFIX = "https://huggingface.co/"
 
-    def __init__(self, model_name: str = "deepseek", model_key: str = None, **kwargs):
+    class ThinkTagParser(Llm.StreamParser):
+        """Separates the reasoning in <think>...</think> from the answer while the response streams in."""
+
+        OPEN_TAG = "<think>"
+        CLOSE_TAG = "</think>"
+
+        def __init__(self):
+            self.buffer = ""
+            self.state = "start"    # start -> thought -> content, or start -> undecided -> content
+            self.started = set()
+            self.released = ""      # Content released while undecided, a thought if a closing tag follows
+
+        def __delta(self, kind: str, text: str) -> List[dict]:
+            # Like clean_up_response(), leading spaces of the thought and the content are removed
+            if kind not in self.started:
+                text = text.lstrip()
+            if not text:
+                return []
+            self.started.add(kind)
+            return [{kind: text}]
+
+        def feed(self, chunk: Any) -> List[dict]:
+            self.buffer += self.text_of(chunk) or ""
+            deltas = []
+
+            if self.state == "start":
+                head = self.buffer.lstrip()
+                if self.OPEN_TAG.startswith(head):
+                    return deltas   # Cannot tell yet if the response starts with a thought
+                elif head.startswith(self.OPEN_TAG):
+                    self.state = "thought"
+                    self.buffer = head[len(self.OPEN_TAG):]
+                else:
+                    # Without an opening tag, the text is a thought only if a closing tag follows.  It is released
+                    # as content meanwhile, and reclassified if the tag comes.
+                    self.state = "undecided"
+
+            if self.state == "thought":
+                thought, closed, rest = self.buffer.partition(self.CLOSE_TAG)
+                if closed:
+                    deltas += self.__delta("thought", thought.rstrip())
+                    self.state = "content"
+                    self.buffer = rest
+                else:
+                    thought, held = self.hold_back(self.buffer, self.CLOSE_TAG)
+                    self.buffer = thought[len(thought.rstrip()):] + held    # Trailing spaces may precede the tag
+                    deltas += self.__delta("thought", thought.rstrip())
+
+            elif self.state == "undecided":
+                thought, closed, rest = self.buffer.partition(self.CLOSE_TAG)
+                if closed:
+                    thought = (self.released + thought).strip()
+                    if self.released:
+                        deltas.append({"thought": thought, "reset_content": True})
+                    elif thought:
+                        deltas.append({"thought": thought})
+                    self.started = {"thought"}
+                    self.state = "content"
+                    self.buffer = rest
+                else:
+                    content, self.buffer = self.hold_back(self.buffer, self.CLOSE_TAG)
+                    released = self.__delta("content", content)
+                    self.released += "".join(d["content"] for d in released)
+                    deltas += released
+
+            if self.state == "content":
+                deltas += self.__delta("content", self.buffer)
+                self.buffer = ""
+
+            return deltas
+
+        def close(self) -> List[dict]:
+            if self.state == "thought":
+                return self.__delta("thought", self.buffer.rstrip())
+            elif self.state == "undecided":
+                return self.__delta("content", self.buffer)
+            elif self.state == "start" and self.buffer:
+                return [{"content": self.buffer}]
+            return []
+
+    def __init__(self, model_name: str = "deepseek", model_key: str = None, base_url: str = None, **kwargs):
         self.model_name = model_name
         self.role_names = ["system", "user", "assistant"]
 
@@ -50,13 +124,14 @@ class DeepSeekLlm(Llm):
         self.llm = HuggingFaceChatRunnable(
             model_name=self.model_name,
             api_key=self.model_key,
+            base_url=base_url,
         )
 
         super().__init__(llm=self.llm)
 
     @classmethod
     def __separate_think_tag(self, text: str) -> Tuple[str, str]:
-        match = re.search(r"(<think>)?(.*?)</think>(.*)", text, re.DOTALL)
+        match = re.search(r"^\s*(<think>)?(.*?)</think>(.*)", text, re.DOTALL)
         return (match.group(2).strip(), match.group(3).strip()) if match else ("", text)
 
     def clean_up_response(self, response: Any) -> dict:
@@ -80,6 +155,9 @@ class DeepSeekLlm(Llm):
             "metadata": metadata,
         }
 
+    def get_stream_parser(self) -> Llm.StreamParser:
+        return self.ThinkTagParser()
+
     def get_max_tokens(self) -> int:
         limit = self.__MODEL_TOKEN_LIMITS.get(self.model_name, 4000)
         return limit
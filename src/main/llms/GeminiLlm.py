@@ -8,20 +8,12 @@ from langchain_core.runnables import Runnable
 from langchain_google_genai import ChatGoogleGenerativeAI
 
 from llms.Llm import Llm
+from llms.ModelCatalog import ModelCatalog
 
 
 class GeminiLlm(Llm):
-    SUPPORTED_MODELS = [
-        "gemini-2.5-pro-exp-03-25",
-        "gemini-2.0-flash",
-        "gemini-2.0-flash-thinking-exp-01-21",
-    ]
-
-    MODEL_ALIASES = {
-        "gemini-2.5": "gemini-2.5-pro-exp-03-25",
-        "gemini-2": "gemini-2.0-flash",
-        "gemini-2t": "gemini-2.0-flash-thinking-exp-01-21"
-    }
+    SUPPORTED_MODELS = ModelCatalog.SUPPORTED_MODELS["GeminiLlm"]
+    MODEL_ALIASES = ModelCatalog.MODEL_ALIASES["GeminiLlm"]
 
     __MODEL_TOKEN_LIMITS = {
         "gemini-2.5-pro-exp-03-25": 1_048_576,
@@ -29,7 +21,7 @@ class GeminiLlm(Llm):
         "gemini-2.0-flash-thinking-exp-01-21": 1_048_576,
     }
 
-    def __init__(self, model_name: str = "gpt-4", model_key: str = None, **kwargs):
+    def __init__(self, model_name: str = "gpt-4", model_key: str = None, base_url: str = None, **kwargs):
         self.model_name = model_name
         self.role_names = ["user", "user", "model"]
 
@@ -45,9 +37,20 @@ class GeminiLlm(Llm):
         if not self.model_key:
             raise RuntimeError(f"Gemini API key not provided")
 
+        if base_url:
+            # Gemini also serves the OpenAI chat completions API (https://generativelanguage.googleapis.com/v1beta/openai/)
+            from langchain_openai import ChatOpenAI
+            self.llm = ChatOpenAI(model_name=self.model_name, openai_api_key=self.model_key, base_url=base_url, **kwargs)
+            super().__init__(llm=self.llm, model_params=kwargs)
+            return
+
         self.llm: ChatGoogleGenerativeAI = ChatGoogleGenerativeAI(model=self.model_name, google_api_key=self.model_key, **kwargs)
 
-        super().__init__(llm=self.llm, role_names={self.Role.SYSTEM: "user", self.Role.AI: "model"})
+        super().__init__(
+            llm=self.llm,
+            role_names={self.Role.SYSTEM: "user", self.Role.AI: "model"},
+            model_params=kwargs,
+        )
 
     def clean_up_response(self, response: Any) -> dict:
         if isinstance(response, AIMessage):
@@ -59,9 +62,6 @@ class GeminiLlm(Llm):
         else:
             raise TypeError(f"Unsupported return type for GptLlm.invoke() (was {type(response)})")
 
-    def get_num_tokens(self, text: str) -> int:
-        return self.llm.get_num_tokens(text)
-
     def get_max_tokens(self) -> int:
         return self.__MODEL_TOKEN_LIMITS.get(self.model_name, 100_000)
 
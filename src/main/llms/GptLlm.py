@@ -8,33 +8,19 @@ from langchain_openai import ChatOpenAI
 from langchain_core.messages import AIMessage
 
 from llms.Llm import Llm
+from llms.ModelCatalog import ModelCatalog
 
 
 class GptLlm(Llm):
-    SUPPORTED_MODELS = [
-        "gpt-3.5-turbo",
-        "gpt-4",
-        "gpt-4o-2024-08-06",
-        "gpt-4o",
-        "o1-preview", "o1", "gpt-4o-1",
-        "o3-mini", "gpt-4o-3",
-        "gpt-4.5-preview",
-    ]
-
-    MODEL_ALIASES = {
-        "gpt-4.5": "gpt-4.5-preview",
-        "gpt-4o+": "gpt-4o-2024-08-06",
-        "gpt-o1": "o1",
-        "gpt-o3": "o3-mini",
-        "gpt-3.5": "gpt-3.5-turbo",
-    }
+    SUPPORTED_MODELS = ModelCatalog.SUPPORTED_MODELS["GptLlm"]
+    MODEL_ALIASES = ModelCatalog.MODEL_ALIASES["GptLlm"]
 
     __MODEL_TOKEN_LIMITS = {
         "gpt-4": 8192,
         "gpt-3.5-turbo": 16_000
     }
 
-    def __init__(self, model_name: str = "gpt-4", model_key: str = None, **kwargs):
+    def __init__(self, model_name: str = "gpt-4", model_key: str = None, base_url: str = None, **kwargs):
         self.model_name = model_name
         self.role_names = ["system", "user", "assistant"]
 
@@ -56,9 +42,11 @@ class GptLlm(Llm):
         if not self.model_key:
             raise RuntimeError(f"OpenAI API key not provided")
 
-        self.llm = ChatOpenAI(model_name=self.model_name, openai_api_key=self.model_key, **kwargs)
+        # base_url targets another OpenAI-compatible server, e.g., a proxy or a local stand-in
+        endpoint = {"base_url": base_url} if base_url else {}
+        self.llm = ChatOpenAI(model_name=self.model_name, openai_api_key=self.model_key, **endpoint, **kwargs)
 
-        super().__init__(llm=self.llm, role_names=role_names)
+        super().__init__(llm=self.llm, role_names=role_names, model_params=kwargs)
 
     def clean_up_response(self, response: Any) -> dict:
         if isinstance(response, AIMessage):
@@ -70,9 +58,6 @@ class GptLlm(Llm):
         else:
             raise TypeError(f"Unsupported return type for GptLlm.invoke() (was {type(response)})")
 
-    def get_num_tokens(self, text: str) -> int:
-        return ChatOpenAI(temperature=0).get_num_tokens(text)
-
     def get_max_tokens(self) -> int:
         return self.__MODEL_TOKEN_LIMITS.get(self.model_name, 100_000)
 
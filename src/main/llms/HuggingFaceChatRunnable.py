@@ -1,11 +1,12 @@
-from typing import Optional
+from typing import Optional, Iterator, AsyncIterator
 
-from huggingface_hub import InferenceClient
 from langchain.schema.runnable import Runnable
 from langchain_core.messages.utils import convert_to_messages, convert_to_openai_messages
 from langchain_core.runnables import RunnableConfig
 from langchain_core.runnables.utils import Input
 
+from llms.ConnectionPool import ConnectionPool
+
 
 class HuggingFaceChatRunnable(Runnable):
     __MODEL_PROVIDER = {
@@ -14,15 +15,32 @@ class HuggingFaceChatRunnable(Runnable):
     }
     # ["hf-inference", 'sambanova', 'together']
 
-    def __init__(self, model_name: str, api_key: str, **kwargs):
+    def __init__(self, model_name: str, api_key: str, base_url: str = None, **kwargs):
         self.model_name = model_name
 
-        self.client = InferenceClient(
-            model=self.model_name,
-            provider=self.__MODEL_PROVIDER.get(self.model_name, "hf-inference"),
-            api_key=api_key,
-            **kwargs
-        )
+        # Clients are shared by all instances of the same model
+        if base_url:
+            # Another server of the same protocols, e.g., a dedicated endpoint or a local stand-in
+            self.client_args = dict(base_url=base_url, api_key=api_key, **kwargs)
+            self.chat_args = dict(model=self.model_name)
+        else:
+            self.client_args = dict(
+                model=self.model_name,
+                provider=self.__MODEL_PROVIDER.get(self.model_name, "hf-inference"),
+                api_key=api_key,
+                **kwargs
+            )
+            self.chat_args = dict()
+
+    @classmethod
+    def __openai_messages_of(cls, text: Input) -> list:
+        # A single string or message converts into a single message, not a list
+        messages = convert_to_openai_messages(text)
+        return [messages] if isinstance(messages, dict) else messages
+
+    @property
+    def client(self):
+        return ConnectionPool.get_client(**self.client_args)
 
     def invoke(self, text: Input, config: Optional[RunnableConfig] = None, **kwargs) -> str:
         """
@@ -37,12 +55,12 @@ class HuggingFaceChatRunnable(Runnable):
         """
         # base_messages = convert_to_messages(text)
 
-        task = config.get("metadata", {}).get("task", "chat")
+        task = (config or {}).get("metadata", {}).get("task", "chat")
 
         if task == "chat":
-            messages = convert_to_openai_messages(text)
+            messages = self.__openai_messages_of(text)
             # messages = [{"role": "user", "content": m.content} for m in base_messages]
-            completion = self.client.chat_completion(messages=messages)
+            completion = self.client.chat_completion(messages=messages, **self.chat_args)
             return completion.choices[0].message["content"]
 
         elif task == "generation":
@@ -66,3 +84,49 @@ class HuggingFaceChatRunnable(Runnable):
         # # return completion.choices[0].message["content"]
         # return completion
 
+    async def ainvoke(self, text: Input, config: Optional[RunnableConfig] = None, **kwargs) -> str:
+        """Asynchronous version of `invoke()`, using the async inference client."""
+        task = (config or {}).get("metadata", {}).get("task", "chat")
+
+        client = await ConnectionPool.get_async_client(**self.client_args)
+
+        if task == "chat":
+            messages = self.__openai_messages_of(text)
+            completion = await client.chat_completion(messages=messages, **self.chat_args)
+            return completion.choices[0].message["content"]
+
+        elif task == "generation":
+            base_messages = convert_to_messages(text)
+            prompt = "\n\n".join([m.content for m in base_messages])
+            return await client.text_generation(prompt=prompt)
+
+    def stream(self, text: Input, config: Optional[RunnableConfig] = None, **kwargs) -> Iterator[str]:
+        """Streaming version of `invoke()`.  Yields the response text as it is generated."""
+        task = (config or {}).get("metadata", {}).get("task", "chat")
+
+        if task == "chat":
+            messages = self.__openai_messages_of(text)
+            for chunk in self.client.chat_completion(messages=messages, stream=True, **self.chat_args):
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+        elif task == "generation":
+            base_messages = convert_to_messages(text)
+            prompt = "\n\n".join([m.content for m in base_messages])
+            yield from self.client.text_generation(prompt=prompt, stream=True)
+
+    async def astream(self, text: Input, config: Optional[RunnableConfig] = None, **kwargs) -> AsyncIterator[str]:
+        task = (config or {}).get("metadata", {}).get("task", "chat")
+        client = await ConnectionPool.get_async_client(**self.client_args)
+
+        if task == "chat":
+            messages = self.__openai_messages_of(text)
+            async for chunk in await client.chat_completion(messages=messages, stream=True, **self.chat_args):
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+        elif task == "generation":
+            base_messages = convert_to_messages(text)
+            prompt = "\n\n".join([m.content for m in base_messages])
+            async for token in await client.text_generation(prompt=prompt, stream=True):
+                yield token
@@ -8,21 +8,15 @@ from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import Runnable
 
 from llms.Llm import Llm
+from llms.ModelCatalog import ModelCatalog
 from llms.HuggingFaceChatRunnable import HuggingFaceChatRunnable
 from llms.RunnableToLLMAdapter import RunnableToLLMAdapter
 
 
 class LlamaLlm(Llm):
 
-    SUPPORTED_MODELS = [
-        "meta-llama/Llama-2-7b-chat-hf",
-        "meta-llama/Llama-3.2-1B",
-    ]
-
-    MODEL_ALIASES = {
-        "llama-2": "meta-llama/Llama-2-7b-chat-hf",
-        "llama-3": "meta-llama/Llama-3.2-1B"
-    }
+    SUPPORTED_MODELS = ModelCatalog.SUPPORTED_MODELS["LlamaLlm"]
+    MODEL_ALIASES = ModelCatalog.MODEL_ALIASES["LlamaLlm"]
 
     __MODEL_TOKEN_LIMITS = {
         "meta-llama/Llama-2-7b-chat-hf": 4096,
@@ -36,7 +30,23 @@ class LlamaLlm(Llm):
 
     __URL_PREFIX = "https://huggingface.co/"
 
-    def __init__(self, model_name: str = "llama-2", model_key: str = None, **kwargs):
+    class InstTagParser(Llm.StreamParser):
+        """Removes the [/INST] tags echoed by the model while the response streams in."""
+
+        TAG = "[/INST]"
+
+        def __init__(self):
+            self.buffer = ""
+
+        def feed(self, chunk: Any) -> List[dict]:
+            text = (self.buffer + (self.text_of(chunk) or "")).replace(self.TAG, "")
+            text, self.buffer = self.hold_back(text, self.TAG)
+            return [{"content": text}] if text else []
+
+        def close(self) -> List[dict]:
+            return [{"content": self.buffer}] if self.buffer else []
+
+    def __init__(self, model_name: str = "llama-2", model_key: str = None, base_url: str = None, **kwargs):
         self.model_name = model_name
         self.role_names = ["system", "user", "assistant"]
 
@@ -55,6 +65,7 @@ class LlamaLlm(Llm):
         self.llm = HuggingFaceChatRunnable(
             model_name=self.model_name,
             api_key=self.model_key,
+            base_url=base_url,
         )
 
         super().__init__(llm=self.llm)
@@ -97,6 +108,9 @@ class LlamaLlm(Llm):
             "metadata": metadata,
         }
 
+    def get_stream_parser(self) -> Llm.StreamParser:
+        return self.InstTagParser()
+
     def get_max_tokens(self) -> int:
         limit = self.__MODEL_TOKEN_LIMITS.get(self.model_name, 4000)
         return limit
@@ -1,11 +1,29 @@
+import asyncio
+import atexit
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
 from enum import Enum
-from typing import Sequence, Any, List
+from functools import reduce
+from typing import Sequence, Any, List, Coroutine, Iterator, AsyncIterator, Callable, Hashable
 
 from langchain_core.language_models import BaseLanguageModel
+from langchain_core.messages import BaseMessage
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnableSequence, Runnable, RunnableConfig
-from transformers import AutoTokenizer
+
+from llms.RateLimiter import RateLimiter
+from llms.ResponseCache import ResponseCache
+from llms.SemanticCache import SemanticCache
+from llms.SingleFlight import SingleFlight
+from llms.Telemetry import Telemetry
+from llms.TokenizerRegistry import TokenizerRegistry
 
 
 class Llm(ABC):
@@ -14,8 +32,106 @@ class Llm(ABC):
         HUMAN = 1
         AI = 2
 
-    def __init__(self, llm: Runnable, role_names: dict = None):
+    @dataclass
+    class Request:
+        prompt: ChatPromptTemplate
+        arguments: dict | str
+        task: str
+        chain: Runnable
+        config: RunnableConfig
+        cache_key: str | None = None
+        semantic_key: tuple[str, str] | None = None     # Scope and text of the request in the semantic cache
+        flight_key: str | None = None                   # Identical requests in flight are coalesced
+
+    class StreamParser:
+        """
+        Turns streamed response chunks into deltas of the cleaned-up response.  A delta with `reset_content` set
+        reclassifies the content streamed so far, which is then to be discarded, e.g., as the thought of the delta.
+        """
+
+        def feed(self, chunk: Any) -> List[dict]:
+            text = self.text_of(chunk)
+            return [{"content": text}] if text else []
+
+        def close(self) -> List[dict]:
+            return []
+
+        @classmethod
+        def text_of(cls, chunk: Any) -> str:
+            return chunk.content if isinstance(chunk, BaseMessage) else chunk
+
+        @classmethod
+        def hold_back(cls, text: str, tag: str) -> tuple[str, str]:
+            """Split off the end of the text that may be the beginning of a tag completed by later chunks."""
+            for n in range(min(len(tag) - 1, len(text)), 0, -1):
+                if text.endswith(tag[:n]):
+                    return text[:-n], text[-n:]
+            return text, ""
+
+    class LruCache:
+        """Bounded, thread-safe memo of the most recently used values"""
+
+        def __init__(self, max_size: int):
+            self.max_size = max_size
+            self.entries: OrderedDict[Hashable, Any] = OrderedDict()
+            self.lock = threading.Lock()
+
+        def get(self, key: Hashable, create: Callable[[], Any]) -> Any:
+            with self.lock:
+                if key in self.entries:
+                    self.entries.move_to_end(key)
+                    return self.entries[key]
+
+            value = create()
+            with self.lock:
+                self.entries[key] = value
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.max_size:
+                    self.entries.popitem(last=False)
+            return value
+
+        def __len__(self) -> int:
+            return len(self.entries)
+
+    DEFAULT_MAX_CONCURRENCY = 8
+
+    # For keeping prompts within the token budget
+    DEFAULT_RESERVED_TOKENS = 1000
+    TOKENS_PER_MESSAGE = 4
+    TEXT_SEPARATORS = ["\n\n", "\n", ". ", "。", " "]
+
+    # Number of compiled prompt templates and chains kept by each model
+    PROMPT_CACHE_SIZE = 256
+
+    # Set on the class to cache responses of every model, or on an instance for a single model
+    response_cache: ResponseCache | None = None
+
+    # Set on the class or an instance to also reuse responses to near-duplicate prompts.  Consulted after an exact miss.
+    semantic_cache: SemanticCache | None = None
+
+    # Set on the class to record the calls to every model, or on an instance for a single model
+    telemetry: Telemetry | None = None
+
+    # Set on the class or an instance to coalesce identical calls in flight, e.g., `Llm.in_flight = SingleFlight()`.
+    # Only for deterministic calls (e.g., temperature 0), since coalesced callers all get the same sample.
+    in_flight: SingleFlight | None = None
+
+    # Whether the last call in the current thread or task was answered from a cache, rather than by the provider
+    from_cache: ContextVar[bool] = ContextVar("from_cache", default=False)
+
+    # Event loop of run_coroutine(), started on first use
+    __shared_loop: asyncio.AbstractEventLoop | None = None
+    __event_loop_lock = threading.Lock()
+
+    def __init__(self, llm: Runnable, role_names: dict = None, model_params: dict = None):
         self.llm = llm
+
+        # Generation parameters fixed when the model is created.  Part of the response cache key.
+        self.model_params = model_params or {}
+
+        # Templates and chains compiled from prompts, reused when the same prompt is invoked with other arguments
+        self.compiled_prompts = self.LruCache(self.PROMPT_CACHE_SIZE)
+
         self.role_names = {
             self.Role.SYSTEM: "system",
             self.Role.HUMAN: "user",
@@ -25,25 +141,505 @@ class Llm(ABC):
             for r in role_names:
                 self.role_names[r] = role_names[r]
 
-        # For counting tokens
-        self.tokenizer = AutoTokenizer.from_pretrained("gpt2")
-
     def invoke(self, prompt: Sequence[tuple[Role | str, str] | str] | str, **kwargs) -> dict:
-        # Format the prompt
-        prompt = self.preprocess_prompt(prompt)
+        """
+        Invoke the model with a prompt.
+
+        Args:
+            prompt: A prompt template, or a list of (role, template) tuples
+            kwargs:
+                arguments: Prompt template parameters
+                task: e.g., "chat" or "generation"
+                split_argument: Opt in to keep the prompt within the model's token budget.  If the rendered prompt
+                    is too large, this argument is split, the prompt runs on each part concurrently (map), and the
+                    results are combined by running `reduce_prompt` (default to the prompt) on the joined results.
+                reduce_prompt: Prompt for the reduce step
+                reserved_tokens: Tokens reserved for the response when checking the budget
+                Other generation parameters, e.g., temperature
+
+        Returns:
+            dict: The response "content" and provider specific "metadata"
+        """
+        if "split_argument" in kwargs:
+            return self.run_coroutine(self.__ainvoke_within_budget(prompt, **kwargs))
+
+        request = self.prepare_request(prompt, **kwargs)
+
+        with self.__instrumented(request) as record:
+            # Reuse an earlier response to the same request if there is one
+            response = self.__get_cached_response(request)
+            self.from_cache.set(response is not None)
+            if response is None:
+                def call() -> Any:
+                    result = self.get_rate_limiter().call(
+                        lambda: request.chain.invoke(input=request.arguments, config=request.config, **kwargs),
+                        self.__rate_limited_tokens(request),
+                        record,
+                    )
+                    self.__put_cached_response(request, result)
+                    return result
+
+                # Share the response of an identical call in flight, if any
+                if request.flight_key:
+                    response, coalesced = self.in_flight.call(request.flight_key, call)
+                    if record:
+                        record.coalesced = coalesced
+                else:
+                    response = call()
+            elif record:
+                record.cached = True
+
+            result = self.clean_up_response(response)
+            self.__count_tokens(record, request, response)
+            return result
+
+    async def ainvoke(self, prompt: Sequence[tuple[Role | str, str] | str] | str, **kwargs) -> dict:
+        if "split_argument" in kwargs:
+            return await self.__ainvoke_within_budget(prompt, **kwargs)
+
+        request = self.prepare_request(prompt, **kwargs)
+
+        with self.__instrumented(request) as record:
+            response = self.__get_cached_response(request)
+            self.from_cache.set(response is not None)
+            if response is None:
+                async def call() -> Any:
+                    result = await self.get_rate_limiter().acall(
+                        lambda: request.chain.ainvoke(input=request.arguments, config=request.config, **kwargs),
+                        self.__rate_limited_tokens(request),
+                        record,
+                    )
+                    self.__put_cached_response(request, result)
+                    return result
+
+                if request.flight_key:
+                    response, coalesced = await self.in_flight.acall(request.flight_key, call)
+                    if record:
+                        record.coalesced = coalesced
+                else:
+                    response = await call()
+            elif record:
+                record.cached = True
+
+            result = self.clean_up_response(response)
+            self.__count_tokens(record, request, response)
+            return result
+
+    def stream(self, prompt: Sequence[tuple[Role | str, str] | str] | str, **kwargs) -> Iterator[dict]:
+        """
+        Invoke the model and yield the response as it is generated.
+
+        Yields:
+            dict: Deltas of the response, e.g., {"content": "..."}.  Some models also yield {"thought": "..."}.
+        """
+        request = self.prepare_request(prompt, **kwargs)
+        parser = self.get_stream_parser()
+
+        with self.__instrumented(request) as record:
+            cached = self.__get_cached_response(request)
+            self.from_cache.set(cached is not None)
+            if cached is not None:
+                if record:
+                    record.cached = True
+                yield from parser.feed(cached)
+                yield from parser.close()
+                self.__count_tokens(record, request, cached)
+                return
+
+            # Streams hold their slot until the last chunk, but are not retried once started
+            limiter = self.get_rate_limiter()
+            waited = limiter.acquire(self.__rate_limited_tokens(request))
+            if record:
+                record.queue_wait = waited
+            chunks, error = [], None
+            try:
+                for chunk in request.chain.stream(input=request.arguments, config=request.config, **kwargs):
+                    if record:
+                        record.first_token()
+                    chunks.append(chunk)
+                    yield from parser.feed(chunk)
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                limiter.release(error)
+            yield from parser.close()
+
+            response = self.__join_chunks(chunks)
+            self.__put_cached_response(request, response)
+            self.__count_tokens(record, request, response)
+
+    async def astream(self, prompt: Sequence[tuple[Role | str, str] | str] | str, **kwargs) -> AsyncIterator[dict]:
+        request = self.prepare_request(prompt, **kwargs)
+        parser = self.get_stream_parser()
+
+        with self.__instrumented(request) as record:
+            cached = self.__get_cached_response(request)
+            self.from_cache.set(cached is not None)
+            if cached is not None:
+                if record:
+                    record.cached = True
+                for delta in parser.feed(cached) + parser.close():
+                    yield delta
+                self.__count_tokens(record, request, cached)
+                return
+
+            limiter = self.get_rate_limiter()
+            waited = await limiter.aacquire(self.__rate_limited_tokens(request))
+            if record:
+                record.queue_wait = waited
+            chunks, error = [], None
+            try:
+                async for chunk in request.chain.astream(input=request.arguments, config=request.config, **kwargs):
+                    if record:
+                        record.first_token()
+                    chunks.append(chunk)
+                    for delta in parser.feed(chunk):
+                        yield delta
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                limiter.release(error)
+            for delta in parser.close():
+                yield delta
+
+            response = self.__join_chunks(chunks)
+            self.__put_cached_response(request, response)
+            self.__count_tokens(record, request, response)
+
+    @contextmanager
+    def __instrumented(self, request: Request) -> Iterator[Telemetry.Call | None]:
+        """Telemetry of a call, recorded when the call finishes.  None if there is no telemetry to record to."""
+        telemetry = self.telemetry
+        if telemetry is None:
+            yield None
+            return
+
+        record = Telemetry.Call(
+            provider=type(self).__name__,
+            model=getattr(self, "model_name", None),
+            prompt=hashlib.sha1(repr(request.prompt).encode()).hexdigest()[:8],
+        )
+        try:
+            yield record
+        except Exception as e:
+            record.error = type(e).__name__
+            raise
+        finally:
+            record.finish()
+            telemetry.record(record)
+
+    def __count_tokens(self, record: Telemetry.Call | None, request: Request, response: Any):
+        if not record:
+            return
+
+        # Use the counts reported by the provider if there are any
+        usage = getattr(response, "usage_metadata", None)
+        if usage:
+            record.prompt_tokens = usage.get("input_tokens")
+            record.completion_tokens = usage.get("output_tokens")
+            return
+
+        text = self.StreamParser.text_of(response)
+        record.prompt_tokens = self.get_num_prompt_tokens(request.prompt, request.arguments)
+        record.completion_tokens = self.get_num_tokens(text if isinstance(text, str) else str(text))
 
+    def get_rate_limiter(self) -> RateLimiter:
+        """Scheduler of the calls to this model's provider.  See `RateLimiter.configure()` to set its limits."""
+        return RateLimiter.of(type(self).__name__)
+
+    def __rate_limited_tokens(self, request: Request) -> int:
+        # Only count the prompt tokens if there is a token budget to charge them to
+        if not self.get_rate_limiter().tokens_per_minute:
+            return 0
+        return self.get_num_prompt_tokens(request.prompt, request.arguments)
+
+    @classmethod
+    def __join_chunks(cls, chunks: List[Any]) -> Any:
+        if chunks and isinstance(chunks[0], BaseMessage):
+            return reduce(lambda a, b: a + b, chunks)
+        return "".join(chunks)
+
+    def get_stream_parser(self) -> StreamParser:
+        """Parser for streamed responses.  Override to post-process the response incrementally."""
+        return self.StreamParser()
+
+    def invoke_many(
+            self,
+            prompts: Sequence[Sequence[tuple[Role | str, str] | str] | str] | str,
+            arguments_list: Sequence[dict | str] = None,
+            max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+            **kwargs
+    ) -> List[dict]:
+        """
+        Invoke many prompts concurrently, with at most `max_concurrency` requests in flight.
+
+        Args:
+            prompts: A list of prompts, or a single prompt to be filled with each of the `arguments_list`
+            arguments_list: Prompt template parameters, one per invocation
+            max_concurrency: Maximum number of concurrent requests
+            kwargs: Other parameters passed to every `invoke()`
+
+        Returns:
+            list: The responses, in the order of the prompts
+        """
+        return self.run_coroutine(self.ainvoke_many(prompts, arguments_list, max_concurrency, **kwargs))
+
+    async def ainvoke_many(
+            self,
+            prompts: Sequence[Sequence[tuple[Role | str, str] | str] | str] | str,
+            arguments_list: Sequence[dict | str] = None,
+            max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+            **kwargs
+    ) -> List[dict]:
+        # A single prompt is either a string or a list of (role, message) tuples
+        if isinstance(prompts, str) or (prompts and isinstance(prompts[0], tuple)):
+            if arguments_list is None:
+                raise ValueError("arguments_list is needed when invoking a single prompt many times")
+            prompts = [prompts] * len(arguments_list)
+
+        if arguments_list is None:
+            arguments_list = [kwargs.pop("arguments", {})] * len(prompts)
+        elif len(arguments_list) != len(prompts):
+            raise ValueError(f"Got {len(prompts)} prompts but {len(arguments_list)} arguments")
+
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def invoke_one(prompt, arguments):
+            async with semaphore:
+                return await self.ainvoke(prompt, arguments=arguments, **kwargs)
+
+        return await asyncio.gather(*[invoke_one(p, a) for p, a in zip(prompts, arguments_list)])
+
+    @classmethod
+    def run_coroutine(cls, coroutine: Coroutine) -> Any:
+        """
+        Run a coroutine to completion, even when called from a running event loop (e.g., in Jupyter).
+
+        Coroutines run on one event loop kept for the life of the process, so that the async clients of the
+        providers, and their keep-alive connections, carry over from one call to the next.
+        """
+        loop = cls.__event_loop()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+
+        if running is loop:
+            # Called synchronously from a coroutine on the shared loop itself.  Waiting for the loop would deadlock.
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                return executor.submit(asyncio.run, coroutine).result()
+
+        future = asyncio.run_coroutine_threadsafe(coroutine, loop)
+        try:
+            return future.result()
+        except BaseException:
+            future.cancel()
+            raise
+
+    @classmethod
+    def __event_loop(cls) -> asyncio.AbstractEventLoop:
+        with Llm.__event_loop_lock:
+            if Llm.__shared_loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="llm-event-loop", daemon=True).start()
+                atexit.register(cls.__close_event_loop, loop)
+                Llm.__shared_loop = loop
+            return Llm.__shared_loop
+
+    @classmethod
+    def __close_event_loop(cls, loop: asyncio.AbstractEventLoop):
+        from llms.ConnectionPool import ConnectionPool
+
+        try:
+            asyncio.run_coroutine_threadsafe(ConnectionPool.aclose(), loop).result(timeout=5)
+        except Exception as e:
+            logging.debug(f"Cannot close the async clients: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+
+    async def __ainvoke_within_budget(
+            self,
+            prompt: Sequence[tuple[Role | str, str] | str] | str,
+            split_argument: str,
+            reduce_prompt: Sequence[tuple[Role | str, str] | str] | str = None,
+            reserved_tokens: int = DEFAULT_RESERVED_TOKENS,
+            max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+            **kwargs
+    ) -> dict:
+        template, _, _ = self.compile_prompt(prompt, kwargs.get("task", self.get_default_task()))
+        arguments = kwargs.pop("arguments", {})
+        if not isinstance(arguments, dict) and len(template.input_variables) == 1:
+            arguments = {template.input_variables[0]: arguments}
+
+        budget = self.get_max_tokens() - reserved_tokens
+        num_tokens = self.get_num_prompt_tokens(template, arguments)
+        if num_tokens <= budget:
+            return await self.ainvoke(prompt, arguments=arguments, **kwargs)
+
+        text = arguments.get(split_argument) if isinstance(arguments, dict) else None
+        if not text:
+            raise ValueError(f"Prompt of {num_tokens} tokens exceeds the budget of {budget}, and has no {split_argument} to split")
+
+        chunk_budget = budget - self.get_num_prompt_tokens(template, {**arguments, split_argument: ""})
+        if chunk_budget <= 0:
+            raise ValueError(f"Prompt exceeds the budget of {budget} tokens even without {split_argument}")
+
+        # Map
+        chunks = self.split_text(text, chunk_budget)
+        logging.info(f"Prompt of {num_tokens} tokens exceeds the budget of {budget}.  Mapping over {len(chunks)} chunks.")
+        mapped = await self.ainvoke_many(
+            prompt, [{**arguments, split_argument: c} for c in chunks], max_concurrency, **kwargs
+        )
+
+        # Reduce, which may be mapped again if the results are still too large
+        results = "\n\n".join(m["content"] for m in mapped)
+        if self.get_num_tokens(results) >= self.get_num_tokens(text):
+            raise ValueError(f"Mapping {split_argument} did not reduce it to fit in the budget of {budget} tokens")
+
+        return await self.__ainvoke_within_budget(
+            reduce_prompt or prompt,
+            split_argument,
+            reduce_prompt,
+            reserved_tokens,
+            max_concurrency,
+            arguments={**arguments, split_argument: results},
+            **kwargs
+        )
+
+    def get_num_prompt_tokens(self, prompt: ChatPromptTemplate, arguments: dict | str) -> int:
+        messages = prompt.invoke(arguments).to_messages()
+        return sum(self.get_num_tokens_many([m.content for m in messages])) + self.TOKENS_PER_MESSAGE * len(messages)
+
+    def split_text(self, text: str, max_tokens: int, separators: Sequence[str] = TEXT_SEPARATORS) -> List[str]:
+        """Split the text into chunks of at most `max_tokens`, breaking at paragraphs, lines or sentences if possible"""
+        if self.get_num_tokens(text) <= max_tokens:
+            return [text]
+
+        if not separators:
+            if len(text) <= 1:
+                return [text]
+            middle = len(text) // 2
+            return self.split_text(text[:middle], max_tokens, []) + self.split_text(text[middle:], max_tokens, [])
+
+        separator, separators = separators[0], separators[1:]
+        parts = [p + separator for p in text.split(separator)]
+        parts[-1] = parts[-1][:-len(separator)]
+        if len(parts) == 1:
+            return self.split_text(text, max_tokens, separators)
+
+        chunks = []
+        chunk, chunk_tokens = "", 0
+        for part, part_tokens in zip(parts, self.get_num_tokens_many(parts)):
+            if chunk and chunk_tokens + part_tokens > max_tokens:
+                chunks.append(chunk)
+                chunk, chunk_tokens = "", 0
+
+            if part_tokens > max_tokens:
+                chunks += self.split_text(part, max_tokens, separators)
+            else:
+                chunk += part
+                chunk_tokens += part_tokens
+
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
+    def prepare_request(self, prompt: Sequence[tuple[Role | str, str] | str] | str, **kwargs) -> Request:
         # Prompt template parameters
         arguments = kwargs.get("arguments", {})
 
         # Task, e.g., chat or completion
         task = kwargs.get("task", self.get_default_task())
 
-        # Create a chain and run
-        chain = RunnableSequence(prompt | self.llm)
-        config = RunnableConfig(metadata={"task": task})
-        response = chain.invoke(input=arguments, config=config, **kwargs)
+        # Format the prompt and create a chain to run
+        prompt, chain, config = self.compile_prompt(prompt, task)
 
-        return self.clean_up_response(response)
+        # Identical requests share a key, both in the response cache and among the calls in flight
+        key = None
+        if self.response_cache or self.in_flight is not None:
+            key = self.get_cache_key(prompt, arguments, task, kwargs)
+        semantic_key = self.get_semantic_key(prompt, arguments, task, kwargs) if self.semantic_cache is not None else None
+
+        return self.Request(
+            prompt=prompt, arguments=arguments, task=task, chain=chain, config=config,
+            cache_key=key if self.response_cache else None,
+            semantic_key=semantic_key,
+            flight_key=key if self.in_flight is not None else None,
+        )
+
+    def compile_prompt(
+            self,
+            prompt: Sequence[tuple[Role | str, str] | str] | str,
+            task: str
+    ) -> tuple[ChatPromptTemplate, Runnable, RunnableConfig]:
+        """The prompt template, the chain running it and its config.  Memoized per prompt, role names and task."""
+        def build() -> tuple[ChatPromptTemplate, Runnable, RunnableConfig]:
+            template = self.preprocess_prompt(prompt)
+            return template, RunnableSequence(template | self.llm), RunnableConfig(metadata={"task": task})
+
+        try:
+            key = (
+                prompt if isinstance(prompt, str) else tuple(m if isinstance(m, str) else tuple(m) for m in prompt),
+                tuple(self.role_names.items()),
+                task,
+                id(self.llm),
+            )
+            hash(key)
+        except TypeError:
+            # Prompts of unhashable parts are compiled every time
+            return build()
+
+        return self.compiled_prompts.get(key, build)
+
+    def __get_cached_response(self, request: Request) -> Any:
+        if request.cache_key:
+            cached = self.response_cache.get(request.cache_key)
+            if cached is not None:
+                return ResponseCache.load_response(cached)
+
+        if request.semantic_key:
+            return self.semantic_cache.get(*request.semantic_key)
+        return None
+
+    def __put_cached_response(self, request: Request, response: Any):
+        if request.cache_key:
+            self.response_cache.put(request.cache_key, ResponseCache.dump_response(response))
+        if request.semantic_key:
+            self.semantic_cache.put(*request.semantic_key, response)
+
+    def get_cache_key(self, prompt: ChatPromptTemplate, arguments: dict | str, task: str, kwargs: dict) -> str:
+        messages = prompt.invoke(arguments).to_messages()
+        params = {k: v for k, v in kwargs.items() if k not in ["arguments", "task"]}
+        return ResponseCache.key_of(
+            provider=type(self).__name__,
+            model_name=getattr(self, "model_name", None),
+            messages=messages,
+            task=task,
+            params={**self.model_params, **params},
+        )
+
+    def get_semantic_key(self, prompt: ChatPromptTemplate, arguments: dict | str, task: str, kwargs: dict) -> tuple[str, str]:
+        """
+        Scope and text of a request in the semantic cache.  Requests are only matched within the same provider, model,
+        prompt template, task and generation parameters, and on the text filled into the template.
+        """
+        params = {k: v for k, v in kwargs.items() if k not in ["arguments", "task"]}
+        scope = ResponseCache.make_key(
+            type(self).__name__,
+            getattr(self, "model_name", None),
+            [(m.__class__.__name__, getattr(getattr(m, "prompt", None), "template", repr(m))) for m in prompt.messages],
+            task,
+            {**self.model_params, **params},
+        )
+
+        if isinstance(arguments, dict) and arguments:
+            text = "\n".join(str(arguments[k]) for k in sorted(arguments))
+        elif isinstance(arguments, str) and arguments:
+            text = arguments
+        else:
+            text = "\n".join(str(m.content) for m in prompt.invoke(arguments).to_messages())
+        return scope, text
 
     def preprocess_prompt(self, prompt: Sequence[tuple[Role | str, str] | str] | str) -> ChatPromptTemplate:
         # Reformat the prompt
@@ -61,7 +657,10 @@ class Llm(ABC):
         pass
 
     def get_num_tokens(self, text: str) -> int:
-        return len(self.tokenizer.encode(text))
+        return TokenizerRegistry.count(getattr(self, "model_name", None), text)
+
+    def get_num_tokens_many(self, texts: Sequence[str]) -> List[int]:
+        return TokenizerRegistry.count_many(getattr(self, "model_name", None), texts)
 
     @abstractmethod
     def get_max_tokens(self) -> int:
@@ -0,0 +1,93 @@
+from typing import List
+
+
+class ModelCatalog:
+    """
+    Models served by each provider class, and the aliases of these models.  Imports nothing, so that the package can
+    resolve a model name to its provider without importing any provider SDK.
+    """
+
+    # Provider classes, in order of preference when several providers serve a model
+    PROVIDERS = ["GptLlm", "GeminiLlm", "DeepInfraLlm", "LlamaLlm", "DeepSeekLlm"]
+
+    SUPPORTED_MODELS: dict[str, List[str]] = {
+        "GptLlm": [
+            "gpt-3.5-turbo",
+            "gpt-4",
+            "gpt-4o-2024-08-06",
+            "gpt-4o",
+            "o1-preview", "o1", "gpt-4o-1",
+            "o3-mini", "gpt-4o-3",
+            "gpt-4.5-preview",
+        ],
+        "GeminiLlm": [
+            "gemini-2.5-pro-exp-03-25",
+            "gemini-2.0-flash",
+            "gemini-2.0-flash-thinking-exp-01-21",
+        ],
+        "DeepInfraLlm": [
+            "Sao10K/L3.3-70B-Euryale-v2.3",
+            "meta-llama/Llama-3.3-70B-Instruct",
+            "microsoft/WizardLM-2-8x22B",
+            "google/gemini-2.0-flash-001",
+            "deepseek-ai/DeepSeek-V3-0324",
+            "meta-llama/Llama-4-Maverick-17B-128E-Instruct-FP8",
+        ],
+        "LlamaLlm": [
+            "meta-llama/Llama-2-7b-chat-hf",
+            "meta-llama/Llama-3.2-1B",
+        ],
+        "DeepSeekLlm": [
+            "deepseek-ai/DeepSeek-R1",
+            "deepseek-ai/DeepSeek-R1-Distill-Qwen-32B",
+        ],
+    }
+
+    MODEL_ALIASES: dict[str, dict[str, str]] = {
+        "GptLlm": {
+            "gpt-4.5": "gpt-4.5-preview",
+            "gpt-4o+": "gpt-4o-2024-08-06",
+            "gpt-o1": "o1",
+            "gpt-o3": "o3-mini",
+            "gpt-3.5": "gpt-3.5-turbo",
+        },
+        "GeminiLlm": {
+            "gemini-2.5": "gemini-2.5-pro-exp-03-25",
+            "gemini-2": "gemini-2.0-flash",
+            "gemini-2t": "gemini-2.0-flash-thinking-exp-01-21",
+        },
+        "DeepInfraLlm": {
+            "llama-4": "meta-llama/Llama-4-Maverick-17B-128E-Instruct-FP8",
+            "euryale": "Sao10K/L3.3-70B-Euryale-v2.3",
+            "llama-3": "meta-llama/Llama-3.3-70B-Instruct",
+            "wizardlm-2": "microsoft/WizardLM-2-8x22B",
+            "gemini-2": "google/gemini-2.0-flash-001",
+            "deepseek-v3": "deepseek-ai/DeepSeek-V3-0324",
+        },
+        "LlamaLlm": {
+            "llama-2": "meta-llama/Llama-2-7b-chat-hf",
+            "llama-3": "meta-llama/Llama-3.2-1B",
+        },
+        "DeepSeekLlm": {
+            "deepseek": "deepseek-ai/DeepSeek-R1",
+            "deepseek-gwen": "deepseek-ai/DeepSeek-R1-Distill-Qwen-32B",
+        },
+    }
+
+    # Ids by which several providers serve the very same model
+    EQUIVALENT_MODELS: List[set[str]] = [
+        {"gemini-2.0-flash", "google/gemini-2.0-flash-001"},
+    ]
+
+    @classmethod
+    def models_of(cls, provider: str) -> List[str]:
+        """Aliases and names of the models served by the provider"""
+        return list(cls.MODEL_ALIASES.get(provider, {})) + cls.SUPPORTED_MODELS.get(provider, [])
+
+    @classmethod
+    def canonical_id(cls, model_id: str) -> str:
+        """The same id for every provider serving the model, e.g., for both ids of Gemini 2.0 Flash"""
+        for ids in cls.EQUIVALENT_MODELS:
+            if model_id in ids:
+                return min(ids)
+        return model_id
@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import re
+from typing import List, Sequence
+
+from llms.Llm import Llm
+
+
+class PromptPacker:
+    """
+    Runs one instruction on many small texts (e.g., generating questions from each chunk of a document) in fewer
+    requests, by packing as many texts as fit within the model's token budget into each request.
+
+    The texts of a packed request are delimited as numbered sections, and the model is told to answer in sections
+    of the same numbers.  The response is split back into one result per text.  Texts whose sections are missing
+    or ambiguous in the response are run on their own.
+
+    Usage:
+        packer = PromptPacker(llms.of("gpt-4o"), "Write 3 questions answered by the text below.")
+        questions = [r["content"] for r in packer.invoke(chunks)]
+    """
+
+    PACKED_INSTRUCTION = """
+        The input below has {count} sections, each starting with a line "### Task <number>".
+        Do the above for each section on its own.  Answer each section in a section starting with the same
+        "### Task <number>" line, in the same order, and do not write anything outside of the sections.
+        """
+
+    SECTION_HEADER = "### Task {number}"
+
+    DEFAULT_MAX_TASKS = 32
+    DEFAULT_ANSWER_TOKENS = 250
+
+    # Section headers in the response, tolerating other markdown headings or bold, and trailing colons
+    __HEADER = re.compile(r"^[ \t]*(?:#+|\*\*)?[ \t]*Task[ \t]+(\d+)[ \t]*:?[ \t]*(?:\*\*)?[ \t]*:?[ \t]*$", re.M | re.I)
+
+    def __init__(
+            self,
+            llm: Llm,
+            instruction: str,
+            max_tasks: int = DEFAULT_MAX_TASKS,
+            answer_tokens: int = DEFAULT_ANSWER_TOKENS,
+            reserved_tokens: int = Llm.DEFAULT_RESERVED_TOKENS,
+            max_concurrency: int = Llm.DEFAULT_MAX_CONCURRENCY,
+    ):
+        """
+        Args:
+            llm: The model to run the tasks
+            instruction: Prompt template of the instruction shared by all tasks, without the text of the task
+            max_tasks: Maximum number of tasks packed into one request
+            answer_tokens: Tokens expected in the answer of each task, kept free within the model's token budget
+            reserved_tokens: Tokens kept free within the model's token budget besides the answers
+            max_concurrency: Maximum number of concurrent requests
+        """
+        self.llm = llm
+        self.instruction = instruction
+        self.max_tasks = max_tasks
+        self.answer_tokens = answer_tokens
+        self.reserved_tokens = reserved_tokens
+        self.max_concurrency = max_concurrency
+
+        self.single_prompt = instruction + "\n===\n{text}"
+        self.packed_prompt = instruction + "\n" + self.PACKED_INSTRUCTION + "\n===\n{sections}"
+
+        self.requests = 0
+        self.fallbacks = 0
+
+    def pack(self, texts: Sequence[str], arguments: dict = None) -> List[List[int]]:
+        """Indexes of the texts packed into each request, in order"""
+        arguments = arguments or {}
+        template, _, _ = self.llm.compile_prompt(self.packed_prompt, self.llm.get_default_task())
+        overhead = self.llm.get_num_prompt_tokens(template, {**arguments, "count": len(texts), "sections": ""})
+        budget = self.llm.get_max_tokens() - self.reserved_tokens - overhead
+        header_tokens = self.llm.get_num_tokens(self.SECTION_HEADER.format(number=len(texts)) + "\n\n")
+
+        packs, pack, pack_tokens = [], [], 0
+        for i, num_tokens in enumerate(self.llm.get_num_tokens_many(list(texts))):
+            cost = num_tokens + header_tokens + self.answer_tokens
+            if pack and (pack_tokens + cost > budget or len(pack) >= self.max_tasks):
+                packs.append(pack)
+                pack, pack_tokens = [], 0
+            pack.append(i)
+            pack_tokens += cost
+
+        if pack:
+            packs.append(pack)
+        return packs
+
+    def sections_of(self, texts: Sequence[str]) -> str:
+        return "\n\n".join(f"{self.SECTION_HEADER.format(number=n)}\n{text}" for n, text in enumerate(texts, start=1))
+
+    def parse(self, content: str, count: int) -> dict[int, str]:
+        """Answers by task number (from 1).  Tasks answered more than once, or not at all, are left out."""
+        headers = list(self.__HEADER.finditer(content))
+        answers, duplicates = {}, set()
+        for header, following in zip(headers, headers[1:] + [None]):
+            number = int(header.group(1))
+            answer = content[header.end():following.start() if following else len(content)].strip()
+            if number in answers:
+                duplicates.add(number)
+            answers[number] = answer
+
+        return {n: a for n, a in answers.items() if 1 <= n <= count and n not in duplicates and a}
+
+    def invoke(self, texts: Sequence[str], arguments: dict = None, **kwargs) -> List[dict]:
+        """
+        Run the instruction on each of the texts.
+
+        Args:
+            texts: Text of each task
+            arguments: Parameters of the instruction template
+            kwargs: Other parameters passed to the model, e.g., temperature
+
+        Returns:
+            list: One response per text, with the "content" of its answer and the "metadata" of the request
+        """
+        return self.llm.run_coroutine(self.ainvoke(texts, arguments, **kwargs))
+
+    async def ainvoke(self, texts: Sequence[str], arguments: dict = None, **kwargs) -> List[dict]:
+        arguments = arguments or {}
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        results: List[dict | None] = [None] * len(texts)
+
+        async def invoke_single(i: int):
+            async with semaphore:
+                results[i] = await self.llm.ainvoke(self.single_prompt, arguments={**arguments, "text": texts[i]}, **kwargs)
+            self.requests += 1
+
+        async def invoke_packed(pack: List[int]):
+            if len(pack) == 1:
+                return await invoke_single(pack[0])
+
+            async with semaphore:
+                response = await self.llm.ainvoke(self.packed_prompt, arguments={
+                    **arguments, "count": len(pack), "sections": self.sections_of([texts[i] for i in pack])
+                }, **kwargs)
+            self.requests += 1
+
+            answers = self.parse(response["content"], len(pack))
+            for n, i in enumerate(pack, start=1):
+                if n in answers:
+                    results[i] = {**response, "content": answers[n]}
+
+            missing = [i for n, i in enumerate(pack, start=1) if n not in answers]
+            if missing:
+                logging.info(f"{len(missing)} of {len(pack)} packed tasks not answered.  Running them on their own.")
+                self.fallbacks += len(missing)
+                await asyncio.gather(*[invoke_single(i) for i in missing])
+
+        await asyncio.gather(*[invoke_packed(pack) for pack in self.pack(texts, arguments)])
+        return results
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "fallbacks": self.fallbacks,
+        }
@@ -0,0 +1,254 @@
+import asyncio
+import email.utils
+import logging
+import random
+import threading
+import time
+from typing import Any, Callable, Awaitable
+
+from llms.Telemetry import Telemetry
+
+
+class RateLimiter:
+    """
+    Schedules the calls to a provider within its rate limits.  One limiter is shared by all models of a provider.
+
+    Calls wait for budget in two token buckets, one for requests per minute and one for (prompt) tokens per minute,
+    so that a steady stream of calls stays just under the configured limits instead of bursting into them.
+    The number of calls in flight is adjusted by AIMD: it grows by one per round of successful calls and halves
+    when the provider answers 429.  The rejected call is retried after the provider's Retry-After, if given, or
+    after an exponential backoff.
+    """
+
+    class TokenBucket:
+        """Refills at `rate` per second up to `capacity`"""
+
+        def __init__(self, rate: float, capacity: float):
+            self.rate = rate
+            self.capacity = capacity
+            self.level = capacity
+            self.updated = time.monotonic()
+
+        def refill(self, now: float):
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+            self.updated = now
+
+        def wait_for(self, amount: float) -> float:
+            """Seconds until `amount` is available.  Amounts beyond the capacity only need a full bucket."""
+            shortfall = min(amount, self.capacity) - self.level
+            return max(shortfall / self.rate, 0.0)
+
+    DEFAULT_MAX_CONCURRENCY = 64
+    DEFAULT_RETRIES = 5
+    MAX_BACKOFF = 60.0
+
+    # Polling interval while waiting for a call in flight to finish
+    __POLL_INTERVAL = 0.02
+
+    __limiters: dict[str, "RateLimiter"] = {}
+    __limits: dict[str, dict] = {}
+    __registry_lock = threading.Lock()
+
+    def __init__(
+            self,
+            requests_per_minute: float = None,
+            tokens_per_minute: float = None,
+            max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+            retries: int = DEFAULT_RETRIES,
+    ):
+        """
+        Args:
+            requests_per_minute: Request budget, or None if unlimited
+            tokens_per_minute: Prompt token budget, or None if unlimited
+            max_concurrency: Upper bound of the calls in flight
+            retries: Times to retry a call rejected by the rate limit
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+
+        self.requests = self.TokenBucket(requests_per_minute / 60, requests_per_minute) if requests_per_minute else None
+        self.tokens = self.TokenBucket(tokens_per_minute / 60, tokens_per_minute) if tokens_per_minute else None
+
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self.last_decrease = 0.0
+        self.rate_limited = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def configure(cls, provider: str, requests_per_minute: float = None, tokens_per_minute: float = None, **kwargs):
+        """Set the rate limits of a provider, e.g., "GptLlm".  Replaces the provider's current limiter."""
+        with cls.__registry_lock:
+            cls.__limits[provider] = dict(
+                requests_per_minute=requests_per_minute, tokens_per_minute=tokens_per_minute, **kwargs
+            )
+            cls.__limiters.pop(provider, None)
+
+    @classmethod
+    def of(cls, provider: str) -> "RateLimiter":
+        limiter = cls.__limiters.get(provider)
+        if limiter:
+            return limiter
+
+        with cls.__registry_lock:
+            if provider not in cls.__limiters:
+                cls.__limiters[provider] = cls(**cls.__limits.get(provider, {}))
+            return cls.__limiters[provider]
+
+    @classmethod
+    def clear(cls):
+        with cls.__registry_lock:
+            cls.__limiters.clear()
+            cls.__limits.clear()
+
+    def try_acquire(self, tokens: int = 0) -> float:
+        """Take a slot for a call of `tokens` prompt tokens if the budget allows.  Otherwise, seconds to wait."""
+        with self.lock:
+            now = time.monotonic()
+            if now < self.blocked_until:
+                return self.blocked_until - now
+            if self.in_flight >= int(self.limit):
+                return self.__POLL_INTERVAL
+
+            wait = 0.0
+            for bucket, amount in [(self.requests, 1), (self.tokens, tokens)]:
+                if bucket:
+                    bucket.refill(now)
+                    wait = max(wait, bucket.wait_for(amount))
+            if wait > 0:
+                return wait
+
+            if self.requests:
+                self.requests.level -= 1
+            if self.tokens:
+                self.tokens.level -= tokens
+            self.in_flight += 1
+            return 0.0
+
+    def acquire(self, tokens: int = 0) -> float:
+        """Wait for a slot.  Returns the seconds waited."""
+        start = time.monotonic()
+        while (wait := self.try_acquire(tokens)) > 0:
+            time.sleep(wait)
+        return time.monotonic() - start
+
+    async def aacquire(self, tokens: int = 0) -> float:
+        start = time.monotonic()
+        while (wait := self.try_acquire(tokens)) > 0:
+            await asyncio.sleep(wait)
+        return time.monotonic() - start
+
+    def release(self, error: Exception = None, attempt: int = 0) -> bool:
+        """
+        Give back the slot of a finished call, and adapt the concurrency to its outcome.
+
+        Returns:
+            bool: Whether the call was rejected by the rate limit
+        """
+        rate_limited = error is not None and self.is_rate_limited(error)
+
+        with self.lock:
+            self.in_flight -= 1
+            now = time.monotonic()
+
+            if not rate_limited:
+                if error is None:
+                    self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+                return False
+
+            self.rate_limited += 1
+            retry_after = self.retry_after_of(error)
+            if retry_after is None:
+                retry_after = min(2 ** attempt, self.MAX_BACKOFF) * (0.5 + random.random() / 2)
+            self.blocked_until = max(self.blocked_until, now + retry_after)
+
+            # The calls in flight when the limit was hit are rejected together.  Count them as one congestion event.
+            if now - self.last_decrease > retry_after:
+                self.limit = max(1.0, self.limit / 2)
+                self.last_decrease = now
+
+            logging.info(f"Rate limited.  Retrying in {retry_after:.1f}s with up to {int(self.limit)} calls in flight.")
+            return True
+
+    def call(self, function: Callable[[], Any], tokens: int = 0, record: Telemetry.Call = None) -> Any:
+        """
+        Call `function` within the rate limits, retrying if it is rejected by the rate limit.
+
+        Args:
+            function: The call to the provider
+            tokens: Prompt tokens of the call
+            record: Telemetry of the call, to add the time waiting for the rate limits and the retries to
+        """
+        for attempt in range(self.retries + 1):
+            waited = self.acquire(tokens)
+            if record:
+                record.queue_wait += waited
+                record.retries = attempt
+            try:
+                result = function()
+            except Exception as e:
+                if self.release(e, attempt) and attempt < self.retries:
+                    continue
+                raise
+            self.release()
+            return result
+
+    async def acall(self, function: Callable[[], Awaitable[Any]], tokens: int = 0, record: Telemetry.Call = None) -> Any:
+        for attempt in range(self.retries + 1):
+            waited = await self.aacquire(tokens)
+            if record:
+                record.queue_wait += waited
+                record.retries = attempt
+            try:
+                result = await function()
+            except Exception as e:
+                if self.release(e, attempt) and attempt < self.retries:
+                    continue
+                raise
+            self.release()
+            return result
+
+    @classmethod
+    def is_rate_limited(cls, error: Exception) -> bool:
+        """Whether the error is an HTTP 429, however the provider's SDK reports it"""
+        response = getattr(error, "response", None)
+        for status in [getattr(error, "status_code", None), getattr(error, "code", None), getattr(response, "status_code", None)]:
+            if status == 429:
+                return True
+        return type(error).__name__ in ["RateLimitError", "ResourceExhausted", "TooManyRequests"]
+
+    @classmethod
+    def retry_after_of(cls, error: Exception) -> float | None:
+        """Seconds to wait as told by the Retry-After header of the rejected response, if any"""
+        headers = getattr(getattr(error, "response", None), "headers", None)
+        if not headers:
+            return None
+
+        if headers.get("retry-after-ms"):
+            try:
+                return float(headers["retry-after-ms"]) / 1000
+            except ValueError:
+                pass
+
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            pass
+        try:
+            return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+        except (TypeError, ValueError):
+            return None
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "limit": int(self.limit),
+                "in_flight": self.in_flight,
+                "rate_limited": self.rate_limited,
+            }
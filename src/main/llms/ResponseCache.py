@@ -0,0 +1,51 @@
+import os
+from typing import Any, Sequence
+
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+
+from util.DiskCache import DiskCache
+
+
+class ResponseCache(DiskCache):
+    """
+    Persistent cache of raw LLM responses, shared by all `Llm` providers.
+
+    Entries are keyed on the provider, the resolved model name, the rendered prompt messages, the task and the
+    generation parameters, so re-running a pipeline over unchanged inputs makes no network calls.
+
+    Usage:
+        Llm.response_cache = ResponseCache()                  # For every model in the process
+        llm = llms.of("llama-3", response_cache=ResponseCache("/tmp/my_cache"))    # For a single model
+    """
+
+    DEFAULT_DIRECTORY = os.environ.get("LLM_CACHE_DIR", os.path.expanduser("~/.cache/ec_digests/llm_responses"))
+
+    def __init__(self, directory: str = DEFAULT_DIRECTORY, **kwargs):
+        super().__init__(directory, **kwargs)
+
+    @classmethod
+    def key_of(
+            cls,
+            provider: str,
+            model_name: str,
+            messages: Sequence[BaseMessage],
+            task: str,
+            params: dict,
+    ) -> str:
+        rendered = [(m.type, m.content) for m in messages]
+        return cls.make_key(provider, model_name, rendered, task, params)
+
+    @classmethod
+    def dump_response(cls, response: Any) -> dict:
+        if isinstance(response, BaseMessage):
+            return {"message": message_to_dict(response)}
+        elif isinstance(response, str):
+            return {"text": response}
+        else:
+            raise TypeError(f"Cannot cache responses of type {type(response)}")
+
+    @classmethod
+    def load_response(cls, entry: dict) -> Any:
+        if "message" in entry:
+            return messages_from_dict([entry["message"]])[0]
+        return entry["text"]
@@ -0,0 +1,317 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, List, Sequence, Iterator, AsyncIterator, Callable
+
+from langchain_core.language_models import BaseLanguageModel
+from langchain_core.runnables import Runnable
+
+from llms.Llm import Llm
+
+
+class RoutedLlm(Llm):
+    """
+    A model served by several backends, e.g., by its vendor's API and by an inference provider.
+
+    Each call goes to the backend that has been fastest recently, with its latency penalized by its error rate.
+    A failed call fails over to the next backend.  Idempotent calls (the default) are also hedged: if the backend
+    has not responded within its p95 latency, the same request is sent to the next backend, and the first response
+    wins.  This keeps a single slow provider from dominating the tail latency.  Responses from the caches are not
+    counted in the latencies.
+
+    Close the model, or use it as a context manager, to release the threads of hedged calls.
+    """
+
+    class Stats:
+        """Rolling window of the latencies and outcomes of calls to a backend"""
+
+        def __init__(self, window: int):
+            self.samples: deque[tuple[float, bool]] = deque(maxlen=window)
+            self.lock = threading.Lock()
+
+        def record(self, latency: float, ok: bool):
+            with self.lock:
+                self.samples.append((latency, ok))
+
+        def __len__(self) -> int:
+            return len(self.samples)
+
+        def quantile(self, q: float) -> float | None:
+            with self.lock:
+                latencies = sorted(latency for latency, ok in self.samples if ok)
+            if not latencies:
+                return None
+            return latencies[min(int(q * len(latencies)), len(latencies) - 1)]
+
+        def error_rate(self) -> float:
+            with self.lock:
+                return sum(not ok for _, ok in self.samples) / len(self.samples) if self.samples else 0.0
+
+        def score(self) -> float:
+            """Expected latency, counting the retries needed for failed calls.  Lower is better."""
+            median = self.quantile(0.5)
+            if median is None:
+                # Try backends without successful calls before the failing ones, but after the known good ones
+                return float("inf") if self.samples else 0.0
+            return median / max(1.0 - self.error_rate(), 0.05)
+
+    DEFAULT_WINDOW = 100
+    DEFAULT_HEDGE_QUANTILE = 0.95
+    DEFAULT_MIN_SAMPLES = 5
+    DEFAULT_EXPLORE_RATE = 0.05
+
+    def __init__(
+            self,
+            backends: Sequence[Llm],
+            window: int = DEFAULT_WINDOW,
+            hedge_quantile: float | None = DEFAULT_HEDGE_QUANTILE,
+            min_samples: int = DEFAULT_MIN_SAMPLES,
+            explore_rate: float = DEFAULT_EXPLORE_RATE,
+    ):
+        """
+        Args:
+            backends: Models to route among, in order of preference until their latencies are known
+            window: Number of recent calls per backend to estimate its latency from
+            hedge_quantile: Latency quantile after which a call is hedged, or None not to hedge
+            min_samples: Calls to a backend needed before its latency quantile is trusted for hedging
+            explore_rate: Chance of routing to a backend other than the fastest, to keep its latency up to date
+        """
+        if not backends:
+            raise ValueError("RoutedLlm needs at least one backend")
+
+        self.backends = list(backends)
+        self.model_name = getattr(self.backends[0], "model_name", None)
+        self.hedge_quantile = hedge_quantile
+        self.min_samples = min_samples
+        self.explore_rate = explore_rate
+        self.stats = {id(b): self.Stats(window) for b in self.backends}
+
+        # Threads for hedged synchronous calls
+        self.__executor = ThreadPoolExecutor(max_workers=4 * self.DEFAULT_MAX_CONCURRENCY)
+
+        super().__init__(llm=self.backends[0].llm)
+
+    def close(self):
+        """Cancel the hedged calls not started yet, and release their threads"""
+        self.__executor.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self) -> "RoutedLlm":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @classmethod
+    def providers_of(cls, model_name: str) -> List[str]:
+        """
+        Providers serving the model that the preferred provider serves by this name, under its own id or an
+        equivalent one in ModelCatalog.EQUIVALENT_MODELS.  Providers serving another model by the same alias, e.g.,
+        another size of `llama-3`, are left out.
+        """
+        import llms
+
+        def canonical_id(provider: str) -> str:
+            return llms.ModelCatalog.canonical_id(llms.model_id_of(model_name, provider))
+
+        providers = llms.providers_of(model_name)
+        model_id = canonical_id(providers[0])
+        return [p for p in providers if canonical_id(p) == model_id]
+
+    @classmethod
+    def of(cls, model_name: str, **kwargs) -> "RoutedLlm":
+        """Route a model among all providers serving it.  Providers that cannot be set up (e.g., no API key) are skipped."""
+        import llms
+
+        backends = []
+        for provider in cls.providers_of(model_name):
+            try:
+                backends.append(llms.class_of(provider)(model_name, **kwargs))
+            except (RuntimeError, ValueError, ImportError) as e:
+                logging.warning(f"{provider} not available for {model_name}: {e}")
+
+        if not backends:
+            raise RuntimeError(f"No provider available for {model_name}")
+        return cls(backends)
+
+    def stats_of(self, backend: Llm) -> Stats:
+        return self.stats[id(backend)]
+
+    def rank(self) -> List[Llm]:
+        """Backends in the order to try them, fastest first"""
+        ranked = sorted(self.backends, key=lambda b: self.stats_of(b).score())
+        if len(ranked) > 1 and random.random() < self.explore_rate:
+            ranked.insert(0, ranked.pop(random.randrange(1, len(ranked))))
+        return ranked
+
+    def __hedge_delay(self, backend: Llm) -> float | None:
+        stats = self.stats_of(backend)
+        if self.hedge_quantile is None or len(stats) < self.min_samples:
+            return None
+        return stats.quantile(self.hedge_quantile)
+
+    def __record(self, backend: Llm, start: float, ok: bool):
+        # Responses from the caches say nothing about the provider
+        if not Llm.from_cache.get():
+            self.stats_of(backend).record(time.monotonic() - start, ok)
+
+    def __timed(self, backend: Llm, call: Callable, *args, **kwargs) -> Any:
+        Llm.from_cache.set(False)
+        start = time.monotonic()
+        try:
+            result = call(*args, **kwargs)
+        except Exception:
+            self.__record(backend, start, False)
+            raise
+        self.__record(backend, start, True)
+        return result
+
+    async def __atimed(self, backend: Llm, call: Callable, *args, **kwargs) -> Any:
+        # A cancelled call (lost a hedge) is not recorded, since its latency is unknown
+        Llm.from_cache.set(False)
+        start = time.monotonic()
+        try:
+            result = await call(*args, **kwargs)
+        except Exception:
+            self.__record(backend, start, False)
+            raise
+        self.__record(backend, start, True)
+        return result
+
+    def invoke(self, prompt: Sequence[tuple[Llm.Role | str, str] | str] | str, **kwargs) -> dict:
+        """
+        Invoke the fastest backend.  See `Llm.invoke()`.
+
+        Args:
+            kwargs:
+                idempotent: Whether the call may be sent to more than one backend.  Default to True.
+        """
+        if "split_argument" in kwargs:
+            return super().invoke(prompt, **kwargs)
+
+        hedge = kwargs.pop("idempotent", True)
+        backends = iter(self.rank())
+        pending = {}
+        hedged = False
+        error = None
+
+        def submit():
+            backend = next(backends, None)
+            if backend:
+                pending[self.__executor.submit(self.__timed, backend, backend.invoke, prompt, **kwargs)] = backend
+
+        submit()
+        try:
+            while pending:
+                delay = self.__hedge_delay(next(iter(pending.values()))) if hedge and not hedged and len(pending) == 1 else None
+                done, _ = wait(pending, timeout=delay, return_when=FIRST_COMPLETED)
+
+                if not done:
+                    logging.info(f"{type(pending[next(iter(pending))]).__name__} slower than {delay:.2f}s.  Hedging.")
+                    submit()
+                    hedged = True
+                    continue
+
+                for future in done:
+                    backend = pending.pop(future)
+                    if future.exception() is None:
+                        return future.result()
+                    error = future.exception()
+                    logging.warning(f"{type(backend).__name__} failed: {error}")
+
+                if not pending:
+                    submit()
+
+            raise error
+
+        finally:
+            # Losing calls not started yet are dropped.  Those already running finish in the background.
+            for future in pending:
+                future.cancel()
+
+    async def ainvoke(self, prompt: Sequence[tuple[Llm.Role | str, str] | str] | str, **kwargs) -> dict:
+        if "split_argument" in kwargs:
+            return await super().ainvoke(prompt, **kwargs)
+
+        hedge = kwargs.pop("idempotent", True)
+        backends = iter(self.rank())
+        pending = {}
+        hedged = False
+        error = None
+
+        def submit():
+            backend = next(backends, None)
+            if backend:
+                pending[asyncio.create_task(self.__atimed(backend, backend.ainvoke, prompt, **kwargs))] = backend
+
+        submit()
+        try:
+            while pending:
+                delay = self.__hedge_delay(next(iter(pending.values()))) if hedge and not hedged and len(pending) == 1 else None
+                done, _ = await asyncio.wait(pending, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    logging.info(f"{type(pending[next(iter(pending))]).__name__} slower than {delay:.2f}s.  Hedging.")
+                    submit()
+                    hedged = True
+                    continue
+
+                for task in done:
+                    backend = pending.pop(task)
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+                    logging.warning(f"{type(backend).__name__} failed: {error}")
+
+                if not pending:
+                    submit()
+
+            raise error
+
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stream(self, prompt: Sequence[tuple[Llm.Role | str, str] | str] | str, **kwargs) -> Iterator[dict]:
+        """Stream from the fastest backend.  Streams are neither hedged nor failed over once started."""
+        backend = self.rank()[0]
+        Llm.from_cache.set(False)
+        start = time.monotonic()
+        try:
+            yield from backend.stream(prompt, **kwargs)
+        except Exception:
+            self.__record(backend, start, False)
+            raise
+        self.__record(backend, start, True)
+
+    async def astream(self, prompt: Sequence[tuple[Llm.Role | str, str] | str] | str, **kwargs) -> AsyncIterator[dict]:
+        backend = self.rank()[0]
+        Llm.from_cache.set(False)
+        start = time.monotonic()
+        try:
+            async for delta in backend.astream(prompt, **kwargs):
+                yield delta
+        except Exception:
+            self.__record(backend, start, False)
+            raise
+        self.__record(backend, start, True)
+
+    def clean_up_response(self, response: Any) -> dict:
+        return self.backends[0].clean_up_response(response)
+
+    def get_max_tokens(self) -> int:
+        return min(b.get_max_tokens() for b in self.backends)
+
+    @classmethod
+    def get_supported_models(cls) -> List[str]:
+        import llms
+        return llms.supported_models()
+
+    def as_runnable(self) -> Runnable:
+        return self.rank()[0].as_runnable()
+
+    def as_language_model(self) -> BaseLanguageModel:
+        return self.rank()[0].as_language_model()
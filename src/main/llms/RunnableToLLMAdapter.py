@@ -1,10 +1,10 @@
-from typing import Union, Any, Optional
+from typing import Union, Any, Optional, List, ClassVar
 
 from langchain.agents import AgentExecutor  # This is needed!  Or pydantic will complain
 from langchain_core.language_models import BaseLanguageModel, LanguageModelInput
-from langchain_core.messages import BaseMessage
-from langchain_core.outputs import LLMResult
-from langchain_core.runnables import Runnable
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import LLMResult, Generation
+from langchain_core.runnables import Runnable, RunnableConfig
 from pydantic import BaseModel, Field
 
 __xxx = AgentExecutor  # So the import above won't get automatically removed
@@ -13,6 +13,15 @@ __xxx = AgentExecutor  # So the import above won't get automatically removed
 class RunnableToLLMAdapter(BaseLanguageModel):
     runnable: Runnable = Field(...)
 
+    # Maximum number of prompts of a batch sent at the same time
+    max_concurrency: int = Field(default=8)
+
+    # Generation parameters passed on to the runnable by generate_prompt().  Other arguments from LangChain, e.g.,
+    # tags or metadata, are not understood by the providers.
+    GENERATION_PARAMS: ClassVar[List[str]] = [
+        "temperature", "max_tokens", "top_p", "seed", "frequency_penalty", "presence_penalty",
+    ]
+
     def __init__(self, runnable: Runnable, **kwargs):
         super().__init__(runnable=runnable, **kwargs)
 
@@ -20,38 +29,61 @@ class RunnableToLLMAdapter(BaseLanguageModel):
     def _llm_type(self) -> str:
         return "runnable_adapter"
 
+    def __batch_config(self, config: RunnableConfig | List[RunnableConfig] | None) -> RunnableConfig | List[RunnableConfig]:
+        if isinstance(config, list):
+            return [{"max_concurrency": self.max_concurrency, **c} for c in config]
+        return {"max_concurrency": self.max_concurrency, **(config or {})}
+
+    def __generation_params(self, kwargs: dict) -> dict:
+        return {k: v for k, v in kwargs.items() if k in self.GENERATION_PARAMS}
+
     def generate_prompt(self, prompts, stop=None, callbacks=None, **kwargs):
         prompt_texts = [prompt.to_string() for prompt in prompts]
-        generations = [{"text": self.runnable.invoke(prompt)} for prompt in prompt_texts]
-        return LLMResult(generations=generations)
+        texts = self.runnable.batch(prompt_texts, self.__batch_config(None), **self.__generation_params(kwargs))
+        return LLMResult(generations=[[Generation(text=text)] for text in texts])
 
     async def agenerate_prompt(self, prompts, stop=None, callbacks=None, **kwargs):
-        import asyncio
         prompt_texts = [prompt.to_string() for prompt in prompts]
-        generations = await asyncio.gather(*[asyncio.to_thread(self.runnable.invoke, prompt) for prompt in prompt_texts])
-        return LLMResult(generations=[{"text": gen} for gen in generations])
+        texts = await self.runnable.abatch(prompt_texts, self.__batch_config(None), **self.__generation_params(kwargs))
+        return LLMResult(generations=[[Generation(text=text)] for text in texts])
 
     def predict(self, text, *, stop=None, **kwargs):
         return self.runnable.invoke(text, **kwargs)
 
     async def apredict(self, text, *, stop=None, **kwargs):
-        import asyncio
-        return await asyncio.to_thread(self.runnable.invoke, text)
+        return await self.runnable.ainvoke(text, **kwargs)
 
     def predict_messages(self, messages, *, stop=None, **kwargs):
         input_text = "\n".join([message.content for message in messages])
-        response = self.runnable.invoke(input_text)
-        return BaseMessage(content=response)
+        response = self.runnable.invoke(input_text, **kwargs)
+        return AIMessage(content=response)
 
     async def apredict_messages(self, messages, *, stop=None, **kwargs):
-        import asyncio
         input_text = "\n".join([message.content for message in messages])
-        response = await asyncio.to_thread(self.runnable.invoke, input_text)
-        return BaseMessage(content=response)
+        response = await self.runnable.ainvoke(input_text, **kwargs)
+        return AIMessage(content=response)
 
     def invoke(self, query, config=None, **kwargs):
         return self.runnable.invoke(query, **kwargs)
 
+    async def ainvoke(self, query, config=None, **kwargs):
+        return await self.runnable.ainvoke(query, **kwargs)
+
+    def batch(self, queries, config=None, *, return_exceptions=False, **kwargs):
+        return self.runnable.batch(queries, self.__batch_config(config), return_exceptions=return_exceptions, **kwargs)
+
+    async def abatch(self, queries, config=None, *, return_exceptions=False, **kwargs):
+        return await self.runnable.abatch(
+            queries, self.__batch_config(config), return_exceptions=return_exceptions, **kwargs
+        )
+
+    def stream(self, query, config=None, **kwargs):
+        yield from self.runnable.stream(query, config, **kwargs)
+
+    async def astream(self, query, config=None, **kwargs):
+        async for chunk in self.runnable.astream(query, config, **kwargs):
+            yield chunk
+
     def with_structured_output(self, schema: Union[dict, type], **kwargs: Any) -> \
             Runnable[LanguageModelInput, Union[dict, BaseModel]]:
         """
@@ -0,0 +1,187 @@
+import hashlib
+import math
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, Sequence
+
+
+class SemanticCache:
+    """
+    In-memory cache of answers to near-duplicate questions, e.g., "What was Microsoft revenue in FY2Q25?" and
+    "Microsoft FY2Q25 revenue?".
+
+    Questions are embedded into vectors, and a lookup returns the answer to the most similar question asked before
+    in the same scope (e.g., the same model and prompt template), if its cosine similarity reaches `threshold`.
+    By default, questions are embedded as hashed bags of words without stop words, plus the order of nearby words, and
+    only match questions with the same numbers, so that "FY2Q24" never matches "FY2Q25" and "revenue higher than
+    income" never matches "income higher than revenue".  Any embedding function can be plugged in instead.
+    The least recently used entries are evicted beyond `max_entries`.
+
+    Usage:
+        Llm.semantic_cache = SemanticCache()                  # For every model in the process
+        llm = llms.of("llama-3", semantic_cache=SemanticCache(threshold=0.95))    # For a single model
+    """
+
+    @dataclass
+    class Entry:
+        scope: Hashable
+        text: str
+        vector: dict[int, float]
+        numbers: frozenset[str]
+        value: Any
+
+    DEFAULT_THRESHOLD = 0.9
+    DEFAULT_MAX_ENTRIES = 10_000
+    DIMENSIONS = 1 << 20
+
+    # Words within this distance are also embedded as ordered pairs, each weighing this much relative to a word.
+    # A light weight keeps questions asked in another order similar, while a question with its comparison reversed
+    # shares none of its pairs.
+    ORDER_WINDOW = 3
+    ORDER_WEIGHT = 0.5
+
+    STOP_WORDS = frozenset("""
+        a an and are as at be been by can could did do does for from had has have how i in is it its me my of on or
+        our please tell than that the their there these this those to was were what when where which who whom why
+        will with would you your
+        """.split())
+
+    __WORD = re.compile(r"\w+")
+
+    def __init__(
+            self,
+            threshold: float = DEFAULT_THRESHOLD,
+            max_entries: int = DEFAULT_MAX_ENTRIES,
+            embed: Callable[[str], Sequence[float]] = None,
+            match_numbers: bool = True,
+    ):
+        """
+        Args:
+            threshold: Minimum cosine similarity of a hit
+            max_entries: Number of entries kept over all scopes
+            embed: Embeds a text into a dense vector, e.g., `embed_query` of LangChain embeddings.
+                Default to hashed bags of words.
+            match_numbers: Only match questions mentioning the same numbers
+        """
+        if not 0 < threshold <= 1:
+            raise ValueError(f"Similarity threshold must be in (0, 1], not {threshold}")
+
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.embed = embed
+        self.match_numbers = match_numbers
+
+        self.entries: OrderedDict[int, SemanticCache.Entry] = OrderedDict()
+        self.scopes: dict[Hashable, set[int]] = {}
+        self.next_id = 0
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def words_of(cls, text: str) -> list[str]:
+        return [w for w in cls.__WORD.findall(text.lower()) if w not in cls.STOP_WORDS]
+
+    @classmethod
+    def pairs_of(cls, words: Sequence[str]) -> list[str]:
+        """Ordered pairs of words near each other, e.g., "revenue income" in "revenue higher income" """
+        return [
+            f"{first} {second}"
+            for i, first in enumerate(words)
+            for second in words[i + 1:i + 1 + cls.ORDER_WINDOW]
+        ]
+
+    @classmethod
+    def hash_words(cls, words: Sequence[str], weight: float = 1.0, vector: dict[int, float] = None) -> dict[int, float]:
+        vector = {} if vector is None else vector
+        for word in words:
+            dimension = int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest(), "big") % cls.DIMENSIONS
+            vector[dimension] = vector.get(dimension, 0.0) + weight
+        return vector
+
+    def vector_of(self, text: str) -> dict[int, float]:
+        """Unit vector of the text, as a sparse {dimension: value} dict"""
+        if self.embed:
+            vector = {i: float(v) for i, v in enumerate(self.embed(text)) if v}
+        else:
+            words = self.words_of(text)
+            vector = self.hash_words(self.pairs_of(words), self.ORDER_WEIGHT, self.hash_words(words))
+
+        norm = math.sqrt(sum(v * v for v in vector.values()))
+        return {i: v / norm for i, v in vector.items()} if norm else {}
+
+    @classmethod
+    def similarity(cls, a: dict[int, float], b: dict[int, float]) -> float:
+        if len(a) > len(b):
+            a, b = b, a
+        return sum(v * b.get(i, 0.0) for i, v in a.items())
+
+    def numbers_of(self, text: str) -> frozenset[str]:
+        if not self.match_numbers:
+            return frozenset()
+        return frozenset(w for w in self.__WORD.findall(text.lower()) if any(c.isdigit() for c in w))
+
+    def get(self, scope: Hashable, text: str) -> Any:
+        """The answer to the most similar question in the scope, or None if there is none similar enough"""
+        vector, numbers = self.vector_of(text), self.numbers_of(text)
+
+        with self.lock:
+            best, best_similarity = None, self.threshold
+            for entry_id in self.scopes.get(scope, ()):
+                entry = self.entries[entry_id]
+                if entry.numbers != numbers:
+                    continue
+                similarity = self.similarity(vector, entry.vector)
+                if similarity >= best_similarity:
+                    best, best_similarity = entry_id, similarity
+
+            if best is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.entries.move_to_end(best)
+            return self.entries[best].value
+
+    def put(self, scope: Hashable, text: str, value: Any):
+        entry = self.Entry(scope=scope, text=text, vector=self.vector_of(text), numbers=self.numbers_of(text), value=value)
+        if not entry.vector:
+            return
+
+        with self.lock:
+            entry_id = self.next_id
+            self.next_id += 1
+            self.entries[entry_id] = entry
+            self.scopes.setdefault(scope, set()).add(entry_id)
+
+            while len(self.entries) > self.max_entries:
+                evicted_id, evicted = self.entries.popitem(last=False)
+                ids = self.scopes[evicted.scope]
+                ids.discard(evicted_id)
+                if not ids:
+                    del self.scopes[evicted.scope]
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.scopes.clear()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self.entries),
+                "scopes": len(self.scopes),
+            }
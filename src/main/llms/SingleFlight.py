@@ -0,0 +1,88 @@
+import asyncio
+import threading
+from concurrent.futures import Future, CancelledError
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class SingleFlight:
+    """
+    Coalesces identical calls in flight.  The first caller of a key makes the call, and callers of the same key
+    arriving before it finishes wait for its result (or its exception) instead of making the call again.
+
+    Sync and async callers of the same key are coalesced with each other, across threads and event loops.
+    If the first caller is cancelled, a waiting caller takes over the call.
+    """
+
+    def __init__(self):
+        self.calls: dict[Hashable, Future] = {}
+        self.lock = threading.Lock()
+        self.coalesced = 0
+
+    def __join(self, key: Hashable) -> tuple[Future, bool]:
+        """The future of the call in flight, and whether the caller shall make the call"""
+        with self.lock:
+            future = self.calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = self.calls[key] = Future()
+            return future, True
+
+    def __finish(self, key: Hashable, future: Future, result: Any = None, error: BaseException = None):
+        with self.lock:
+            self.calls.pop(key, None)
+
+        if isinstance(error, (asyncio.CancelledError, KeyboardInterrupt)):
+            future.cancel()
+        elif error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def call(self, key: Hashable, function: Callable[[], Any]) -> tuple[Any, bool]:
+        """
+        Call `function` unless a call of the same key is in flight.
+
+        Returns:
+            tuple: The result, and whether it was shared from another caller's call
+        """
+        while True:
+            future, leader = self.__join(key)
+            if not leader:
+                try:
+                    return future.result(), True
+                except CancelledError:
+                    if future.cancelled():
+                        continue
+                    raise
+
+            try:
+                result = function()
+            except BaseException as e:
+                self.__finish(key, future, error=e)
+                raise
+            self.__finish(key, future, result)
+            return result, False
+
+    async def acall(self, key: Hashable, function: Callable[[], Awaitable[Any]]) -> tuple[Any, bool]:
+        while True:
+            future, leader = self.__join(key)
+            if not leader:
+                try:
+                    # Shielded, so that cancelling this caller does not cancel the call shared with others
+                    return await asyncio.shield(asyncio.wrap_future(future)), True
+                except asyncio.CancelledError:
+                    if future.cancelled():
+                        continue
+                    raise
+
+            try:
+                result = await function()
+            except BaseException as e:
+                self.__finish(key, future, error=e)
+                raise
+            self.__finish(key, future, result)
+            return result, False
+
+    def __len__(self) -> int:
+        return len(self.calls)
@@ -0,0 +1,185 @@
+import bisect
+import json
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, List, Sequence
+
+
+class Telemetry:
+    """
+    Records every call to the models and aggregates them into histograms per provider, model and prompt.
+
+    Set an instance as `Llm.telemetry` to record the calls of every model, or on a single model.  The aggregates
+    can be dumped as JSON or in the Prometheus text format.  Listeners added with `add_listener()` receive each
+    call as it finishes, e.g., to log it or forward it to another metrics system.
+    """
+
+    @dataclass
+    class Call:
+        provider: str
+        model: str | None
+        prompt: str = ""                    # Short hash of the prompt template
+        start: float = field(default_factory=time.monotonic)
+        queue_wait: float = 0.0             # Seconds waiting for the rate limiter
+        ttft: float | None = None           # Seconds to the first token (or the whole response, if not streamed)
+        latency: float | None = None        # Seconds to the whole response
+        prompt_tokens: int | None = None
+        completion_tokens: int | None = None
+        retries: int = 0
+        cached: bool = False
+        coalesced: bool = False             # Shared the response of an identical call in flight
+        error: str | None = None
+        cost: float | None = None
+
+        def first_token(self):
+            if self.ttft is None:
+                self.ttft = time.monotonic() - self.start
+
+        def finish(self):
+            self.latency = time.monotonic() - self.start
+            if self.ttft is None and self.error is None:
+                self.ttft = self.latency
+
+    class Histogram:
+        """Counts of observations at most each bucket's upper bound, as Prometheus histograms do"""
+
+        def __init__(self, buckets: Sequence[float]):
+            self.buckets = list(buckets)
+            self.counts = [0] * (len(self.buckets) + 1)     # The last one counts those beyond every bucket
+            self.count = 0
+            self.sum = 0.0
+
+        def observe(self, value: float):
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+
+        def quantile(self, q: float) -> float | None:
+            """Upper bound of the bucket holding the q-quantile"""
+            if not self.count:
+                return None
+            rank, seen = q * self.count, 0
+            for bound, count in zip(self.buckets + [float("inf")], self.counts):
+                seen += count
+                if seen >= rank:
+                    return bound
+            return float("inf")
+
+        def cumulative(self) -> List[tuple[float, int]]:
+            result, seen = [], 0
+            for bound, count in zip(self.buckets + [float("inf")], self.counts):
+                seen += count
+                result.append((bound, seen))
+            return result
+
+        def to_dict(self) -> dict:
+            return {
+                "count": self.count,
+                "sum": self.sum,
+                "p50": self.quantile(0.5),
+                "p95": self.quantile(0.95),
+                "buckets": {("+Inf" if bound == float("inf") else bound): n for bound, n in self.cumulative()},
+            }
+
+    SECONDS_BUCKETS = [0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120]
+    TOKENS_BUCKETS = [10, 100, 500, 1000, 5000, 10_000, 50_000, 100_000, 500_000, 1_000_000]
+
+    # Histograms recorded per call: (name, unit, buckets)
+    __HISTOGRAMS = [
+        ("queue_wait", "seconds", SECONDS_BUCKETS),
+        ("ttft", "seconds", SECONDS_BUCKETS),
+        ("latency", "seconds", SECONDS_BUCKETS),
+        ("prompt_tokens", "tokens", TOKENS_BUCKETS),
+        ("completion_tokens", "tokens", TOKENS_BUCKETS),
+    ]
+    __COUNTERS = ["calls", "errors", "retries", "cached", "coalesced", "cost"]
+
+    def __init__(self, prices: dict[str, tuple[float, float]] = None):
+        """
+        Args:
+            prices: Dollars per million prompt and completion tokens, by model, for estimating the cost of calls
+        """
+        self.prices = dict(prices or {})
+        self.listeners: List[Callable[["Telemetry.Call"], None]] = []
+        self.series: dict[tuple, dict] = {}
+        self.lock = threading.Lock()
+
+    def add_listener(self, listener: Callable[["Telemetry.Call"], None]):
+        self.listeners.append(listener)
+
+    def record(self, call: Call):
+        if call.cost is None and not call.cached and not call.coalesced and call.model in self.prices:
+            prompt_price, completion_price = self.prices[call.model]
+            call.cost = ((call.prompt_tokens or 0) * prompt_price + (call.completion_tokens or 0) * completion_price) / 1e6
+
+        labels = (call.provider, call.model or "", call.prompt)
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = {
+                    **{name: 0 for name in self.__COUNTERS},
+                    **{name: self.Histogram(buckets) for name, _, buckets in self.__HISTOGRAMS},
+                }
+
+            series["calls"] += 1
+            series["errors"] += call.error is not None
+            series["retries"] += call.retries
+            series["cached"] += call.cached
+            series["coalesced"] += call.coalesced
+            series["cost"] += call.cost or 0.0
+            for name, _, _ in self.__HISTOGRAMS:
+                value = getattr(call, name)
+                if value is not None:
+                    series[name].observe(value)
+
+        for listener in self.listeners:
+            listener(call)
+
+    def clear(self):
+        with self.lock:
+            self.series.clear()
+
+    def to_dict(self) -> List[dict]:
+        with self.lock:
+            return [
+                {
+                    "labels": {"provider": provider, "model": model, "prompt": prompt},
+                    **{name: series[name] for name in self.__COUNTERS},
+                    **{name: series[name].to_dict() for name, _, _ in self.__HISTOGRAMS},
+                }
+                for (provider, model, prompt), series in self.series.items()
+            ]
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.to_dict(), **kwargs)
+
+    def to_prometheus(self, prefix: str = "llm") -> str:
+        """The aggregates in the Prometheus text exposition format"""
+        def escape(value: str) -> str:
+            return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+        def labels_of(labels: tuple, **extra) -> str:
+            pairs = list(zip(["provider", "model", "prompt"], labels)) + list(extra.items())
+            return "{" + ",".join(f'{k}="{escape(str(v))}"' for k, v in pairs) + "}"
+
+        lines = []
+        with self.lock:
+            for name in self.__COUNTERS:
+                metric = f"{prefix}_{name}" + ("_dollars_total" if name == "cost" else "_total")
+                lines.append(f"# TYPE {metric} counter")
+                for labels, series in self.series.items():
+                    lines.append(f"{metric}{labels_of(labels)} {series[name]}")
+
+            for name, unit, _ in self.__HISTOGRAMS:
+                metric = f"{prefix}_{name}" if name.endswith(unit) else f"{prefix}_{name}_{unit}"
+                lines.append(f"# TYPE {metric} histogram")
+                for labels, series in self.series.items():
+                    histogram = series[name]
+                    for bound, count in histogram.cumulative():
+                        le = "+Inf" if bound == float("inf") else bound
+                        lines.append(f"{metric}_bucket{labels_of(labels, le=le)} {count}")
+                    lines.append(f"{metric}_sum{labels_of(labels)} {histogram.sum}")
+                    lines.append(f"{metric}_count{labels_of(labels)} {histogram.count}")
+
+        return "\n".join(lines) + "\n"
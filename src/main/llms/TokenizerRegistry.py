@@ -0,0 +1,162 @@
+import logging
+import math
+import re
+import threading
+from abc import ABC, abstractmethod
+from typing import List, Sequence
+
+
+class TokenizerRegistry:
+    """
+    Process-wide registry of token counters, one per model, loaded lazily on first use.
+
+    Each model is counted with its own tokenizer when one is available offline (tiktoken for OpenAI models,
+    HuggingFace tokenizers for open models).  Otherwise, a fast estimator calibrated for the model family is used.
+    The estimator counts CJK characters separately, since they take far more tokens per character than English.
+    """
+
+    class Counter(ABC):
+        @abstractmethod
+        def count(self, text: str) -> int:
+            pass
+
+        def count_many(self, texts: Sequence[str]) -> List[int]:
+            return [self.count(t) for t in texts]
+
+    class TiktokenCounter(Counter):
+        def __init__(self, encoding):
+            self.encoding = encoding
+
+        def count(self, text: str) -> int:
+            return len(self.encoding.encode_ordinary(text))
+
+        def count_many(self, texts: Sequence[str]) -> List[int]:
+            return [len(tokens) for tokens in self.encoding.encode_ordinary_batch(list(texts))]
+
+    class HuggingFaceCounter(Counter):
+        def __init__(self, tokenizer):
+            self.tokenizer = tokenizer
+
+        def count(self, text: str) -> int:
+            return len(self.tokenizer.encode(text, add_special_tokens=False))
+
+        def count_many(self, texts: Sequence[str]) -> List[int]:
+            encoded = self.tokenizer(list(texts), add_special_tokens=False)["input_ids"]
+            return [len(tokens) for tokens in encoded]
+
+    class EstimatingCounter(Counter):
+        """
+        Estimates token counts without a tokenizer.  CJK characters cost `cjk_rate` tokens each.  Other text is
+        split into words, digit groups and punctuation, as BPE tokenizers roughly do.  Long words cost a token per
+        `word_chars` characters.  The rates lean towards over-counting so that packed prompts stay within limits.
+        """
+        __CJK = re.compile(r"[\u3000-\u303f\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]")
+        __PIECES = re.compile(r"[^\W\d_]+|\d{1,3}|[^\w\s]|\s*\n")
+
+        def __init__(self, cjk_rate: float, word_chars: int = 8):
+            self.cjk_rate = cjk_rate
+            self.word_chars = word_chars
+
+        def count(self, text: str) -> int:
+            cjk = len(self.__CJK.findall(text))
+            others = self.__CJK.sub(" ", text)
+
+            tokens = 0
+            for piece in self.__PIECES.findall(others):
+                tokens += math.ceil(len(piece) / self.word_chars) if piece[0].isalpha() else 1
+
+            return math.ceil(cjk * self.cjk_rate) + tokens
+
+    # Tokens per CJK character, by model family (first match wins).  Used when the exact tokenizer is not available.
+    __CJK_RATES = [
+        ("gpt-4o", 0.8), ("o1", 0.8), ("o3", 0.8), ("gpt-4.5", 0.8),
+        ("gpt-4", 1.3), ("gpt-3.5", 1.3),
+        ("gemini", 0.8),
+        ("deepseek", 0.7),
+        ("llama-2", 2.0),
+        ("llama-3", 1.0), ("l3.3", 1.0), ("llama-4", 1.0),
+        ("wizardlm", 1.5),
+    ]
+    __DEFAULT_CJK_RATE = 1.5
+
+    # Models served by an OpenAI-compatible API that are not themselves HuggingFace repos
+    __NOT_ON_HUGGINGFACE = ["google/"]
+
+    # Set to True to let HuggingFace tokenizers be downloaded.  Otherwise, only locally cached ones are used.
+    allow_download = False
+
+    __counters: dict[str, Counter] = {}
+    __lock = threading.Lock()
+
+    @classmethod
+    def get(cls, model_name: str | None) -> Counter:
+        model_name = model_name or ""
+        counter = cls.__counters.get(model_name)
+        if counter:
+            return counter
+
+        with cls.__lock:
+            if model_name not in cls.__counters:
+                cls.__counters[model_name] = cls.__load(model_name)
+            return cls.__counters[model_name]
+
+    @classmethod
+    def count(cls, model_name: str | None, text: str) -> int:
+        return cls.get(model_name).count(text)
+
+    @classmethod
+    def count_many(cls, model_name: str | None, texts: Sequence[str]) -> List[int]:
+        return cls.get(model_name).count_many(texts)
+
+    @classmethod
+    def __load(cls, model_name: str) -> Counter:
+        if "/" in model_name:
+            if not any(model_name.startswith(p) for p in cls.__NOT_ON_HUGGINGFACE):
+                counter = cls.__load_huggingface(model_name)
+                if counter:
+                    return counter
+        elif model_name.startswith(("gpt", "o1", "o3")):
+            counter = cls.__load_tiktoken(model_name)
+            if counter:
+                return counter
+
+        logging.info(f"Estimating token counts for {model_name or 'unknown models'}")
+        return cls.EstimatingCounter(cls.__cjk_rate_of(model_name))
+
+    @classmethod
+    def __load_tiktoken(cls, model_name: str) -> Counter | None:
+        try:
+            import tiktoken
+            try:
+                encoding = tiktoken.encoding_for_model(model_name)
+            except KeyError:
+                encoding = tiktoken.get_encoding("o200k_base")
+            return cls.TiktokenCounter(encoding)
+
+        except Exception as e:
+            logging.warning(f"tiktoken encoding for {model_name} not available: {e}")
+            return None
+
+    @classmethod
+    def __load_huggingface(cls, model_name: str) -> Counter | None:
+        try:
+            from transformers import AutoTokenizer
+            tokenizer = AutoTokenizer.from_pretrained(model_name, local_files_only=not cls.allow_download)
+            return cls.HuggingFaceCounter(tokenizer)
+
+        except Exception as e:
+            logging.info(f"HuggingFace tokenizer for {model_name} not available: {e}")
+            return None
+
+    @classmethod
+    def __cjk_rate_of(cls, model_name: str) -> float:
+        name = model_name.lower().split("/")[-1]
+        for family, rate in cls.__CJK_RATES:
+            if family in name:
+                return rate
+        return cls.__DEFAULT_CJK_RATE
+
+    @classmethod
+    def clear(cls):
+        with cls.__lock:
+            cls.__counters.clear()
@@ -1,17 +1,136 @@
-from llms.GeminiLlm import GeminiLlm
-from llms.Llm import Llm
-from llms.DeepInfraLlm import DeepInfraLlm
-from llms.DeepSeekLlm import DeepSeekLlm
-from llms.GptLlm import GptLlm
-from llms.LlamaLlm import LlamaLlm
+import importlib
+import threading
+from typing import List
 
+from llms.ModelCatalog import ModelCatalog
 
-def of(model_name: str, **kwargs) -> Llm:
-    bots = [GptLlm, GeminiLlm, DeepInfraLlm, LlamaLlm, DeepSeekLlm]
+# Models (and aliases) served by each provider, in order of preference when several providers serve a model, and
+# extended by register()
+_PROVIDERS: dict[str, List[str]] = {provider: ModelCatalog.models_of(provider) for provider in ModelCatalog.PROVIDERS}
+_PROVIDERS_LOCK = threading.Lock()
 
-    for bot in bots:
-        if model_name in bot.get_supported_models():
-            return bot(model_name, **kwargs)
+# Classes exported by this package, and the modules defining them.  Imported on first access.
+_EXPORTS = {
+    "Llm": "llms.Llm",
+    "ModelCatalog": "llms.ModelCatalog",
+    "ResponseCache": "llms.ResponseCache",
+    "SemanticCache": "llms.SemanticCache",
+    "SingleFlight": "llms.SingleFlight",
+    "PromptPacker": "llms.PromptPacker",
+    "TokenizerRegistry": "llms.TokenizerRegistry",
+    "ConnectionPool": "llms.ConnectionPool",
+    "RateLimiter": "llms.RateLimiter",
+    "Telemetry": "llms.Telemetry",
+    "RoutedLlm": "llms.RoutedLlm",
+    "GptLlm": "llms.GptLlm",
+    "GeminiLlm": "llms.GeminiLlm",
+    "DeepInfraLlm": "llms.DeepInfraLlm",
+    "LlamaLlm": "llms.LlamaLlm",
+    "DeepSeekLlm": "llms.DeepSeekLlm",
+}
 
-    raise RuntimeError(f"Model {model_name} not supported.")
 
+def __getattr__(name: str):
+    """Import exported classes on first access, so that `import llms` does not pull in every provider SDK."""
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__} has no attribute {name}")
+
+    cls = class_of(name)
+    globals()[name] = cls
+    return cls
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(_EXPORTS))
+
+
+def class_of(name: str) -> type:
+    """
+    An exported class by name.  Unlike `getattr(llms, name)`, never returns the module of the same name, which
+    importing `llms.GptLlm` directly binds to the package.
+    """
+    return getattr(importlib.import_module(_EXPORTS[name]), name)
+
+
+def register(provider: str, module: str, models: List[str]):
+    """
+    Register a provider class (or more models of a known provider) with `of()`.
+
+    Args:
+        provider: Name of the Llm subclass
+        module: Module defining the class, imported only when one of the models is used
+        models: Model names and aliases supported by the provider
+    """
+    _EXPORTS[provider] = module
+    with _PROVIDERS_LOCK:
+        known = _PROVIDERS.get(provider, [])
+        _PROVIDERS[provider] = known + [m for m in models if m not in known]
+
+
+def resolve(model_name: str) -> str:
+    """Name of the provider class serving the model.  Imports nothing."""
+    return providers_of(model_name)[0]
+
+
+def providers_of(model_name: str) -> List[str]:
+    """Names of all provider classes serving the model, in order of preference.  Imports nothing."""
+    providers = [provider for provider, models in _PROVIDERS.items() if model_name in models]
+    if not providers:
+        raise RuntimeError(f"Model {model_name} not supported.")
+    return providers
+
+
+def model_id_of(model_name: str, provider: str) -> str:
+    """The model a provider serves by this name or alias, e.g., "meta-llama/Llama-3.3-70B-Instruct" for "llama-3"."""
+    return ModelCatalog.MODEL_ALIASES.get(provider, {}).get(model_name, model_name)
+
+
+def supported_models() -> List[str]:
+    return list(dict.fromkeys(m for models in _PROVIDERS.values() for m in models))
+
+
+# Instances created by of(reuse=True).  Instances need not be shared to share warm connections, since the
+# inference clients are shared by ConnectionPool anyway.
+_INSTANCES: dict[tuple, "Llm"] = {}
+_INSTANCES_LOCK = threading.Lock()
+
+
+def of(
+        model_name: str,
+        response_cache: "ResponseCache" = None,
+        semantic_cache: "SemanticCache" = None,
+        reuse: bool = False,
+        **kwargs
+) -> "Llm":
+    """
+    Get a model by its name or alias.
+
+    Args:
+        model_name: Name or alias of the model
+        response_cache: Cache for the responses of this model
+        semantic_cache: Cache for the responses of this model to near-duplicate prompts
+        reuse: Return the instance created earlier with the same arguments, if any.  Settings of a shared instance,
+            e.g., its response_cache, telemetry or in_flight, then apply to every caller of the same arguments.
+        kwargs: Arguments to the provider class
+    """
+    key = (model_name, response_cache, semantic_cache, repr(sorted(kwargs.items())))
+    if reuse and key in _INSTANCES:
+        return _INSTANCES[key]
+
+    bot = class_of(resolve(model_name))
+
+    llm = bot(model_name, **kwargs)
+    if response_cache:
+        llm.response_cache = response_cache
+    if semantic_cache is not None:
+        llm.semantic_cache = semantic_cache
+
+    if reuse:
+        with _INSTANCES_LOCK:
+            llm = _INSTANCES.setdefault(key, llm)
+    return llm
+
+
+def clear_instances():
+    with _INSTANCES_LOCK:
+        _INSTANCES.clear()
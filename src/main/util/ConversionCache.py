@@ -0,0 +1,108 @@
+import functools
+import hashlib
+import os
+from importlib import metadata
+from pathlib import Path
+from typing import BinaryIO, Callable
+
+from util.DiskCache import DiskCache
+
+
+class ConversionCache(DiskCache):
+    """
+    Persistent cache of documents converted to text, e.g., PDF to markdown.
+
+    Entries are keyed on the SHA-256 of the file content, the reader and the version of its output, the converter and
+    its version, and the reader options, so renamed or copied files are still hits while edited files, changed
+    readers or upgraded converters are misses.
+    Content digests are remembered by path, size and modification time, so unchanged files are not hashed again.
+
+    Usage:
+        DocumentReader.conversion_cache = ConversionCache()    # For every read in the process
+        text = DocumentReader.read(path, conversion_cache=ConversionCache("/tmp/my_cache"))     # For a single read
+    """
+
+    DEFAULT_DIRECTORY = os.environ.get(
+        "DOCUMENT_CACHE_DIR", os.path.expanduser("~/.cache/ec_digests/conversions")
+    )
+
+    # Bump when the keys or entries change.  Readers changing their output bump their own version instead.
+    VERSION = 1
+
+    __HASH_BLOCK_SIZE = 1 << 20
+
+    # A file, or its content as a buffer or a binary file object
+    Source = str | os.PathLike | bytes | bytearray | memoryview | BinaryIO
+
+    def __init__(self, directory: str = DEFAULT_DIRECTORY, **kwargs):
+        super().__init__(directory, **kwargs)
+
+        # Content digests by path.  Kept apart, so that they do not count as hits or misses of conversions.
+        self.digests = DiskCache(str(Path(directory) / "digests"), max_size=self.max_size)
+
+    @classmethod
+    @functools.cache
+    def version_of(cls, package: str) -> str:
+        try:
+            return metadata.version(package)
+        except metadata.PackageNotFoundError:
+            return "unknown"
+
+    def digest_of(self, source: Source) -> str:
+        """
+        SHA-256 of the content of a file, hashed only if the file is new or changed since it was last hashed.
+        Content given as a buffer or a seekable binary file is hashed every time.  Files are rewound after hashing.
+        """
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            return hashlib.sha256(source).hexdigest()
+        if not isinstance(source, (str, os.PathLike)):
+            position, digest = source.tell(), hashlib.sha256()
+            while block := source.read(self.__HASH_BLOCK_SIZE):
+                digest.update(block)
+            source.seek(position)
+            return digest.hexdigest()
+
+        path = os.path.abspath(source)
+        stat = os.stat(path)
+
+        known = self.digests.get(path)
+        if known and known["size"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns:
+            return known["digest"]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as fd:
+            while block := fd.read(self.__HASH_BLOCK_SIZE):
+                digest.update(block)
+
+        self.digests.put(path, {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "digest": digest.hexdigest()})
+        return digest.hexdigest()
+
+    def key_of(self, source: Source, converter: str, options: dict, reader: str = None) -> str:
+        digest = self.digest_of(source)
+        return self.make_key(self.VERSION, digest, reader, converter, self.version_of(converter), options)
+
+    def get_or_convert(
+            self,
+            source: Source,
+            convert: Callable[[], str],
+            converter: str,
+            options: dict = None,
+            reader: str = None,
+    ) -> str:
+        """
+        The cached text of the file, or the text converted now and cached.
+
+        Args:
+            source: The file, or its content as a buffer or a seekable binary file
+            convert: Converts the file into text
+            converter: The package converting the file, e.g., "pymupdf4llm"
+            options: Options of the conversion
+            reader: The function converting the file with the package, and the version of its output, e.g.,
+                "util.DocumentReader:DocumentReader.read_docx@2".  Readers sharing a package are cached apart.
+        """
+        key = self.key_of(source, converter, options or {}, reader)
+        text = self.get(key)
+        if text is None:
+            text = convert()
+            self.put(key, text)
+        return text
@@ -0,0 +1,210 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import Callable, Sequence
+
+from util.DocumentReader import DocumentReader
+
+
+class CorpusManifest:
+    """
+    Record of the files of a corpus ingested so far, e.g., data/earning_calls/<ticker>/..., and of the artifacts
+    derived from each file (chunks, extracted values, index entries), for ingesting only what changed since.
+
+    Files are told unchanged by their size and modification time, or else by the SHA-256 of their content,
+    so touched or copied-back files are not processed again.  New and changed files are read in parallel and
+    processed, and the artifacts of changed and deleted files are removed.
+
+    Usage:
+        def process(path: str, text: str) -> dict:
+            return {"chunks": index.insert(path, text)}     # Ids of the artifacts, by kind
+
+        manifest = CorpusManifest("data/earning_calls")
+        changes = manifest.ingest(process, remove=lambda path, artifacts: index.delete(artifacts["chunks"]))
+    """
+
+    @dataclass
+    class Entry:
+        size: int
+        mtime_ns: int
+        digest: str
+        artifacts: dict = field(default_factory=dict)      # Ids of the artifacts derived from the file, by kind
+        ingested: float = 0.0
+
+    @dataclass
+    class Changes:
+        """Files by their path relative to the corpus root"""
+        added: list[str] = field(default_factory=list)
+        changed: list[str] = field(default_factory=list)
+        deleted: list[str] = field(default_factory=list)
+        unchanged: int = 0
+        failed: list[str] = field(default_factory=list)     # Files that could not be read or processed
+
+    DEFAULT_NAME = ".manifest.json"
+    VERSION = 1
+
+    # Files ingested between saves of the manifest, so that an interrupted run loses little
+    __SAVE_EVERY = 100
+
+    def __init__(self, root: str, path: str = None, suffixes: Sequence[str] = None):
+        """
+        Args:
+            root: Root directory of the corpus
+            path: The manifest file.  Default to DEFAULT_NAME in the root directory.
+            suffixes: Suffixes of the files to ingest, e.g., [".pdf", ".txt"].  Default to every file type
+                `DocumentReader` reads.  Hidden files are never ingested.
+        """
+        self.root = Path(root)
+        self.path = Path(path) if path else self.root / self.DEFAULT_NAME
+        self.suffixes = {s.lower() for s in suffixes} if suffixes is not None else None
+        self.entries: dict[str, CorpusManifest.Entry] = {}
+
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as fd:
+                manifest = json.load(fd)
+            if manifest.get("version") != self.VERSION:
+                raise ValueError(f"{self.path} is of manifest version {manifest.get('version')}, not {self.VERSION}")
+            self.entries = {name: self.Entry(**entry) for name, entry in manifest["files"].items()}
+
+    def save(self):
+        """Write the manifest atomically, so that an interrupted write leaves the previous one intact"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = json.dumps({
+            "version": self.VERSION,
+            "files": {name: asdict(entry) for name, entry in sorted(self.entries.items())},
+        }, ensure_ascii=False, indent=1)
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def files(self) -> dict[str, os.stat_result]:
+        """The files of the corpus to ingest, by their path relative to the root"""
+        files = {}
+        for directory, directories, names in os.walk(self.root):
+            directories[:] = sorted(d for d in directories if not d.startswith("."))
+            for name in sorted(names):
+                path = Path(directory) / name
+                if name.startswith(".") or path == self.path or not self.__ingestible(path):
+                    continue
+                files[path.relative_to(self.root).as_posix()] = path.stat()
+        return files
+
+    def __ingestible(self, path: Path) -> bool:
+        if self.suffixes is not None:
+            return path.suffix.lower() in self.suffixes
+        try:
+            DocumentReader.reader_of(str(path))
+            return True
+        except (ValueError, OSError):
+            return False
+
+    @classmethod
+    def digest_of(cls, path: str) -> str:
+        with open(path, "rb") as fd:
+            return hashlib.file_digest(fd, "sha256").hexdigest()
+
+    def changes(self) -> tuple[Changes, dict[str, Entry]]:
+        """
+        Files added, changed and deleted since the last ingestion, without processing them.
+
+        Returns:
+            tuple: The changes, and the new entries of the added and changed files, without their artifacts
+        """
+        changes, entries = self.Changes(), {}
+        files = self.files()
+
+        for name, stat in files.items():
+            known = self.entries.get(name)
+            if known and known.size == stat.st_size and known.mtime_ns == stat.st_mtime_ns:
+                changes.unchanged += 1
+                continue
+
+            digest = self.digest_of(str(self.root / name))
+            if known and known.digest == digest:
+                # Touched but not changed.  Remember the new modification time, so that it is not hashed again.
+                known.size, known.mtime_ns = stat.st_size, stat.st_mtime_ns
+                changes.unchanged += 1
+                continue
+
+            entries[name] = self.Entry(size=stat.st_size, mtime_ns=stat.st_mtime_ns, digest=digest)
+            (changes.changed if known else changes.added).append(name)
+
+        changes.deleted = sorted(name for name in self.entries if name not in files)
+        return changes, entries
+
+    def ingest(
+            self,
+            process: Callable[[str, str], dict],
+            remove: Callable[[str, dict], None] = None,
+            workers: int = None,
+            **kwargs
+    ) -> Changes:
+        """
+        Process the files added or changed since the last ingestion, and remove the artifacts of the files
+        changed or deleted since.  Files that fail to be read or processed are retried next time.
+
+        Args:
+            process: Processes the text of a file, given its path relative to the root, into artifacts.
+                Returns the ids of the artifacts by kind, e.g., {"chunks": [...], "values": [...]}
+            remove: Removes the artifacts of a file, given its path relative to the root and the ids returned
+                by `process`
+            workers: Number of processes reading the files.  See `DocumentReader.read_many()`.
+            kwargs: Other options of `DocumentReader.read()`, e.g., conversion_cache
+
+        Returns:
+            Changes: The files added, changed, deleted and failed
+        """
+        start = time.monotonic()
+        changes, entries = self.changes()
+
+        for name in changes.deleted:
+            if remove is not None:
+                remove(name, self.entries[name].artifacts)
+            del self.entries[name]
+
+        names = changes.added + changes.changed
+        paths = {str(self.root / name): name for name in names}
+        try:
+            for i, result in enumerate(DocumentReader.read_many(list(paths), workers=workers, ordered=False, **kwargs)):
+                name = paths[result.path]
+                if not result.ok:
+                    changes.failed.append(name)
+                    continue
+
+                # The artifacts of the previous content go, whether or not the new content is processed
+                known = self.entries.pop(name, None)
+                if known is not None and remove is not None:
+                    remove(name, known.artifacts)
+
+                try:
+                    entries[name].artifacts = process(name, result.text) or {}
+                except Exception as e:
+                    logging.warning(f"Cannot process {name}: {type(e).__name__}: {e}")
+                    changes.failed.append(name)
+                    continue
+
+                entries[name].ingested = time.time()
+                self.entries[name] = entries[name]
+                if (i + 1) % self.__SAVE_EVERY == 0:
+                    self.save()
+        finally:
+            self.save()
+
+        logging.info(
+            f"Ingested {self.root} in {time.monotonic() - start:.1f}s: {len(changes.added)} added, "
+            f"{len(changes.changed)} changed, {len(changes.deleted)} deleted, {len(changes.failed)} failed, "
+            f"{changes.unchanged} unchanged"
+        )
+        return changes
@@ -0,0 +1,167 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+
+class DiskCache:
+    """
+    A content-addressed, on-disk key/value store for JSON-serializable values.
+
+    Each entry is a JSON file named after the SHA-256 of its key.  Entries older than `max_age` seconds are treated
+    as misses, and the least recently used entries are evicted once the store grows beyond `max_size` bytes.
+    Writes are atomic, so several processes can safely share one cache directory.
+    """
+
+    DEFAULT_MAX_SIZE = 1 << 30  # 1 GiB
+    DEFAULT_MAX_AGE = None      # Never expires
+
+    def __init__(self, directory: str, max_size: int = DEFAULT_MAX_SIZE, max_age: float = DEFAULT_MAX_AGE):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        self.max_size = max_size
+        self.max_age = max_age
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._index: dict[Path, tuple[int, float]] | None = None    # path -> (size, last access), built lazily
+        self._total_size = 0
+
+    def __getstate__(self) -> dict:
+        # Picklable, e.g., to pass to worker processes.  Each copy keeps its own lock, index and statistics.
+        return {"directory": str(self.directory), "max_size": self.max_size, "max_age": self.max_age}
+
+    def __setstate__(self, state: dict):
+        self.__init__(**state)
+
+    @classmethod
+    def make_key(cls, *parts: Any) -> str:
+        """Digest arbitrary JSON-like key parts into a stable hex key."""
+        serialized = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+    def _path_of(self, key: str) -> Path:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return self.directory / digest[:2] / f"{digest}.json"
+
+    def _load_index(self):
+        if self._index is not None:
+            return
+
+        self._index = {}
+        self._total_size = 0
+        for path in self.directory.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            self._index[path] = (stat.st_size, stat.st_mtime)
+            self._total_size += stat.st_size
+
+    def _forget(self, path: Path):
+        size, _ = self._index.pop(path, (0, 0)) if self._index is not None else (0, 0)
+        self._total_size -= size
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def get(self, key: str, default: Any = None) -> Any:
+        path = self._path_of(key)
+
+        try:
+            with open(path, "r", encoding="utf-8") as fd:
+                entry = json.load(fd)
+        except (FileNotFoundError, json.JSONDecodeError):
+            with self._lock:
+                self.misses += 1
+            return default
+
+        now = time.time()
+        with self._lock:
+            if self.max_age is not None and now - entry.get("created", 0) > self.max_age:
+                self._forget(path)
+                self.misses += 1
+                return default
+
+            self.hits += 1
+            if self._index is not None and path in self._index:
+                self._index[path] = (self._index[path][0], now)
+
+        # Touch the file so LRU eviction also works across processes
+        try:
+            os.utime(path, (now, now))
+        except FileNotFoundError:
+            pass
+
+        return entry["value"]
+
+    def put(self, key: str, value: Any):
+        path = self._path_of(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        data = json.dumps({"created": time.time(), "value": value}, ensure_ascii=False).encode("utf-8")
+
+        # Write to a temporary file first and atomically move it in place
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        with self._lock:
+            self._load_index()
+            old_size, _ = self._index.get(path, (0, 0))
+            self._index[path] = (len(data), time.time())
+            self._total_size += len(data) - old_size
+            self._evict()
+
+    def _evict(self):
+        if self.max_size is None or self._total_size <= self.max_size:
+            return
+
+        # Least recently used first
+        for path, _ in sorted(self._index.items(), key=lambda item: item[1][1]):
+            if self._total_size <= self.max_size:
+                break
+            self._forget(path)
+            self.evictions += 1
+
+        logging.debug(f"DiskCache {self.directory} evicted down to {self._total_size} bytes")
+
+    def delete(self, key: str):
+        with self._lock:
+            self._forget(self._path_of(key))
+
+    def clear(self):
+        with self._lock:
+            for path in self.directory.glob("*/*.json"):
+                os.remove(path)
+            self._index = {}
+            self._total_size = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._load_index()
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._index),
+                "size": self._total_size,
+            }
@@ -1,71 +1,409 @@
+import codecs
+import contextlib
+import datetime
+import importlib
+import io
+import logging
 import os
-from functools import partial
+import re
+import tempfile
+import time
+import zipfile
+from xml.etree import ElementTree
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Callable, List
+from typing import Any, BinaryIO, Callable, Sequence, Iterator, TYPE_CHECKING
 
-import pandas as pd
-import pptx2md
-import pymupdf4llm
-from html2text import HTML2Text
-from unstructured.partition.auto import partition
+from util.ConversionCache import ConversionCache
+
+# The converters are imported by the readers on first use, so that reading text files imports none of them
+if TYPE_CHECKING:
+    import pandas as pd
+    import pptx2md
+    import pymupdf
 
 
 class DocumentReader:
 
+    @dataclass
+    class ReadResult:
+        path: str
+        text: str | None = None
+        error: str | None = None        # Why the file could not be read, if it could not
+        seconds: float = 0.0
+
+        @property
+        def ok(self) -> bool:
+            return self.error is None
+
+    @dataclass
+    class Page:
+        number: int         # From 1
+        text: str
+
+    @dataclass
+    class SheetBlock:
+        sheet: str
+        first_row: int      # Row number of the first data row in the block, from 1.  0 if the sheet has no data.
+        text: str           # A markdown table of the rows, headed by the first row of the sheet
+
+    @dataclass
+    class Reader:
+        """Reads a type of file.  `function` may be given as "module:function", imported on first use."""
+        function: Callable[..., str] | str
+        converter: str | None = None        # Package converting the file, part of the conversion cache key
+        version: int = 1                    # Version of the output of the function, part of the conversion cache key
+        name: str = field(init=False)       # "module:function", the same before and after importing the function
+
+        def __post_init__(self):
+            if isinstance(self.function, str):
+                self.name = self.function
+            else:
+                self.name = f"{self.function.__module__}:{self.function.__qualname__}"
+
+        @property
+        def identity(self) -> str:
+            """The function and the version of its output, e.g., util.DocumentReader:DocumentReader.read_pdf@1"""
+            return f"{self.name}@{self.version}"
+
+        def __call__(self, source: "DocumentReader.Source", **kwargs) -> str:
+            if isinstance(self.function, str):
+                module, _, name = self.function.partition(":")
+                function = importlib.import_module(module)
+                for attribute in name.split("."):
+                    function = getattr(function, attribute)
+                self.function = function
+            return self.function(source, **kwargs)
+
+    # A file, or its content as bytes, a memoryview or a binary file object
+    Source = ConversionCache.Source
+
+    # Set to cache the conversions of every read in the process
+    conversion_cache: ConversionCache | None = None
+
+    # Readers by file suffix, and suffixes by the leading bytes of files, for files without a known suffix
+    __readers: dict[str, Reader] = {}
+    __signatures: list[tuple[bytes, str]] = [
+        (b"%PDF", ".pdf"),
+        (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", ".xls"),      # Legacy Office.  Excel is the most common.
+    ]
+
+    # Office Open XML files are zip archives, told apart by their top directory
+    __OOXML_DIRECTORIES = {"word/": ".docx", "ppt/": ".pptx", "xl/": ".xlsx"}
+    __SNIFF_SIZE = 4096
+
+    # Spreadsheet rows per block when streaming
+    DEFAULT_BLOCK_ROWS = 1000
+
+    # pptx2md versions whose parser and formatter render decks in memory.  Others convert to a temporary file.
+    __PPTX2MD_IN_MEMORY = "2."
+
+    # Written by pptx2md between slides, as a paragraph, with enable_slides
+    __PPTX2MD_SLIDE_SEPARATOR = "\n---\n\n\n"
+
+    # WordprocessingML namespace of the elements in .docx files
+    __W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
     @classmethod
-    def read_text(cls, path: str, **kwargs) -> str:
-        supported_extensions = kwargs.pop("supported_extensions", [])
-        if all([not path.endswith(ext) for ext in supported_extensions]):
-            raise ValueError(f"{path} is not one of {', '.join(supported_extensions)}")
+    def register(
+            cls,
+            suffixes: Sequence[str],
+            function: Callable[..., str] | str,
+            converter: str = None,
+            signature: bytes = None,
+            version: int = 1,
+    ):
+        """
+        Register a reader of a file type, replacing the current reader of the suffixes, if any.
+
+        Args:
+            suffixes: File suffixes, e.g., [".epub"]
+            function: Reads a file as text, with options as keyword arguments, or its "module:function" name
+                to import on first use
+            converter: Package converting the file, whose version is part of the conversion cache key.
+                None to not cache the conversions.
+            signature: Leading bytes of the files, for reading files without one of the suffixes
+            version: Version of the output of the function.  Bump it when the function changes its output, so that
+                the conversions cached before are not used.
+        """
+        reader = cls.Reader(function, converter, version)
+        for suffix in suffixes:
+            cls.__readers[suffix.lower()] = reader
+        if signature:
+            cls.__signatures.insert(0, (signature, suffixes[0].lower()))
+
+    @classmethod
+    def sniff(cls, source: Source) -> str | None:
+        """Suffix of the file type told by its content, or None if unknown.  File objects are rewound after."""
+        if cls.__is_path(source):
+            with open(source, "rb") as fd:
+                head = fd.read(cls.__SNIFF_SIZE)
+        elif cls.__is_buffer(source):
+            head = bytes(source[:cls.__SNIFF_SIZE])
+        else:
+            position = source.tell()
+            head = source.read(cls.__SNIFF_SIZE)
+            source.seek(position)
+
+        if head.startswith(b"PK\x03\x04"):
+            position = None if cls.__is_path(source) or cls.__is_buffer(source) else source.tell()
+            try:
+                with zipfile.ZipFile(cls.__file_of(source)) as archive:
+                    for name in archive.namelist():
+                        for directory, suffix in cls.__OOXML_DIRECTORIES.items():
+                            if name.startswith(directory):
+                                return suffix
+            except zipfile.BadZipFile:
+                return None
+            finally:
+                if position is not None:
+                    source.seek(position)
+
+        for signature, suffix in cls.__signatures:
+            if head.startswith(signature):
+                return suffix
 
-        with open(path, "r") as fd:
-            return fd.read()
+        # Otherwise, text if it decodes as UTF-8, allowing for a character cut off at the end of the sample
+        if b"\0" in head:
+            return None
+        try:
+            codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+            return ".txt"
+        except UnicodeDecodeError:
+            return None
 
     @classmethod
-    def read_pdf(cls, path: str, **kwargs) -> str:
-        supported_extensions = kwargs.pop("supported_extensions", [])
-        if all([not path.endswith(ext) for ext in supported_extensions]):
-            raise ValueError(f"{path} is not one of {', '.join(supported_extensions)}")
+    def reader_of(cls, source: Source, file_type: str = None) -> Reader:
+        """
+        Reader of the file type given, or else told by the suffix of the file name, or else by the file content.
 
-        input_path = Path(path)
-        return pymupdf4llm.to_markdown(input_path)
+        Args:
+            source: The file, or its content
+            file_type: Suffix of the file type, e.g., ".pdf" or "pdf"
+        """
+        if file_type is not None:
+            reader = cls.__readers.get("." + file_type.lower().lstrip("."))
+        else:
+            reader = cls.__readers.get(Path(cls.__name_of(source)).suffix.lower())
+            if reader is None and (not cls.__is_path(source) or os.path.isfile(source)):
+                reader = cls.__readers.get(cls.sniff(source))
+        if reader is None:
+            raise ValueError(f"Unsupported file type {file_type or cls.__name_of(source)}")
+        return reader
 
     @classmethod
-    def read_ppt(cls, path: str, **kwargs) -> str:
+    def __is_path(cls, source: Source) -> bool:
+        return isinstance(source, (str, os.PathLike))
 
-        supported_extensions = kwargs.pop("supported_extensions", [])
-        if all([not path.endswith(ext) for ext in supported_extensions]):
-            raise ValueError(f"{path} is not one of {', '.join(supported_extensions)}")
+    @classmethod
+    def __is_buffer(cls, source: Source) -> bool:
+        return isinstance(source, (bytes, bytearray, memoryview))
 
-        input_path = Path(path)
-        output_dir = kwargs.pop("text_directory", "/tmp")
-        output_path = Path(output_dir) / input_path.with_suffix(".md").name
+    @classmethod
+    def __name_of(cls, source: Source) -> str:
+        """Path of the file, or the name of the file object, for messages and telling the file type"""
+        if cls.__is_path(source):
+            return str(source)
+        name = getattr(source, "name", None)
+        return name if isinstance(name, str) else f"<{type(source).__name__}>"
 
-        # Ensure the output directory exists
-        output_path.parent.mkdir(parents=True, exist_ok=True)
+    @classmethod
+    def __content_of(cls, source: Source) -> Source:
+        """The source, with file objects that cannot seek, e.g., pipes, read into memory"""
+        if cls.__is_path(source) or cls.__is_buffer(source) or source.seekable():
+            return source
+        return source.read()
+
+    @classmethod
+    def __file_of(cls, source: Source) -> str | os.PathLike | BinaryIO:
+        """The source as a path or a seekable file object, for parsers that take either"""
+        source = cls.__content_of(source)
+        if cls.__is_buffer(source):
+            return io.BytesIO(source)     # Sharing the memory of bytes rather than copying them, until written
+        return source
+
+    @classmethod
+    def __buffer_of(cls, source: Source) -> bytes | memoryview | str:
+        """Content of a source other than a path, without copying the content already in memory"""
+        if isinstance(source, (bytes, memoryview)):
+            return source
+        if isinstance(source, bytearray):
+            return memoryview(source)
+        if isinstance(source, io.BytesIO):
+            # getvalue() shares its bytes with the BytesIO until either is written, unlike getbuffer(), whose view
+            # would keep the BytesIO from being resized or closed while the view lives
+            return memoryview(source.getvalue())[source.tell():]
+        return source.read()
+
+    @classmethod
+    def read_text(cls, source: Source, **kwargs) -> str:
+        if cls.__is_path(source):
+            with open(source, "r") as fd:
+                return fd.read()
+
+        content = cls.__buffer_of(source)
+        return content if isinstance(content, str) else str(content, "utf-8")
+
+    @classmethod
+    def read_pdf(cls, source: Source, **kwargs) -> str:
+        import pymupdf4llm
+
+        pages = kwargs.get("pages")
+        if pages is None:
+            with cls.__open_pdf(source) as document:
+                return pymupdf4llm.to_markdown(document)
+
+        # Any iterable of page numbers, converted in one batch
+        pages = list(pages)
+        if not pages:
+            return ""
+        return "".join(page.text for page in cls.read_pdf_pages(source, pages, batch_size=len(pages)))
+
+    @classmethod
+    def read_pdf_pages(
+            cls,
+            source: Source,
+            pages: Sequence[int] = None,
+            batch_size: int = 1,
+            **kwargs
+    ) -> Iterator[Page]:
+        """
+        Read a PDF as markdown page by page, yielding each page as soon as it is converted.
+
+        Args:
+            source: The PDF file, or its content
+            pages: Numbers of the pages to read, from 1, e.g., range(1, 11).  Default to all pages.
+            batch_size: Pages converted at a time
+            kwargs: Other options of `pymupdf4llm.to_markdown()`
+
+        Yields:
+            Page: The page number and its markdown
+        """
+        import pymupdf4llm
+
+        with cls.__open_pdf(source) as document:
+            pages = list(pages) if pages is not None else list(range(1, document.page_count + 1))
+            invalid = [p for p in pages if not 1 <= p <= document.page_count]
+            if invalid:
+                name = cls.__name_of(source)
+                raise ValueError(f"{name} has no page {invalid[0]}.  It has {document.page_count} pages.")
+
+            for start in range(0, len(pages), batch_size):
+                batch = pages[start:start + batch_size]
+                chunks = pymupdf4llm.to_markdown(document, pages=[p - 1 for p in batch], page_chunks=True, **kwargs)
+                for number, chunk in zip(batch, chunks):
+                    yield cls.Page(number=chunk.get("metadata", {}).get("page_number", number), text=chunk["text"])
+
+    @classmethod
+    def __open_pdf(cls, source: Source) -> "pymupdf.Document":
+        import pymupdf
+
+        source = cls.__content_of(source)
+        if cls.__is_path(source):
+            return pymupdf.open(source)
+        # PyMuPDF reads bytes and memoryviews in place
+        return pymupdf.open(stream=cls.__buffer_of(source), filetype="pdf")
+
+    @classmethod
+    def read_ppt(cls, source: Source, **kwargs) -> str:
+        return "".join(cls.__convert_ppt(source))
+
+    @classmethod
+    def read_ppt_slides(cls, source: Source, **kwargs) -> Iterator[Page]:
+        """
+        Read a deck as markdown slide by slide.  The slides joined are the text of `read_ppt()`.
+
+        Yields:
+            Page: The slide number and its markdown
+        """
+        for number, text in enumerate(cls.__convert_ppt(source), start=1):
+            yield cls.Page(number=number, text=text)
+
+    @classmethod
+    def __convert_ppt(cls, source: Source) -> list[str]:
+        """
+        Markdown of each slide.  The deck is rendered as a whole, so that titles repeated on the following slides
+        are dropped as by `pptx2md.convert()`, and then split between the slides.
+        """
+        import pptx2md
 
         config = pptx2md.ConversionConfig(
-            pptx_path=input_path,
-            output_path=output_path,
+            pptx_path=Path(cls.__name_of(source)),
+            output_path=Path(os.devnull),
             image_dir=None,
             disable_image=True,
+            enable_slides=True,
         )
-        pptx2md.convert(config)
+        if ConversionCache.version_of("pptx2md").startswith(cls.__PPTX2MD_IN_MEMORY):
+            text = cls.__render_ppt(config, source)
+        else:
+            text = cls.__convert_ppt_file(config, source)
+        return text.split(cls.__PPTX2MD_SLIDE_SEPARATOR) if text else []
+
+    @classmethod
+    def __render_ppt(cls, config: "pptx2md.ConversionConfig", source: Source) -> str:
+        """Markdown of the deck, rendered in memory rather than to the configured output file"""
+        from pptx import Presentation
+        from pptx2md.outputter import MarkdownFormatter
+        from pptx2md.parser import parse
+        from pptx2md.utils import load_pptx
 
-        md_content = output_path.read_text(encoding="utf-8")
-        os.remove(output_path)
-        return md_content
+        class BufferFormatter(MarkdownFormatter):
+            def __init__(self, config: "pptx2md.ConversionConfig"):
+                super().__init__(config)
+                self.ofile.close()
+                self.ofile = io.StringIO()
+
+            def close(self):
+                pass    # Keep the buffer to read
+
+        presentation = load_pptx(source) if cls.__is_path(source) else Presentation(cls.__file_of(source))
+        formatter = BufferFormatter(config)
+        formatter.output(parse(config, presentation))
+        return formatter.ofile.getvalue()
 
     @classmethod
-    def read_docx(cls, path: str, **kwargs) -> str:
-        supported_extensions = kwargs.pop("supported_extensions", [])
-        if all([not path.endswith(ext) for ext in supported_extensions]):
-            raise ValueError(f"{path} is not one of {', '.join(supported_extensions)}")
+    def __convert_ppt_file(cls, config: "pptx2md.ConversionConfig", source: Source) -> str:
+        """Markdown of the deck, converted by `pptx2md.convert()` to a temporary file of its own"""
+        import pptx2md
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = source
+            if not cls.__is_path(source):
+                path = Path(directory) / "deck.pptx"
+                path.write_bytes(cls.__buffer_of(cls.__content_of(source)))
+
+            output_path = Path(directory) / "deck.md"
+            pptx2md.convert(config.model_copy(update={"pptx_path": Path(path), "output_path": output_path}))
+            return output_path.read_text(encoding="utf-8")
+
+    @classmethod
+    def read_docx(cls, source: Source, fast: bool = True, **kwargs) -> str:
+        """
+        Read a Word document as markdown.
+
+        Args:
+            source: The document, or its content
+            fast: Read the document XML directly, and only fall back to `unstructured` for documents it cannot read
+        """
+        source = cls.__content_of(source)
+        position = None if cls.__is_path(source) or cls.__is_buffer(source) else source.tell()
+        if fast:
+            try:
+                return cls.__read_docx_xml(source)
+            except (KeyError, ValueError, zipfile.BadZipFile, ElementTree.ParseError, NotImplementedError) as e:
+                logging.info(f"Reading {cls.__name_of(source)} with unstructured: {type(e).__name__}: {e}")
+                if position is not None:
+                    source.seek(position)
+
+        from html2text import HTML2Text
+        from unstructured.partition.auto import partition
 
         h2t = HTML2Text()
 
         markdown_parts = []
-        elements = partition(filename=path)
+        elements = partition(filename=source) if cls.__is_path(source) else partition(file=cls.__file_of(source))
         for element in elements:
             if element.category == "Title":
                 depth = "#" * (element.metadata.category_depth + 1)
@@ -89,45 +427,352 @@ class DocumentReader:
         return "\n".join(markdown_parts)
 
     @classmethod
-    def df2md(cls, df: pd.DataFrame) -> str:
+    def __read_docx_xml(cls, source: Source) -> str:
+        """Headings, list items, paragraphs and tables of the document body, in one pass over its XML"""
+        w = cls.__W
+        with zipfile.ZipFile(cls.__file_of(source)) as archive:
+            body = ElementTree.fromstring(archive.read("word/document.xml")).find(f"{w}body")
+            styles = None
+            if "word/styles.xml" in archive.namelist():
+                styles = ElementTree.fromstring(archive.read("word/styles.xml"))
+
+        if body is None:
+            raise NotImplementedError("No document body")
+        if body.find(f".//{w}altChunk") is not None:
+            raise NotImplementedError("Embedded documents")
+
+        # Style names by id, e.g., "Heading1" -> "heading 1", and their outline levels
+        style_names, outline_levels = {}, {}
+        for style in (styles.iter(f"{w}style") if styles is not None else []):
+            style_id = style.get(f"{w}styleId")
+            name = style.find(f"{w}name")
+            style_names[style_id] = (name.get(f"{w}val") if name is not None else style_id).lower()
+            level = style.find(f"{w}pPr/{w}outlineLvl")
+            if level is not None:
+                outline_levels[style_id] = int(level.get(f"{w}val"))
+
+        def markdown_of(element: ElementTree.Element) -> Iterator[str]:
+            for child in element:
+                if child.tag == f"{w}p":
+                    paragraph = paragraph_of(child)
+                    if paragraph:
+                        yield f"{paragraph}\n"
+                elif child.tag == f"{w}tbl":
+                    rows = rows_of(child)
+                    if rows:
+                        width = max(len(r) for r in rows)
+                        rows = [r + [""] * (width - len(r)) for r in rows]
+                        yield f"\n{cls.__markdown_table(rows[0], rows[1:])}"
+                elif child.tag == f"{w}sdt":
+                    # Content controls wrap paragraphs and tables
+                    content = child.find(f"{w}sdtContent")
+                    if content is not None:
+                        yield from markdown_of(content)
+
+        def text_of(paragraph: ElementTree.Element) -> str:
+            text = []
+            for child in paragraph:
+                if child.tag == f"{w}pPr":
+                    continue
+                for node in child.iter():
+                    if node.tag == f"{w}t":
+                        text.append(node.text or "")
+                    elif node.tag == f"{w}tab":
+                        text.append("\t")
+                    elif node.tag in [f"{w}br", f"{w}cr"]:
+                        text.append("\n")
+            return "".join(text)
+
+        def rows_of(table: ElementTree.Element) -> list[list[str]]:
+            """Cells of the table, with merged cells repeated in each column and row they span"""
+            rows = []
+            for row in table.findall(f"{w}tr"):
+                skipped = row.find(f"{w}trPr/{w}gridBefore")
+                cells = [""] * (int(skipped.get(f"{w}val")) if skipped is not None else 0)
+                for cell in row.findall(f"{w}tc"):
+                    text = cell_of(cell)
+                    merged = cell.find(f"{w}tcPr/{w}vMerge")
+                    if merged is not None and merged.get(f"{w}val", "continue") == "continue":
+                        above = rows[-1] if rows else []
+                        text = above[len(cells)] if len(cells) < len(above) else text
+                    span = cell.find(f"{w}tcPr/{w}gridSpan")
+                    cells += [text] * (int(span.get(f"{w}val")) if span is not None else 1)
+                rows.append(cells)
+            return rows
+
+        def cell_of(cell: ElementTree.Element) -> str:
+            return cls.__format_cell("\n".join(filter(None, (text_of(p).strip() for p in cell.iter(f"{w}p")))))
+
+        def paragraph_of(paragraph: ElementTree.Element) -> str | None:
+            text = text_of(paragraph).strip()
+            if not text:
+                return None
+
+            properties = paragraph.find(f"{w}pPr")
+            style = properties.find(f"{w}pStyle") if properties is not None else None
+            style_id = style.get(f"{w}val") if style is not None else None
+            name = style_names.get(style_id, (style_id or "").lower())
+
+            level = properties.find(f"{w}outlineLvl") if properties is not None else None
+            level = int(level.get(f"{w}val")) if level is not None else outline_levels.get(style_id)
+            if name == "title":
+                return f"# {text}"
+            if match := re.fullmatch(r"heading ?(\d)", name):
+                return f"{'#' * int(match.group(1))} {text}"
+            if level is not None and level < 9:
+                return f"{'#' * (level + 1)} {text}"
+
+            numbering = properties.find(f"{w}numPr") if properties is not None else None
+            if numbering is not None:
+                depth = numbering.find(f"{w}ilvl")
+                return f"{'    ' * int(depth.get(f'{w}val') if depth is not None else 0)}- {text}"
+            if match := re.fullmatch(r"list \w+(?: (\d))?", name):
+                return f"{'    ' * (int(match.group(1) or 1) - 1)}- {text}"
+            return text
+
+        return "\n".join(markdown_of(body))
+
+    @classmethod
+    def df2md(cls, df: "pd.DataFrame") -> str:
         """Convert a Pandas dataframe into markdown table."""
+        import pandas as pd
+
         drop_condition = isinstance(df.index, pd.RangeIndex) and df.index.name is None
         df = df.reset_index(drop=drop_condition)
         return df.to_markdown(index=False)
 
     @classmethod
-    def read_xlsx(cls, path: str, **kwargs) -> str:
-        supported_extensions = kwargs.pop("supported_extensions", [])
-        if all([not path.endswith(ext) for ext in supported_extensions]):
-            raise ValueError(f"{path} is not one of {', '.join(supported_extensions)}")
+    def read_xlsx(
+            cls,
+            source: Source,
+            sheets: Sequence[str | int] | str | int = None,
+            max_rows: int = None,
+            **kwargs
+    ) -> str:
+        """
+        Read a workbook as a markdown table per sheet.  Sheets are headed by their names if there are several.
+        See `read_xlsx_blocks()` for the options.
+
+        Args:
+            kwargs: Options of `pandas.read_excel()`, e.g., header or usecols.  The sheets are then loaded whole
+                by pandas, rather than streamed.
+        """
+        if kwargs:
+            return cls.__read_excel(source, sheets, max_rows, **kwargs)
+
+        parts, sheet = [], None
+        blocks = list(cls.read_xlsx_blocks(source, sheets, max_rows, block_rows=None))
+        for block in blocks:
+            if len(blocks) > 1 and block.sheet != sheet:
+                parts.append(f"\n{block.sheet}:\n")
+            parts.append(block.text)
+            sheet = block.sheet
+        return "".join(parts)
+
+    @classmethod
+    def read_xlsx_blocks(
+            cls,
+            source: Source,
+            sheets: Sequence[str | int] | str | int = None,
+            max_rows: int = None,
+            block_rows: int | None = DEFAULT_BLOCK_ROWS,
+    ) -> Iterator[SheetBlock]:
+        """
+        Read a workbook as markdown tables of blocks of rows, streaming the rows so that memory stays bounded
+        by the block size however large the workbook is.  (Except for legacy .xls files, which are loaded whole.)
+
+        Args:
+            source: The workbook, or its content
+            sheets: Names or indexes (from 0) of the sheets to read.  Default to all sheets.
+            max_rows: Maximum number of data rows read from each sheet
+            block_rows: Data rows per block.  None for a block per sheet.
 
-        df = pd.read_excel(path, **kwargs)
+        Yields:
+            SheetBlock: A markdown table of rows of a sheet, headed by the first row of the sheet
+        """
+        for sheet, rows in cls.__sheet_rows(source, sheets):
+            header, block, first_row, num_rows, num_blocks = None, [], None, 0, 0
+            for number, row in enumerate(rows, start=1):
+                cells = [cls.__format_cell(v) for v in row]
+                while cells and not cells[-1]:
+                    cells.pop()
+                if not cells:
+                    continue    # Blank rows
 
-        if isinstance(df, pd.DataFrame):
-            return cls.df2md(df)
+                if header is None:
+                    header = cells
+                    continue
+                if max_rows is not None and num_rows >= max_rows:
+                    break
 
-        md_text = ""
-        for sheet_name, table in df:  # Multiple sheets
-            md_text += f"\n{sheet_name}:\n"
-            md_text += cls.df2md(table)
+                first_row = first_row or number
+                block.append(cells)
+                num_rows += 1
+                if block_rows and len(block) >= block_rows:
+                    yield cls.SheetBlock(sheet=sheet, first_row=first_row, text=cls.__markdown_table(header, block))
+                    block, first_row, num_blocks = [], None, num_blocks + 1
 
-        return md_text
+            # The rest of the rows, or the header alone if the sheet has no other rows
+            if header is not None and (block or not num_blocks):
+                yield cls.SheetBlock(sheet=sheet, first_row=first_row or 0, text=cls.__markdown_table(header, block))
 
     @classmethod
-    def read(cls, path: str, **kwargs) -> str:
-        readers: List[Callable[[str], str]] = [
-            partial(cls.read_text, supported_extensions=[".txt", ".md"], **kwargs),
-            partial(cls.read_pdf, supported_extensions=[".pdf"], **kwargs),
-            partial(cls.read_ppt, supported_extensions=[".ppt", ".pptx"], **kwargs),
-            partial(cls.read_docx, supported_extensions=[".docx"], **kwargs),
-            partial(cls.read_xlsx, supported_extensions=[".xls", ".xlsx"], **kwargs),
-        ]
+    def __read_excel(
+            cls,
+            source: Source,
+            sheets: Sequence[str | int] | str | int = None,
+            max_rows: int = None,
+            **kwargs
+    ) -> str:
+        """Read a workbook with `pandas.read_excel()` and its options, as `read_xlsx()` did before streaming"""
+        import pandas as pd
 
-        for r in readers:
+        if sheets is not None:
+            kwargs.setdefault("sheet_name", sheets)
+        if max_rows is not None:
+            kwargs.setdefault("nrows", max_rows)
+
+        tables = pd.read_excel(cls.__file_of(source), **kwargs)
+        if isinstance(tables, pd.DataFrame):
+            return cls.df2md(tables)
+        return "".join(f"\n{name}:\n{cls.df2md(table)}" for name, table in tables.items())
+
+    @classmethod
+    def __sheet_rows(
+            cls,
+            source: Source,
+            sheets: Sequence[str | int] | str | int = None
+    ) -> Iterator[tuple[str, Iterator[tuple]]]:
+        """Names of the selected sheets, and their rows of cell values"""
+        source = cls.__content_of(source)
+        if isinstance(sheets, (str, int)):
+            sheets = [sheets]
+
+        def selected(names: list[str]) -> list[str]:
+            if sheets is None:
+                return names
+            unknown = [s for s in sheets if s not in names and not (isinstance(s, int) and 0 <= s < len(names))]
+            if unknown:
+                raise ValueError(f"{cls.__name_of(source)} has no sheet {unknown[0]}.  It has {', '.join(names)}.")
+            return [names[s] if isinstance(s, int) else s for s in sheets]
+
+        # Told by the content rather than the suffix, which may be missing or wrong
+        if cls.sniff(source) == ".xls":
+            import pandas as pd
+
+            with pd.ExcelFile(cls.__file_of(source)) as workbook:
+                for name in selected([str(n) for n in workbook.sheet_names]):
+                    df = workbook.parse(name, header=None)
+                    yield name, (tuple(None if pd.isna(v) else v for v in row) for row in df.itertuples(index=False))
+            return
+
+        import openpyxl
+
+        # openpyxl tells the format of a path by its suffix, so paths are given to it as open files
+        with open(source, "rb") if cls.__is_path(source) else contextlib.nullcontext(cls.__file_of(source)) as file:
+            workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
             try:
-                return r(path)
-            except ValueError:
-                pass
+                for name in selected(workbook.sheetnames):
+                    yield name, workbook[name].iter_rows(values_only=True)
+            finally:
+                workbook.close()
+
+    @classmethod
+    def __format_cell(cls, value: Any) -> str:
+        if value is None:
+            return ""
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        elif isinstance(value, datetime.datetime) and value.time() == datetime.time():
+            value = value.date()
+        if isinstance(value, (datetime.date, datetime.time)):
+            return value.isoformat()
+        return str(value).strip().replace("|", "\\|").replace("\n", "<br>")
+
+    @classmethod
+    def __markdown_table(cls, header: list[str], rows: list[list[str]]) -> str:
+        # Rows longer than the header, e.g., with notes beyond the last titled column, widen the table
+        width = max([len(header)] + [len(row) for row in rows])
+        lines = ["| " + " | ".join(header + [""] * (width - len(header))) + " |", "|" + "---|" * width]
+        lines += ["| " + " | ".join(row + [""] * (width - len(row))) + " |" for row in rows]
+        return "\n".join(lines) + "\n"
+
+    @classmethod
+    def read(cls, source: Source, file_type: str = None, **kwargs) -> str:
+        """
+        Read a file as text, converting documents to markdown.
+
+        Args:
+            source: The file, or its content as bytes, a memoryview or a binary file object
+            file_type: Suffix of the file type, e.g., ".pdf".  Default to the suffix of the file name, or else
+                the type told by the content.
+            kwargs:
+                conversion_cache: Cache of the conversion, overriding `DocumentReader.conversion_cache`
+                Other options of the reader of the file type
+        """
+        cache = kwargs.pop("conversion_cache", cls.conversion_cache)
+        source = cls.__content_of(source)
+        reader = cls.reader_of(source, file_type)
+        if cache is None or reader.converter is None:
+            return reader(source, **kwargs)
+
+        return cache.get_or_convert(
+            source, lambda: reader(source, **kwargs), reader.converter, kwargs, reader=reader.identity
+        )
+
+    @classmethod
+    def read_result(cls, source: Source, **kwargs) -> ReadResult:
+        """Read a file like `read()`, but report errors in the result rather than raising them"""
+        start, path = time.monotonic(), cls.__name_of(source)
+        try:
+            text = cls.read(source, **kwargs)
+            return cls.ReadResult(path=path, text=text, seconds=time.monotonic() - start)
+        except Exception as e:
+            return cls.ReadResult(path=path, error=f"{type(e).__name__}: {e}", seconds=time.monotonic() - start)
+
+    @classmethod
+    def read_many(cls, paths: Sequence[str], workers: int = None, ordered: bool = True, **kwargs) -> Iterator[ReadResult]:
+        """
+        Read many files in parallel processes.  Files that cannot be read are reported without stopping the others.
+
+        Args:
+            paths: Files to read
+            workers: Number of processes.  Default to the number of CPUs.  1 to read in this process.
+            ordered: Yield the results in the order of the paths, or otherwise as soon as each file is read
+            kwargs: Other parameters passed to `read()`
+
+        Yields:
+            ReadResult: The text of each file, or why it could not be read
+        """
+        paths = [str(p) for p in paths]
+        if workers == 1 or len(paths) <= 1:
+            for path in paths:
+                yield cls.read_result(path, **kwargs)
+            return
+
+        with ProcessPoolExecutor(max_workers=min(workers or os.cpu_count() or 1, len(paths))) as executor:
+            futures = {executor.submit(cls.read_result, path, **kwargs): path for path in paths}
+
+            try:
+                for future in (futures if ordered else as_completed(futures)):
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        # The worker process died, e.g., crashed by a malformed file
+                        result = cls.ReadResult(path=futures[future], error=f"{type(e).__name__}: {e}")
+
+                    if not result.ok:
+                        logging.warning(f"Cannot read {result.path}: {result.error}")
+                    yield result
+            finally:
+                # Do not wait for files nobody will read, if the caller stops early
+                for future in futures:
+                    future.cancel()
 
-        raise ValueError(f"Unsupported file type {path}")
 
+DocumentReader.register([".txt", ".md"], DocumentReader.read_text)
+DocumentReader.register([".pdf"], DocumentReader.read_pdf, converter="pymupdf4llm")
+DocumentReader.register([".ppt", ".pptx"], DocumentReader.read_ppt, converter="pptx2md")
+DocumentReader.register([".docx"], DocumentReader.read_docx, converter="unstructured", version=2)
+DocumentReader.register([".xlsx"], DocumentReader.read_xlsx, converter="openpyxl")
+DocumentReader.register([".xls"], DocumentReader.read_xlsx, converter="xlrd")
@@ -0,0 +1,39 @@
+import unittest
+
+from llms.Llm import Llm
+from FakeLlm import FakeLlm
+
+
+class CompiledPromptTest(unittest.TestCase):
+
+    def test_reuse(self):
+        llm = FakeLlm()
+        prompt = [(Llm.Role.SYSTEM, "Answer briefly."), (Llm.Role.HUMAN, "Capital of {country}?")]
+
+        first = llm.prepare_request(prompt, arguments={"country": "France"})
+        second = llm.prepare_request(list(prompt), arguments={"country": "Japan"})
+        self.assertIs(first.prompt, second.prompt)
+        self.assertIs(first.chain, second.chain)
+        self.assertEqual(llm.invoke(prompt, arguments={"country": "Japan"})["content"],
+                         "System: Answer briefly.\nHuman: Capital of Japan?")
+
+        # Another task is another chain
+        third = llm.prepare_request(prompt, arguments={"country": "France"}, task="generation")
+        self.assertIsNot(first.chain, third.chain)
+        self.assertEqual(third.config["metadata"]["task"], "generation")
+
+    def test_eviction(self):
+        llm = FakeLlm()
+        llm.compiled_prompts.max_size = 3
+        for i in range(5):
+            llm.invoke(f"Prompt {i}: {{text}}", arguments={"text": "x"})
+        self.assertEqual(len(llm.compiled_prompts), 3)
+
+        # The most recently used prompts are kept
+        llm.invoke("Prompt 2: {text}", arguments={"text": "x"})
+        llm.invoke("Prompt 5: {text}", arguments={"text": "x"})
+        self.assertEqual([k[0] for k in llm.compiled_prompts.entries], ["Prompt 4: {text}", "Prompt 2: {text}", "Prompt 5: {text}"])
+
+
+if __name__ == '__main__':
+    unittest.main()
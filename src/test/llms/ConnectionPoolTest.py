@@ -0,0 +1,73 @@
+import asyncio
+import time
+import unittest
+
+from llms.ConnectionPool import ConnectionPool
+from llms.Llm import Llm
+
+
+class ConnectionPoolTest(unittest.TestCase):
+    deepinfra = dict(base_url="https://api.deepinfra.com/v1/openai/chat/completions", api_key="key")
+
+    def tearDown(self):
+        ConnectionPool.configure(
+            pool_size=ConnectionPool.DEFAULT_POOL_SIZE, idle_timeout=ConnectionPool.DEFAULT_IDLE_TIMEOUT
+        )
+
+    def test_shared_clients(self):
+        client = ConnectionPool.get_client(**self.deepinfra)
+        self.assertIs(ConnectionPool.get_client(**self.deepinfra), client)
+        self.assertIsNot(ConnectionPool.get_client(**{**self.deepinfra, "api_key": "another key"}), client)
+
+    def test_async_clients_per_event_loop(self):
+        async def get_twice():
+            return (
+                await ConnectionPool.get_async_client(**self.deepinfra),
+                await ConnectionPool.get_async_client(**self.deepinfra),
+            )
+
+        first, second = asyncio.run(get_twice())
+        self.assertIs(first, second)
+
+        third, _ = asyncio.run(get_twice())
+        self.assertIsNot(first, third)
+
+    def test_async_clients_across_batches(self):
+        async def get():
+            return await ConnectionPool.get_async_client(**self.deepinfra)
+
+        # Batches run on one long-lived event loop, so they share warm clients
+        self.assertIs(Llm.run_coroutine(get()), Llm.run_coroutine(get()))
+
+        async def get_and_close():
+            client = await get()
+            await ConnectionPool.aclose()
+            return client, await get()
+
+        first, second = asyncio.run(get_and_close())
+        self.assertIsNot(first, second)
+
+    def test_pool_size(self):
+        from huggingface_hub import get_session, get_async_session
+        from huggingface_hub.utils import _http
+
+        ConnectionPool.configure(pool_size=3)
+        ConnectionPool.get_client(**self.deepinfra)
+        defaults = [_http.default_client_factory(), _http.default_async_client_factory()]
+        for client, default in zip([get_session(), get_async_session()], defaults):
+            pool = client._transport._pool
+            self.assertEqual((pool._max_connections, pool._max_keepalive_connections), (3, 3))
+
+            # Hooks (e.g., offline mode, request ids) and timeouts of the library are kept
+            self.assertEqual(client.event_hooks, default.event_hooks)
+            self.assertEqual(client.timeout, default.timeout)
+
+    def test_idle_timeout(self):
+        ConnectionPool.configure(idle_timeout=0.05)
+        client = ConnectionPool.get_client(**self.deepinfra)
+        time.sleep(0.1)
+        self.assertIsNot(ConnectionPool.get_client(**self.deepinfra), client)
+
+
+if __name__ == '__main__':
+    unittest.main()
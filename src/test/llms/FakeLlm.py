@@ -0,0 +1,86 @@
+import asyncio
+import time
+from typing import Any, Callable, List
+
+from langchain_core.language_models import BaseLanguageModel
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import Runnable, RunnableLambda
+
+from llms.Llm import Llm
+
+
+class FakeLlm(Llm):
+    """
+    Offline stand-in for a provider, for testing without API keys.
+
+    Answers each prompt with `answer(prompt)` after `delay` seconds, echoing the prompt by default.  Override
+    `answer()`, or pass it, to answer otherwise, e.g., to shout, summarize or fail.  Counts the calls and keeps
+    the prompts it was sent.
+
+    Usage:
+        llm = FakeLlm()
+        llm.invoke("Hello {name}", arguments={"name": "Bob"})["content"]    # "Human: Hello Bob"
+        FakeLlm(answer=str.upper, delay=0.1)
+    """
+
+    def __init__(
+            self,
+            answer: Callable[[str], str] = None,
+            name: str = "fake",
+            delay: float = 0.0,
+            max_tokens: int = 1000,
+            runnable: Runnable = None,
+    ):
+        """
+        Args:
+            answer: Answers the prompt text.  Default to the `answer()` method.
+            name: The model name
+            delay: Seconds taken to answer
+            max_tokens: Token budget of the model
+            runnable: Runnable answering in place of `answer()`, e.g., to report token usage
+        """
+        self.model_name = name
+        self.delay = delay
+        self.max_tokens = max_tokens
+        self.calls = 0
+        self.prompts: List[str] = []
+        if answer is not None:
+            self.answer = answer
+        super().__init__(llm=runnable or RunnableLambda(self.respond, afunc=self.arespond))
+
+    def answer(self, prompt: str) -> str:
+        return prompt
+
+    def respond(self, prompt_value) -> AIMessage:
+        prompt = self.__record(prompt_value)
+        if self.delay:
+            time.sleep(self.delay)
+        return AIMessage(content=self.answer(prompt))
+
+    async def arespond(self, prompt_value) -> AIMessage:
+        prompt = self.__record(prompt_value)
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return AIMessage(content=self.answer(prompt))
+
+    def __record(self, prompt_value) -> str:
+        self.calls += 1
+        prompt = prompt_value.to_string()
+        self.prompts.append(prompt)
+        return prompt
+
+    def clean_up_response(self, response: Any) -> dict:
+        return {"content": response.content, "metadata": response}
+
+    def get_max_tokens(self) -> int:
+        return self.max_tokens
+
+    @classmethod
+    def get_supported_models(cls) -> List[str]:
+        return []
+
+    def as_runnable(self) -> Runnable:
+        return self.llm
+
+    def as_language_model(self) -> BaseLanguageModel:
+        raise NotImplementedError
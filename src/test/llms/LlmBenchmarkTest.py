@@ -0,0 +1,199 @@
+import os
+import statistics
+import time
+import unittest
+from typing import Callable, List
+
+from langchain_core.prompt_values import StringPromptValue
+from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import RunnableLambda
+
+from agents.AgentWrapper import AgentWrapper
+from llms.DeepInfraLlm import DeepInfraLlm
+from llms.DeepSeekLlm import DeepSeekLlm
+from llms.GeminiLlm import GeminiLlm
+from llms.GptLlm import GptLlm
+from llms.LlamaLlm import LlamaLlm
+from llms.Llm import Llm
+from llms.RateLimiter import RateLimiter
+from llms.RunnableToLLMAdapter import RunnableToLLMAdapter
+from llms.Telemetry import Telemetry
+from MockChatServer import MockChatServer
+
+
+class LlmBenchmarkTest(unittest.TestCase):
+    """
+    Throughput and latency of the call path against a local mock provider.  Needs no API keys.
+
+    Each benchmark prints calls/sec and p50/p99 latencies, and fails if the call path adds more than its allowance
+    to the mock latency, or does not run calls concurrently where it should.  Set LLM_BENCHMARK_CALLS for longer runs.
+    """
+    CALLS = int(os.environ.get("LLM_BENCHMARK_CALLS", 40))
+    LATENCY = 0.05
+    OVERHEAD = 0.05     # Allowed seconds added by the call path to each call
+
+    REACT_PROMPT = PromptTemplate.from_template("""
+        Answer the question with the following tools:
+        {tools}
+
+        The tools you can use are: {tool_names}
+
+        Question: {input}
+        Current Context: {context}
+        Previous Steps: {agent_scratchpad}
+
+        Respond with Thought, Action and Action Input, or with Thought and Final Answer.
+        """)
+
+    @staticmethod
+    def react_reply(messages: List[dict]) -> str:
+        """Looks up the database once, then answers"""
+        prompt = messages[-1]["content"]
+        if "Observation:" in prompt:
+            return "Thought: I know the answer.\nFinal Answer: 42"
+        return "Thought: I need to look it up.\nAction: look_up_database\nAction Input: revenue"
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = MockChatServer(latency=MockChatServer.Latency(median=cls.LATENCY, sigma=0.2), seed=0).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def tearDown(self):
+        RateLimiter.clear()
+
+    @classmethod
+    def report(cls, name: str, latencies: List[float], elapsed: float) -> dict:
+        latencies = sorted(latencies)
+        result = {
+            "calls_per_sec": len(latencies) / elapsed,
+            "p50": statistics.median(latencies),
+            "p99": latencies[min(int(0.99 * len(latencies)), len(latencies) - 1)],
+        }
+        print(f"{name:40s} {result['calls_per_sec']:8.1f} calls/s  "
+              f"p50 {result['p50'] * 1000:7.1f} ms  p99 {result['p99'] * 1000:7.1f} ms")
+        return result
+
+    @classmethod
+    def record_latencies(cls, llm: Llm) -> List[float]:
+        latencies = []
+        llm.telemetry = Telemetry()
+        llm.telemetry.add_listener(lambda call: latencies.append(call.latency))
+        return latencies
+
+    @classmethod
+    def run_serially(cls, name: str, call: Callable[[int], None], n: int) -> dict:
+        latencies = []
+        start = time.monotonic()
+        for i in range(n):
+            call_start = time.monotonic()
+            call(i)
+            latencies.append(time.monotonic() - call_start)
+        return cls.report(name, latencies, time.monotonic() - start)
+
+    def test_invoke(self):
+        for model_name, provider in [
+            ("gpt-4o", GptLlm),
+            ("gemini-2", GeminiLlm),
+            ("llama-3", DeepInfraLlm),
+            ("llama-3", LlamaLlm),
+            ("deepseek", DeepSeekLlm),
+        ]:
+            llm = provider(model_name, model_key="mock", base_url=self.server.url)
+
+            def invoke(i: int):
+                response = llm.invoke("Say {n}", arguments={"n": i})
+                self.assertIn(f"Say {i}", response["content"])
+
+            result = self.run_serially(f"{provider.__name__}.invoke", invoke, self.CALLS // 4)
+            self.assertLess(result["p50"], self.LATENCY * 1.5 + self.OVERHEAD)
+
+    def test_stream(self):
+        llm = DeepInfraLlm("llama-3", model_key="mock", base_url=self.server.url)
+
+        def stream(i: int):
+            content = "".join(d["content"] for d in llm.stream("Say {n}", arguments={"n": i}))
+            self.assertEqual(content, f"Say {i}")
+
+        result = self.run_serially("DeepInfraLlm.stream", stream, self.CALLS // 4)
+        self.assertLess(result["p50"], self.LATENCY * 1.5 + self.OVERHEAD)
+
+    def test_invoke_many(self):
+        llm = DeepInfraLlm("llama-3", model_key="mock", base_url=self.server.url)
+        arguments = [{"n": i} for i in range(self.CALLS)]
+
+        # Warm up, so that one-off imports and client setup are not measured
+        llm.invoke_many("Say {n}", arguments[:8], max_concurrency=8)
+
+        latencies = self.record_latencies(llm)
+        start = time.monotonic()
+        responses = llm.invoke_many("Say {n}", arguments, max_concurrency=8)
+        elapsed = time.monotonic() - start
+
+        self.assertEqual([r["content"] for r in responses], [f"Say {i}" for i in range(self.CALLS)])
+        self.report("DeepInfraLlm.invoke_many (8 at a time)", latencies, elapsed)
+        self.assertLess(elapsed, self.CALLS * self.LATENCY / 4)
+
+    def test_adapter_batch(self):
+        runnable = DeepInfraLlm("llama-3", model_key="mock", base_url=self.server.url).as_runnable()
+        latencies = []
+
+        def timed_invoke(text: str) -> str:
+            start = time.monotonic()
+            result = runnable.invoke(text)
+            latencies.append(time.monotonic() - start)
+            return result
+
+        llm = RunnableToLLMAdapter(RunnableLambda(timed_invoke))
+        prompts = [StringPromptValue(text=f"Say {i}") for i in range(self.CALLS)]
+        llm.generate_prompt(prompts[:8])
+        latencies.clear()
+
+        start = time.monotonic()
+        result = llm.generate_prompt(prompts)
+        elapsed = time.monotonic() - start
+
+        self.assertEqual([g[0].text for g in result.generations], [f"Say {i}" for i in range(self.CALLS)])
+        self.report("RunnableToLLMAdapter.generate_prompt", latencies, elapsed)
+        self.assertLess(elapsed, self.CALLS * self.LATENCY / 4)
+
+    def test_agent_loop(self):
+        with MockChatServer(latency=MockChatServer.Latency(median=self.LATENCY, sigma=0.2), reply=self.react_reply) as server:
+            llm = DeepInfraLlm("llama-3", model_key="mock", base_url=server.url)
+            agent = AgentWrapper(llm, self.REACT_PROMPT)
+            agent.add_tool("look_up_database", lambda _, query: "42", "Look up specific information in the database.")
+
+            def run(i: int):
+                result = agent.invoke(f"Question {i}", context="None", verbose=False)
+                self.assertEqual(result["output"], "42")
+
+            result = self.run_serially("AgentWrapper.invoke (2 LLM calls)", run, self.CALLS // 8)
+            self.assertEqual(server.requests, 2 * (self.CALLS // 8))
+            self.assertLess(result["p50"], 2 * (self.LATENCY * 1.5 + self.OVERHEAD))
+
+    def test_faults(self):
+        with MockChatServer(
+                latency=MockChatServer.Latency(median=0.01, sigma=0), rate_limit_rate=0.2, retry_after=0.05, seed=1
+        ) as server:
+            llm = DeepInfraLlm("llama-3", model_key="mock", base_url=server.url)
+            latencies = self.record_latencies(llm)
+
+            start = time.monotonic()
+            responses = llm.invoke_many("Say {n}", [{"n": i} for i in range(self.CALLS)], max_concurrency=8)
+            elapsed = time.monotonic() - start
+
+            self.assertEqual([r["content"] for r in responses], [f"Say {i}" for i in range(self.CALLS)])
+            self.assertGreater(server.rate_limited, 0)
+            self.assertEqual(llm.get_rate_limiter().stats()["rate_limited"], server.rate_limited)
+            self.report("DeepInfraLlm.invoke_many (20% 429s)", latencies, elapsed)
+
+        with MockChatServer(latency=MockChatServer.Latency(median=0.01, sigma=0), error_rate=1.0) as server:
+            llm = DeepInfraLlm("llama-3", model_key="mock", base_url=server.url)
+            with self.assertRaises(Exception):
+                llm.invoke("Hello")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+import llms
+
+
+class LlmImportTest(unittest.TestCase):
+    """Guards the start-up cost of `import llms` paid by every short-lived worker."""
+
+    MAIN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../main")
+
+    HEAVY_MODULES = [
+        "langchain", "langchain_core", "langchain_openai", "langchain_google_genai", "huggingface_hub",
+        "transformers", "tiktoken",
+    ]
+
+    MAX_IMPORT_SECONDS = 0.5
+
+    def run_in_fresh_interpreter(self, code: str) -> dict:
+        script = f"""
+import json, sys, time
+start = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - start
+heavy = sorted(m for m in {self.HEAVY_MODULES!r} if m in sys.modules)
+print(json.dumps({{"elapsed": elapsed, "heavy": heavy}}))
+"""
+        env = {**os.environ, "PYTHONPATH": self.MAIN_DIR}
+        output = subprocess.run([sys.executable, "-c", script], env=env, capture_output=True, text=True, check=True)
+        return json.loads(output.stdout.strip().splitlines()[-1])
+
+    def test_import_time(self):
+        result = self.run_in_fresh_interpreter("import llms\nllms.resolve('llama-3')\nllms.supported_models()")
+        print(f"import llms + alias resolution: {result['elapsed'] * 1000:.1f} ms")
+
+        self.assertEqual(result["heavy"], [])
+        self.assertLess(result["elapsed"], self.MAX_IMPORT_SECONDS)
+
+    def test_only_used_provider_imported(self):
+        result = self.run_in_fresh_interpreter("from llms import DeepInfraLlm")
+        print(f"import DeepInfraLlm: {result['elapsed'] * 1000:.1f} ms")
+
+        self.assertNotIn("langchain_openai", result["heavy"])
+        self.assertNotIn("langchain_google_genai", result["heavy"])
+
+    def test_resolve(self):
+        self.assertEqual(llms.resolve("gpt-4"), "GptLlm")
+        self.assertEqual(llms.resolve("gemini-2"), "GeminiLlm")
+        self.assertEqual(llms.resolve("llama-3"), "DeepInfraLlm")
+        self.assertEqual(llms.resolve("deepseek-gwen"), "DeepSeekLlm")
+        self.assertRaises(RuntimeError, llms.resolve, "no-such-model")
+
+    def test_registry_matches_providers(self):
+        for provider, models in llms._PROVIDERS.items():
+            self.assertCountEqual(llms.class_of(provider).get_supported_models(), models, provider)
+
+    def test_class_of_after_submodule_import(self):
+        from llms.GeminiLlm import GeminiLlm
+
+        self.assertIs(llms.class_of("GeminiLlm"), GeminiLlm)
+        self.assertIs(llms.class_of("ModelCatalog"), llms.ModelCatalog)
+
+
+if __name__ == '__main__':
+    unittest.main()
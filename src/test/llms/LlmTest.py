@@ -81,6 +81,30 @@ class LlmTest(unittest.TestCase):
         print(answer)
         self.assertIn("Nuuk", answer["content"])
 
+    def test_invoke_many(self):
+        llama3 = llms.of(model_name="llama-3")
+        prompt = "What is the capital of {country}?  Answer only the name of the city."
+        countries = ["France", "Japan", "Lithuania", "Greenland", "Taiwan"]
+        answers = llama3.invoke_many(prompt, [{"country": c} for c in countries], max_concurrency=3)
+        print(answers)
+
+        self.assertEqual(len(answers), len(countries))
+        for capital, answer in zip(["Paris", "Tokyo", "Vilnius", "Nuuk", "Taipei"], answers):
+            self.assertIn(capital, answer["content"])
+
+    def test_stream(self):
+        deepseek = llms.of("deepseek-gwen")
+        thought, content = "", ""
+        for delta in deepseek.stream("What is the capital of {country}?", arguments="France"):
+            print(delta)
+            if delta.get("reset_content"):
+                content = ""
+            thought += delta.get("thought", "")
+            content += delta.get("content", "")
+
+        self.assertIn("Paris", content)
+        self.assertNotIn("</think>", content + thought)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+
+from FakeLlm import FakeLlm
+
+
+class MapReduceTest(unittest.TestCase):
+
+    @staticmethod
+    def head(prompt: str) -> str:
+        """"Summarizes" by keeping the first few words of the prompt"""
+        return " ".join(prompt.split()[:5])
+
+    text = "\n\n".join(f"Paragraph {i}. " + " ".join(["word"] * 30) for i in range(20))
+
+    def test_within_budget(self):
+        llm = FakeLlm(answer=self.head, max_tokens=10000)
+        response = llm.invoke("Summarize: {text}", arguments=self.text, split_argument="text", reserved_tokens=100)
+        self.assertEqual(len(llm.prompts), 1)
+        self.assertEqual(response["content"], "Human: Summarize: Paragraph 0. word")
+
+    def test_map_reduce(self):
+        llm = FakeLlm(answer=self.head, max_tokens=300)
+        response = llm.invoke(
+            "Summarize: {text}",
+            arguments={"text": self.text},
+            split_argument="text",
+            reduce_prompt="Combine: {text}",
+            reserved_tokens=100,
+        )
+
+        map_prompts = [p for p in llm.prompts if p.startswith("Human: Summarize")]
+        self.assertGreater(len(map_prompts), 1)
+        self.assertTrue(all(llm.get_num_tokens(p) <= 200 for p in llm.prompts))
+
+        # Paragraphs are kept whole, and in order
+        self.assertIn("Paragraph 0.", map_prompts[0])
+        self.assertIn("Paragraph 19.", map_prompts[-1])
+        self.assertEqual(sum(p.count("Paragraph") for p in map_prompts), 20)
+
+        self.assertTrue(llm.prompts[-1].startswith("Human: Combine"))
+        self.assertTrue(response["content"].startswith("Human: Combine"))
+
+    def test_over_budget_never_sent(self):
+        llm = FakeLlm(answer=self.head, max_tokens=300)
+
+        # Nothing to split
+        with self.assertRaises(ValueError):
+            llm.invoke("Summarize: {text} {other}", arguments={"text": "", "other": self.text}, split_argument="text")
+
+        # The rest of the prompt alone is over budget
+        with self.assertRaises(ValueError):
+            llm.invoke(
+                "Summarize {text} for " + " ".join(["me"] * 500), arguments=self.text,
+                split_argument="text", reserved_tokens=100,
+            )
+
+        # Mapping does not shrink the text
+        llm.answer = lambda prompt: prompt
+        with self.assertRaises(ValueError):
+            llm.invoke("Summarize: {text}", arguments=self.text, split_argument="text", reserved_tokens=100)
+
+        self.assertEqual(len([p for p in llm.prompts if llm.get_num_tokens(p) > 200]), 0)
+
+    def test_split_text(self):
+        llm = FakeLlm(answer=self.head, max_tokens=300)
+        chunks = llm.split_text(self.text, 50)
+        self.assertEqual("".join(chunks), self.text)
+        self.assertTrue(all(llm.get_num_tokens(c) <= 50 for c in chunks))
+
+        # Words longer than the budget are halved
+        chunks = llm.split_text("x" * 200, 10)
+        self.assertEqual("".join(chunks), "x" * 200)
+        self.assertTrue(all(llm.get_num_tokens(c) <= 10 for c in chunks))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,219 @@
+import json
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Callable, List
+
+
+class MockChatServer:
+    """
+    Local stand-in for an OpenAI-compatible chat completions API, for testing and benchmarking without API keys.
+
+    Answers POST .../chat/completions (plain or streamed as server-sent events), and text generation requests of
+    the HuggingFace text generation inference protocol on any other path.  Latencies are drawn from a log-normal
+    distribution.  A fraction of the requests fail with 500, or are rejected with 429 and a Retry-After header.
+
+    Every provider class can target it with `base_url=server.url`.
+    """
+
+    @dataclass
+    class Latency:
+        """Log-normal distribution of the time to the first token, plus a delay per streamed token"""
+        median: float = 0.05
+        sigma: float = 0.3
+        per_token: float = 0.0
+
+        def sample(self, rng: random.Random) -> float:
+            return self.median * rng.lognormvariate(0, self.sigma) if self.sigma else self.median
+
+    def __init__(
+            self,
+            latency: Latency = None,
+            error_rate: float = 0.0,
+            rate_limit_rate: float = 0.0,
+            retry_after: float = 1.0,
+            reply: Callable[[List[dict]], str] = None,
+            seed: int = None,
+    ):
+        """
+        Args:
+            latency: Distribution of response latencies
+            error_rate: Fraction of requests failing with 500
+            rate_limit_rate: Fraction of requests rejected with 429
+            retry_after: Seconds in the Retry-After header of 429 responses
+            reply: Makes the response text from the request messages.  Default to echoing the last message.
+            seed: Seed of the random latencies and failures
+        """
+        self.latency = latency or self.Latency()
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.reply = reply or (lambda messages: messages[-1]["content"] if messages else "")
+
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.rate_limited = 0
+
+        self.server: ThreadingHTTPServer | None = None
+        self.thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "MockChatServer":
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                server.handle(self, body)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def __enter__(self) -> "MockChatServer":
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def handle(self, handler: BaseHTTPRequestHandler, body: dict):
+        with self.lock:
+            self.requests += 1
+            outcome = self.rng.random()
+            latency = self.latency.sample(self.rng)
+
+        if outcome < self.rate_limit_rate:
+            with self.lock:
+                self.rate_limited += 1
+            self.send_json(handler, 429, {"error": {"message": "Rate limit exceeded", "type": "rate_limit"}},
+                           {"Retry-After": str(self.retry_after)})
+            return
+
+        time.sleep(latency)
+
+        if outcome < self.rate_limit_rate + self.error_rate:
+            with self.lock:
+                self.errors += 1
+            self.send_json(handler, 500, {"error": {"message": "Internal error", "type": "server_error"}})
+            return
+
+        if handler.path.rstrip("/").endswith("/chat/completions"):
+            messages = body.get("messages", [])
+            text = self.reply(messages)
+            if body.get("stream"):
+                self.stream_chat(handler, body, text)
+            else:
+                self.send_json(handler, 200, self.chat_completion(body, messages, text))
+        else:
+            text = self.reply([{"role": "user", "content": body.get("inputs", "")}])
+            if body.get("stream"):
+                self.stream_generation(handler, text)
+            else:
+                self.send_json(handler, 200, [{"generated_text": text}])
+
+    @classmethod
+    def words_of(cls, text: str) -> List[str]:
+        words = text.split(" ")
+        return [w + " " for w in words[:-1]] + words[-1:]
+
+    @classmethod
+    def chat_completion(cls, body: dict, messages: List[dict], text: str) -> dict:
+        prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in messages)
+        completion_tokens = len(text.split())
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    def stream_chat(self, handler: BaseHTTPRequestHandler, body: dict, text: str):
+        chunk_id, created = f"chatcmpl-{uuid.uuid4().hex}", int(time.time())
+
+        def chunk(delta: dict, finish_reason: str = None) -> dict:
+            return {
+                "id": chunk_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": body.get("model", "mock"),
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+
+        self.start_events(handler)
+        self.send_event(handler, chunk({"role": "assistant", "content": ""}))
+        for word in self.words_of(text):
+            time.sleep(self.latency.per_token)
+            self.send_event(handler, chunk({"content": word}))
+        self.send_event(handler, chunk({}, "stop"))
+        handler.wfile.write(b"data: [DONE]\n\n")
+        handler.wfile.flush()
+
+    def stream_generation(self, handler: BaseHTTPRequestHandler, text: str):
+        self.start_events(handler)
+        words = self.words_of(text)
+        for i, word in enumerate(words):
+            time.sleep(self.latency.per_token)
+            self.send_event(handler, {
+                "index": i,
+                "token": {"id": i, "text": word, "logprob": 0.0, "special": False},
+                "generated_text": text if i == len(words) - 1 else None,
+                "details": None,
+            })
+
+    @classmethod
+    def start_events(cls, handler: BaseHTTPRequestHandler):
+        # Without a content length, the end of the stream is marked by closing the connection
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Connection", "close")
+        handler.end_headers()
+        handler.close_connection = True
+
+    @classmethod
+    def send_event(cls, handler: BaseHTTPRequestHandler, data: dict):
+        handler.wfile.write(f"data: {json.dumps(data)}\n\n".encode())
+        handler.wfile.flush()
+
+    @classmethod
+    def send_json(cls, handler: BaseHTTPRequestHandler, status: int, data, headers: dict = None):
+        payload = json.dumps(data).encode()
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(payload)
@@ -0,0 +1,60 @@
+import re
+import unittest
+
+from llms.PromptPacker import PromptPacker
+from FakeLlm import FakeLlm
+
+
+class PromptPackerTest(unittest.TestCase):
+
+    @staticmethod
+    def shouting_llm(max_tokens: int = 2000, skip: int = None) -> FakeLlm:
+        """Answers each task section with its text in upper case, except for the section numbered `skip`"""
+        def shout(prompt: str) -> str:
+            sections = re.findall(r"^### Task (\d+)\n(.*)$", prompt, re.MULTILINE)
+            if not sections:
+                return prompt.split("===\n")[-1].upper()
+            return "\n\n".join(f"**Task {n}:**\n{text.upper()}" for n, text in sections if int(n) != skip)
+
+        return FakeLlm(answer=shout, max_tokens=max_tokens)
+
+    texts = [f"chunk number {i} about {topic}" for i, topic in enumerate(["revenue", "margin", "guidance"] * 4)]
+
+    def test_packed(self):
+        llm = self.shouting_llm()
+        packer = PromptPacker(llm, "Repeat the {tone} text below in upper case.", max_tasks=5, answer_tokens=20, reserved_tokens=0)
+
+        results = packer.invoke(self.texts, arguments={"tone": "plain"})
+        self.assertEqual([r["content"] for r in results], [t.upper() for t in self.texts])
+        self.assertEqual(len(llm.prompts), 3)
+        self.assertIn("Repeat the plain text", llm.prompts[0])
+        self.assertEqual(packer.stats(), {"requests": 3, "fallbacks": 0})
+
+    def test_token_budget(self):
+        llm = self.shouting_llm(max_tokens=300)
+        packer = PromptPacker(llm, "Repeat the text below in upper case.", answer_tokens=20, reserved_tokens=0)
+
+        packs = packer.pack(self.texts)
+        self.assertGreater(len(packs), 1)
+        self.assertEqual([i for pack in packs for i in pack], list(range(len(self.texts))))
+
+        results = packer.invoke(self.texts)
+        self.assertEqual([r["content"] for r in results], [t.upper() for t in self.texts])
+        self.assertEqual(len(llm.prompts), len(packs))
+
+    def test_fallback(self):
+        llm = self.shouting_llm(skip=2)
+        packer = PromptPacker(llm, "Repeat the text below in upper case.", max_tasks=4, answer_tokens=20, reserved_tokens=0)
+
+        results = packer.invoke(self.texts)
+        self.assertEqual([r["content"] for r in results], [t.upper() for t in self.texts])
+        self.assertEqual(packer.stats(), {"requests": 6, "fallbacks": 3})
+
+    def test_parse(self):
+        packer = PromptPacker(self.shouting_llm(), "Summarize")
+        content = "Here you go.\n### Task 1\nfirst\n\n## Task 2:\nsecond\n### Task 2\nagain\n### Task 9\nnine\n**Task 3**\n"
+        self.assertEqual(packer.parse(content, 3), {1: "first"})
+
+
+if __name__ == '__main__':
+    unittest.main()
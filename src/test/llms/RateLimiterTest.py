@@ -0,0 +1,98 @@
+import asyncio
+import unittest
+
+from llms.RateLimiter import RateLimiter
+from FakeLlm import FakeLlm
+
+
+class RateLimiterTest(unittest.TestCase):
+
+    class TooManyRequests(Exception):
+        """Rejection as raised by the provider SDKs, with the HTTP response attached"""
+        class Response:
+            def __init__(self, headers: dict):
+                self.status_code = 429
+                self.headers = headers
+
+        def __init__(self, headers: dict = None):
+            super().__init__("429 Too Many Requests")
+            self.response = self.Response(headers or {})
+
+    @staticmethod
+    def throttled_llm(rejections: int) -> FakeLlm:
+        """Rejects the first `rejections` calls"""
+        def answer(prompt: str) -> str:
+            if llm.calls <= rejections:
+                raise RateLimiterTest.TooManyRequests({"retry-after": "0.01"})
+            return "OK"
+
+        llm = FakeLlm(answer=answer, name="throttled")
+        return llm
+
+    def tearDown(self):
+        RateLimiter.clear()
+
+    def test_budgets(self):
+        limiter = RateLimiter(requests_per_minute=6, tokens_per_minute=1000)
+
+        # A minute's budget is available at once, then calls are paced at the refill rate
+        for _ in range(6):
+            self.assertEqual(limiter.try_acquire(10), 0)
+            limiter.release()
+        self.assertAlmostEqual(limiter.try_acquire(10), 10, delta=0.1)
+
+        limiter = RateLimiter(tokens_per_minute=1000)
+        self.assertEqual(limiter.try_acquire(900), 0)
+        self.assertAlmostEqual(limiter.try_acquire(400), 18, delta=0.1)
+
+    def test_aimd(self):
+        limiter = RateLimiter(max_concurrency=16)
+        for _ in range(8):
+            self.assertEqual(limiter.try_acquire(), 0)
+
+        # Calls rejected together halve the concurrency once
+        for _ in range(4):
+            self.assertTrue(limiter.release(self.TooManyRequests({"retry-after": "1"})))
+        self.assertEqual(limiter.stats(), {"limit": 8, "in_flight": 4, "rate_limited": 4})
+        self.assertGreater(limiter.try_acquire(), 0.9)
+
+        # Then it grows back by about one per round of successful calls
+        limiter.blocked_until = 0
+        for _ in range(4):
+            limiter.release()
+        for _ in range(8):
+            self.assertEqual(limiter.try_acquire(), 0)
+            limiter.release()
+        self.assertEqual(limiter.stats()["limit"], 9)
+
+        # Other errors do not change the concurrency
+        limiter.try_acquire()
+        self.assertFalse(limiter.release(ValueError("Bad request")))
+        self.assertEqual(limiter.stats()["limit"], 9)
+
+    def test_retry_after(self):
+        self.assertEqual(RateLimiter.retry_after_of(self.TooManyRequests({"retry-after": "3"})), 3.0)
+        self.assertEqual(RateLimiter.retry_after_of(self.TooManyRequests({"retry-after-ms": "250"})), 0.25)
+        self.assertAlmostEqual(
+            RateLimiter.retry_after_of(self.TooManyRequests({"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"})), 0.0
+        )
+        self.assertIsNone(RateLimiter.retry_after_of(self.TooManyRequests()))
+        self.assertIsNone(RateLimiter.retry_after_of(ValueError()))
+
+    def test_invoke(self):
+        llm = self.throttled_llm(rejections=2)
+        self.assertEqual(llm.invoke("Hello")["content"], "OK")
+        self.assertEqual(llm.calls, 3)
+        self.assertEqual(llm.get_rate_limiter().stats()["rate_limited"], 2)
+
+        llm = self.throttled_llm(rejections=2)
+        self.assertEqual(asyncio.run(llm.ainvoke("Hello"))["content"], "OK")
+
+        # Give up after the configured retries
+        RateLimiter.configure("FakeLlm", retries=1)
+        with self.assertRaises(self.TooManyRequests):
+            self.throttled_llm(rejections=2).invoke("Hello")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import tempfile
+import unittest
+
+from langchain_core.messages import AIMessage
+
+from llms.ResponseCache import ResponseCache
+from FakeLlm import FakeLlm
+
+
+class ResponseCacheTest(unittest.TestCase):
+
+    def test_cached_invoke(self):
+        with tempfile.TemporaryDirectory() as directory:
+            llm = FakeLlm()
+            llm.response_cache = ResponseCache(directory)
+
+            prompt = "What is the capital of {country}?"
+            first = llm.invoke(prompt, arguments={"country": "France"}, temperature=0)
+            second = llm.invoke(prompt, arguments={"country": "France"}, temperature=0)
+            self.assertEqual(first["content"], second["content"])
+            self.assertIsInstance(second["metadata"], AIMessage)
+            self.assertEqual(llm.calls, 1)
+
+            # Different arguments or generation parameters are different requests
+            llm.invoke(prompt, arguments={"country": "Taiwan"}, temperature=0)
+            llm.invoke(prompt, arguments={"country": "France"}, temperature=0.5)
+            self.assertEqual(llm.calls, 3)
+
+            stats = llm.response_cache.stats()
+            print(stats)
+            self.assertEqual(stats["hits"], 1)
+            self.assertEqual(stats["misses"], 3)
+
+    def test_no_cache_by_default(self):
+        llm = FakeLlm()
+        llm.invoke("Hello")
+        llm.invoke("Hello")
+        self.assertEqual(llm.calls, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
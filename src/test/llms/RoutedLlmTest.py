@@ -0,0 +1,127 @@
+import asyncio
+import tempfile
+import time
+import unittest
+
+import llms
+from llms.ResponseCache import ResponseCache
+from llms.RoutedLlm import RoutedLlm
+from FakeLlm import FakeLlm
+
+
+class RoutedLlmTest(unittest.TestCase):
+
+    @staticmethod
+    def sleepy_llm(name: str, delay: float, fail: bool = False) -> FakeLlm:
+        """Takes `delay` seconds to answer with its name"""
+        def answer(prompt: str) -> str:
+            if fail:
+                raise RuntimeError(f"{name} is down")
+            return name
+
+        return FakeLlm(answer=answer, name=name, delay=delay)
+
+    def test_route_to_fastest(self):
+        slow, fast = self.sleepy_llm("slow", 0.05), self.sleepy_llm("fast", 0.01)
+        llm = RoutedLlm([slow, fast], hedge_quantile=None, explore_rate=0)
+
+        # Unknown backends are tried first, then the fastest is preferred
+        responses = [llm.invoke("Hello")["content"] for _ in range(5)]
+        self.assertEqual(responses, ["slow", "fast", "fast", "fast", "fast"])
+        self.assertEqual(llm.rank(), [fast, slow])
+
+    def test_fail_over(self):
+        down, up = self.sleepy_llm("down", 0, fail=True), self.sleepy_llm("up", 0)
+        llm = RoutedLlm([down, up], explore_rate=0)
+
+        self.assertEqual(llm.invoke("Hello")["content"], "up")
+        self.assertEqual(llm.invoke("Hello")["content"], "up")
+        self.assertEqual(down.calls, 1)
+        self.assertEqual(llm.stats_of(down).error_rate(), 1.0)
+
+        # All backends failed
+        with self.assertRaises(RuntimeError):
+            RoutedLlm([self.sleepy_llm("down", 0, fail=True)]).invoke("Hello")
+
+    def test_hedge(self):
+        primary, secondary = self.sleepy_llm("primary", 0.01), self.sleepy_llm("secondary", 0.01)
+        llm = RoutedLlm([primary, secondary], min_samples=5, explore_rate=0)
+        for _ in range(5):
+            llm.stats_of(primary).record(0.01, True)
+            llm.stats_of(secondary).record(0.02, True)
+
+        # The primary stalls well beyond its p95, so the secondary answers first
+        primary.delay = 0.5
+        start = time.monotonic()
+        self.assertEqual(llm.invoke("Hello")["content"], "secondary")
+        self.assertLess(time.monotonic() - start, 0.3)
+
+        # Calls that are not idempotent are not hedged
+        secondary.calls = 0
+        llm.stats_of(primary).samples.clear()
+        for _ in range(5):
+            llm.stats_of(primary).record(0.01, True)
+        self.assertEqual(llm.invoke("Hello", idempotent=False)["content"], "primary")
+        self.assertEqual(secondary.calls, 0)
+
+    def test_ainvoke_hedge(self):
+        primary, secondary = self.sleepy_llm("primary", 0.5), self.sleepy_llm("secondary", 0.01)
+        llm = RoutedLlm([primary, secondary], min_samples=5, explore_rate=0)
+        for _ in range(5):
+            llm.stats_of(primary).record(0.01, True)
+            llm.stats_of(secondary).record(0.02, True)
+
+        async def run():
+            start = time.monotonic()
+            response = await llm.ainvoke("Hello")
+            return response["content"], time.monotonic() - start
+
+        content, elapsed = asyncio.run(run())
+        self.assertEqual(content, "secondary")
+        self.assertLess(elapsed, 0.3)
+
+        # The losing call was cancelled, not recorded
+        self.assertEqual(len(llm.stats_of(primary)), 5)
+
+    def test_cached_not_timed(self):
+        backend = self.sleepy_llm("backend", 0.01)
+        with tempfile.TemporaryDirectory() as directory, RoutedLlm([backend], hedge_quantile=None) as llm:
+            backend.response_cache = ResponseCache(directory)
+            for _ in range(3):
+                self.assertEqual(llm.invoke("Hello")["content"], "backend")
+            self.assertEqual(list(llm.stream("Hello")), [{"content": "backend"}])
+
+            # Only the call that reached the provider counts towards its latency
+            self.assertEqual(backend.calls, 1)
+            self.assertEqual(len(llm.stats_of(backend)), 1)
+
+    def test_close(self):
+        primary, secondary = self.sleepy_llm("primary", 0.3), self.sleepy_llm("secondary", 0.01)
+        with RoutedLlm([primary, secondary], min_samples=1, explore_rate=0) as llm:
+            llm.stats_of(primary).record(0.01, True)
+            self.assertEqual(llm.invoke("Hello")["content"], "secondary")
+
+        with self.assertRaises(RuntimeError):
+            llm.invoke("Hello")
+
+    def test_providers_of(self):
+        self.assertEqual(llms.providers_of("gemini-2"), ["GeminiLlm", "DeepInfraLlm"])
+        self.assertEqual(llms.providers_of("llama-3"), ["DeepInfraLlm", "LlamaLlm"])
+        self.assertRaises(RuntimeError, llms.providers_of, "no-such-model")
+
+        # Only providers of the very same model are routed among
+        self.assertEqual(llms.model_id_of("llama-3", "LlamaLlm"), "meta-llama/Llama-3.2-1B")
+        self.assertEqual(RoutedLlm.providers_of("llama-3"), ["DeepInfraLlm"])
+        self.assertEqual(RoutedLlm.providers_of("meta-llama/Llama-3.2-1B"), ["LlamaLlm"])
+
+        # Providers serving the same model under different ids are routed among
+        self.assertEqual(RoutedLlm.providers_of("gemini-2"), ["GeminiLlm", "DeepInfraLlm"])
+
+    def test_of(self):
+        with RoutedLlm.of("gemini-2", model_key="mock") as llm:
+            self.assertEqual([type(b).__name__ for b in llm.backends], ["GeminiLlm", "DeepInfraLlm"])
+            self.assertEqual([b.model_name for b in llm.backends], ["gemini-2.0-flash", "google/gemini-2.0-flash-001"])
+
+
+if __name__ == '__main__':
+    unittest.main()
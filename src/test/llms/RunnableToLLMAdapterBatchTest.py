@@ -0,0 +1,62 @@
+import asyncio
+import time
+import unittest
+
+from langchain_core.prompt_values import StringPromptValue
+from langchain_core.runnables import Runnable, RunnableLambda
+
+from llms.RunnableToLLMAdapter import RunnableToLLMAdapter
+
+
+class RunnableToLLMAdapterBatchTest(unittest.TestCase):
+    """Batches through the adapter, without API keys"""
+
+    class ShoutingRunnable(Runnable):
+        """Answers in upper case, keeping the keyword arguments it was called with"""
+
+        def __init__(self):
+            self.kwargs = []
+
+        def invoke(self, text, config=None, **kwargs):
+            self.kwargs.append(kwargs)
+            return text.upper()
+
+    def test_generate_prompt(self):
+        def answer(text: str) -> str:
+            time.sleep(0.1)
+            return text.upper()
+
+        async def aanswer(text: str) -> str:
+            await asyncio.sleep(0.1)
+            return text.upper()
+
+        llm = RunnableToLLMAdapter(RunnableLambda(answer, afunc=aanswer), max_concurrency=10)
+        prompts = [StringPromptValue(text=f"prompt {i}") for i in range(20)]
+
+        # 20 prompts, 10 at a time
+        start = time.monotonic()
+        result = llm.generate_prompt(prompts)
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual([g[0].text for g in result.generations], [f"PROMPT {i}" for i in range(20)])
+
+        start = time.monotonic()
+        result = asyncio.run(llm.agenerate_prompt(prompts))
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual([g[0].text for g in result.generations], [f"PROMPT {i}" for i in range(20)])
+
+        self.assertEqual(asyncio.run(llm.apredict("hello")), "HELLO")
+
+    def test_generation_params(self):
+        runnable = self.ShoutingRunnable()
+        llm = RunnableToLLMAdapter(runnable)
+        prompts = [StringPromptValue(text="hello")]
+
+        # Only generation parameters reach the runnable
+        result = llm.generate_prompt(prompts, temperature=0, tags=["agent"], metadata={"run": 1})
+        self.assertEqual(result.generations[0][0].text, "HELLO")
+        asyncio.run(llm.agenerate_prompt(prompts, max_tokens=10, run_name="agent"))
+        self.assertEqual(runnable.kwargs, [{"temperature": 0}, {"max_tokens": 10}])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+
+from llms.SemanticCache import SemanticCache
+from FakeLlm import FakeLlm
+
+
+class SemanticCacheTest(unittest.TestCase):
+
+    def test_near_duplicates(self):
+        cache = SemanticCache()
+        cache.put("revenue", "What was Microsoft revenue in FY2Q25?", "$69.6B")
+
+        self.assertEqual(cache.get("revenue", "Microsoft FY2Q25 revenue?"), "$69.6B")
+        self.assertEqual(cache.get("revenue", "what was the revenue of Microsoft in FY2Q25"), "$69.6B")
+
+        # Other numbers, other questions, or other scopes
+        self.assertIsNone(cache.get("revenue", "Microsoft FY2Q24 revenue?"))
+        self.assertIsNone(cache.get("revenue", "What was Microsoft net income in FY2Q25?"))
+        self.assertIsNone(cache.get("profit", "Microsoft FY2Q25 revenue?"))
+
+        stats = cache.stats()
+        self.assertEqual(stats["hits"], 2)
+        self.assertEqual(stats["misses"], 3)
+
+    def test_word_order(self):
+        cache = SemanticCache()
+        cache.put("s", "Was revenue higher than income?", "Yes")
+
+        self.assertIsNone(cache.get("s", "Was income higher than revenue?"))
+        self.assertEqual(cache.get("s", "revenue higher than income?"), "Yes")
+
+    def test_eviction(self):
+        cache = SemanticCache(max_entries=2)
+        cache.put("s", "Apple revenue", 1)
+        cache.put("s", "Google revenue", 2)
+        cache.get("s", "Apple revenue")
+        cache.put("s", "Amazon revenue", 3)
+
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get("s", "Google revenue"))
+        self.assertEqual(cache.get("s", "Apple revenue"), 1)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_custom_embedding(self):
+        cache = SemanticCache(threshold=0.99, embed=lambda text: [1.0, float(len(text) > 10)])
+        cache.put("s", "short", "a")
+        self.assertEqual(cache.get("s", "tiny"), "a")
+        self.assertIsNone(cache.get("s", "much longer text"))
+
+    def test_cached_invoke(self):
+        llm = FakeLlm()
+        llm.semantic_cache = SemanticCache()
+
+        prompt = "Answer briefly: {question}"
+        first = llm.invoke(prompt, arguments={"question": "What was Microsoft revenue in FY2Q25?"})
+        second = llm.invoke(prompt, arguments={"question": "Microsoft FY2Q25 revenue?"})
+        self.assertEqual(first["content"], second["content"])
+        self.assertEqual(llm.calls, 1)
+
+        # Same question in another template, or with other generation parameters
+        llm.invoke("Explain in detail: {question}", arguments={"question": "Microsoft FY2Q25 revenue?"})
+        llm.invoke(prompt, arguments={"question": "Microsoft FY2Q25 revenue?"}, temperature=0.5)
+        self.assertEqual(llm.calls, 3)
+
+        streamed = "".join(d["content"] for d in llm.stream(prompt, arguments={"question": "revenue of Microsoft in FY2Q25"}))
+        self.assertEqual(streamed, first["content"])
+        self.assertEqual(llm.calls, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
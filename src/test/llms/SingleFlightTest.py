@@ -0,0 +1,93 @@
+import asyncio
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from llms.SingleFlight import SingleFlight
+from llms.Telemetry import Telemetry
+from FakeLlm import FakeLlm
+
+
+class SingleFlightTest(unittest.TestCase):
+
+    def test_coalesced_invoke(self):
+        llm = FakeLlm(delay=0.1)
+        llm.in_flight = SingleFlight()
+        llm.telemetry = Telemetry()
+
+        with ThreadPoolExecutor(8) as executor:
+            responses = list(executor.map(lambda _: llm.invoke("Hello {name}", arguments={"name": "Bob"}), range(8)))
+        self.assertEqual([r["content"] for r in responses], ["Human: Hello Bob"] * 8)
+        self.assertEqual(llm.calls, 1)
+        self.assertEqual(llm.telemetry.to_dict()[0]["coalesced"], 7)
+
+        # Different arguments or generation parameters are different calls
+        with ThreadPoolExecutor(4) as executor:
+            list(executor.map(lambda i: llm.invoke("Hello {name}", arguments={"name": "Bob"}, temperature=i % 2), range(4)))
+        self.assertEqual(llm.calls, 3)
+
+        # Calls after the first one finished are not coalesced
+        llm.invoke("Hello {name}", arguments={"name": "Bob"})
+        self.assertEqual(llm.calls, 4)
+        self.assertEqual(len(llm.in_flight), 0)
+
+    def test_coalesced_ainvoke(self):
+        llm = FakeLlm(delay=0.1)
+        llm.in_flight = SingleFlight()
+
+        async def run():
+            return await asyncio.gather(*[llm.ainvoke("Hello {name}", arguments={"name": "Bob"}) for _ in range(8)])
+
+        responses = asyncio.run(run())
+        self.assertEqual([r["content"] for r in responses], ["Human: Hello Bob"] * 8)
+        self.assertEqual(llm.calls, 1)
+
+    def test_not_coalesced(self):
+        # Calls are not coalesced unless opted in
+        llm = FakeLlm(delay=0.1)
+        self.assertIsNone(llm.in_flight)
+
+        with ThreadPoolExecutor(4) as executor:
+            list(executor.map(lambda _: llm.invoke("Hello"), range(4)))
+        self.assertEqual(llm.calls, 4)
+
+    def test_errors(self):
+        flight = SingleFlight()
+
+        def fail():
+            time.sleep(0.1)
+            raise RuntimeError("down")
+
+        def call(_):
+            try:
+                flight.call("key", fail)
+            except RuntimeError as e:
+                return str(e)
+
+        with ThreadPoolExecutor(4) as executor:
+            self.assertEqual(list(executor.map(call, range(4))), ["down"] * 4)
+        self.assertEqual(flight.coalesced, 3)
+
+    def test_cancelled_leader(self):
+        flight = SingleFlight()
+        calls = []
+
+        async def slow():
+            calls.append(1)
+            await asyncio.sleep(0.1)
+            return len(calls)
+
+        async def run():
+            leader = asyncio.create_task(flight.acall("key", slow))
+            await asyncio.sleep(0.01)
+            follower = asyncio.create_task(flight.acall("key", slow))
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            return await follower
+
+        # The follower takes over the call
+        self.assertEqual(asyncio.run(run()), (2, False))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+from typing import List
+
+from llms.DeepSeekLlm import DeepSeekLlm
+from llms.LlamaLlm import LlamaLlm
+from llms.Llm import Llm
+
+
+class StreamParserTest(unittest.TestCase):
+
+    @staticmethod
+    def parse(parser: Llm.StreamParser, text: str, chunk_size: int) -> List[dict]:
+        deltas = []
+        for i in range(0, len(text), chunk_size):
+            deltas += parser.feed(text[i:i + chunk_size])
+        return deltas + parser.close()
+
+    @staticmethod
+    def join(deltas: List[dict], kind: str) -> str:
+        text = ""
+        for delta in deltas:
+            if kind == "content" and delta.get("reset_content"):
+                text = ""
+            text += delta.get(kind, "")
+        return text
+
+    def test_think_tag(self):
+        text = "<think>\nThe user asks for a number. </think>\n\nThe answer is 42."
+        for chunk_size in [1, 2, 3, 7, len(text)]:
+            deltas = self.parse(DeepSeekLlm.ThinkTagParser(), text, chunk_size)
+            self.assertEqual(self.join(deltas, "thought"), "The user asks for a number.")
+            self.assertEqual(self.join(deltas, "content"), "The answer is 42.")
+
+            # Reasoning arrives before the answer
+            kinds = [list(d.keys())[0] for d in deltas]
+            self.assertEqual(kinds, sorted(kinds, reverse=True))
+
+    def test_think_tag_without_opening_tag(self):
+        for chunk_size in [1, 2, 4, 9, 25]:
+            deltas = self.parse(DeepSeekLlm.ThinkTagParser(), "Thinking... </think> Answer", chunk_size)
+            self.assertEqual(self.join(deltas, "thought"), "Thinking...")
+            self.assertEqual(self.join(deltas, "content"), "Answer")
+
+        # Released as content until the closing tag, then reclassified as a thought
+        parser = DeepSeekLlm.ThinkTagParser()
+        self.assertEqual(parser.feed("Thinking</th"), [{"content": "Thinking"}])
+        self.assertEqual(
+            parser.feed("ink>Answer"), [{"thought": "Thinking", "reset_content": True}, {"content": "Answer"}]
+        )
+        self.assertEqual(parser.close(), [])
+
+        deltas = self.parse(DeepSeekLlm.ThinkTagParser(), "Just an answer", 4)
+        self.assertEqual(self.join(deltas, "content"), "Just an answer")
+        self.assertEqual(self.join(deltas, "thought"), "")
+
+        # Released as soon as the response cannot start with <think>, not when it ends
+        parser = DeepSeekLlm.ThinkTagParser()
+        self.assertEqual(parser.feed("  <th"), [])
+        self.assertEqual(parser.feed("ere"), [{"content": "<there"}])
+        self.assertEqual(parser.feed(" it is"), [{"content": " it is"}])
+        self.assertEqual(parser.close(), [])
+
+    def test_think_tag_matches_clean_up_response(self):
+        llm = DeepSeekLlm("deepseek", model_key="mock")
+        for text in [
+            "<think>Thinking...</think>Answer", "  <think> Thinking... </think>\n\nAnswer", "Thinking...</think>Answer",
+            "Thinking </think> Answer with </think>", "Just an answer", "An answer with </thi", "<thinking>Answer",
+        ]:
+            response = llm.clean_up_response(text)
+            for chunk_size in [1, 3, len(text)]:
+                deltas = self.parse(DeepSeekLlm.ThinkTagParser(), text, chunk_size)
+                self.assertEqual(self.join(deltas, "thought"), response["metadata"].get("thought", ""), text)
+                self.assertEqual(self.join(deltas, "content"), response["content"], text)
+
+    def test_inst_tag(self):
+        deltas = self.parse(LlamaLlm.InstTagParser(), "Paris[/INST] is the capital[/INST] of France", 3)
+        self.assertEqual(self.join(deltas, "content"), "Paris is the capital of France")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import asyncio
+import json
+import unittest
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.runnables import Runnable
+
+from llms.Telemetry import Telemetry
+from FakeLlm import FakeLlm
+
+
+class TelemetryTest(unittest.TestCase):
+
+    class EchoRunnable(Runnable):
+        """Echoes the prompt, reporting token usage like OpenAI models do"""
+        def invoke(self, prompt_value, config=None, **kwargs) -> AIMessage:
+            text = prompt_value.to_string()
+            if "fail" in text:
+                raise RuntimeError("Failed")
+            return AIMessage(content=text, usage_metadata={"input_tokens": 7, "output_tokens": 5, "total_tokens": 12})
+
+        async def ainvoke(self, prompt_value, config=None, **kwargs) -> AIMessage:
+            return self.invoke(prompt_value)
+
+        def stream(self, prompt_value, config=None, **kwargs):
+            for word in self.invoke(prompt_value).content.split(" "):
+                yield AIMessageChunk(content=word + " ")
+
+    def test_record(self):
+        llm = FakeLlm(name="echo", runnable=self.EchoRunnable())
+        llm.telemetry = Telemetry(prices={"echo": (1.0, 2.0)})
+        calls = []
+        llm.telemetry.add_listener(calls.append)
+
+        llm.invoke("Hello {name}", arguments={"name": "world"})
+        asyncio.run(llm.ainvoke("Hello {name}", arguments={"name": "there"}))
+        self.assertEqual("".join(d["content"] for d in llm.stream("Hello {name}", arguments={"name": "you"})), "Human: Hello you ")
+        with self.assertRaises(RuntimeError):
+            llm.invoke("Please fail")
+
+        self.assertEqual(len(calls), 4)
+        self.assertTrue(all(c.provider == "FakeLlm" and c.model == "echo" for c in calls))
+        self.assertTrue(all(c.latency >= c.ttft >= 0 for c in calls[:3]))
+        self.assertEqual(calls[0].prompt, calls[2].prompt)
+        self.assertNotEqual(calls[0].prompt, calls[3].prompt)
+        self.assertEqual(calls[3].error, "RuntimeError")
+
+        series = llm.telemetry.to_dict()
+        self.assertEqual(len(series), 2)
+        hello = series[0]
+        self.assertEqual(hello["calls"], 3)
+        self.assertEqual(hello["latency"]["count"], 3)
+        self.assertEqual(hello["prompt_tokens"]["count"], 3)
+
+        # Token counts as reported by the provider, or estimated if not reported (e.g., streamed)
+        self.assertEqual([c.prompt_tokens for c in calls[:2]], [7, 7])
+        self.assertGreater(calls[2].prompt_tokens, 0)
+        self.assertAlmostEqual(calls[0].cost, (7 * 1.0 + 5 * 2.0) / 1e6)
+        self.assertEqual(series[1]["errors"], 1)
+        json.loads(llm.telemetry.to_json())
+
+    def test_prometheus(self):
+        telemetry = Telemetry()
+        for latency in [0.03, 0.2, 4.0]:
+            telemetry.record(Telemetry.Call(provider="GptLlm", model="gpt-4o", prompt="abc", latency=latency))
+
+        text = telemetry.to_prometheus()
+        labels = 'provider="GptLlm",model="gpt-4o",prompt="abc"'
+        self.assertIn(f"llm_calls_total{{{labels}}} 3", text)
+        self.assertIn(f'llm_latency_seconds_bucket{{{labels},le="0.05"}} 1', text)
+        self.assertIn(f'llm_latency_seconds_bucket{{{labels},le="5"}} 3', text)
+        self.assertIn(f'llm_latency_seconds_bucket{{{labels},le="+Inf"}} 3', text)
+        self.assertIn(f"llm_latency_seconds_count{{{labels}}} 3", text)
+        self.assertIn("# TYPE llm_prompt_tokens histogram", text)
+
+        histogram = Telemetry.Histogram(Telemetry.SECONDS_BUCKETS)
+        for latency in [0.03] * 95 + [20] * 5:
+            histogram.observe(latency)
+        self.assertEqual(histogram.quantile(0.5), 0.05)
+        self.assertEqual(histogram.quantile(0.99), 30)
+
+
+if __name__ == '__main__':
+    unittest.main()
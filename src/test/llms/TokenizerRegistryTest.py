@@ -0,0 +1,38 @@
+import unittest
+
+from llms.TokenizerRegistry import TokenizerRegistry
+
+
+class TokenizerRegistryTest(unittest.TestCase):
+    english = "Microsoft Cloud revenue was $40.9 billion, up 21% year over year."
+    chinese = "微軟雲端營收為409億美元，年增21%。"
+
+    def test_shared_counter(self):
+        self.assertIs(TokenizerRegistry.get("gemini-2.0-flash"), TokenizerRegistry.get("gemini-2.0-flash"))
+
+    def test_estimator(self):
+        counter = TokenizerRegistry.EstimatingCounter(cjk_rate=1.0)
+        n_english = counter.count(self.english)
+        n_chinese = counter.count(self.chinese)
+        print(n_english, n_chinese)
+
+        self.assertTrue(12 <= n_english <= 25)
+        self.assertTrue(15 <= n_chinese <= 30)
+        self.assertEqual(counter.count(""), 0)
+
+        # More tokens per CJK character for models with smaller vocabularies
+        self.assertGreater(TokenizerRegistry.EstimatingCounter(cjk_rate=2.0).count(self.chinese), n_chinese)
+
+    def test_count_many(self):
+        texts = [self.english, self.chinese, self.english + self.chinese]
+        counts = TokenizerRegistry.count_many("gemini-2.0-flash", texts)
+        self.assertEqual(counts, [TokenizerRegistry.count("gemini-2.0-flash", t) for t in texts])
+
+    def test_openai_models(self):
+        n = TokenizerRegistry.count("gpt-4o", self.english)
+        print(n)
+        self.assertTrue(12 <= n <= 25)
+
+
+if __name__ == '__main__':
+    unittest.main()
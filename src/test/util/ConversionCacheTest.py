@@ -0,0 +1,95 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from util.ConversionCache import ConversionCache
+
+
+class ConversionCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = ConversionCache(os.path.join(self.directory, "cache"))
+        self.conversions = 0
+
+        self.path = os.path.join(self.directory, "report.pdf")
+        Path(self.path).write_bytes(b"%PDF revenue up 10%")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def convert(self, path: str) -> str:
+        self.conversions += 1
+        return Path(path).read_bytes().decode().upper()
+
+    def read(self, path: str, converter: str = "pymupdf4llm", options: dict = None, reader: str = None) -> str:
+        return self.cache.get_or_convert(path, lambda: self.convert(path), converter, options, reader)
+
+    def test_unchanged(self):
+        self.assertEqual(self.read(self.path), "%PDF REVENUE UP 10%")
+        self.assertEqual(self.read(self.path), "%PDF REVENUE UP 10%")
+        self.assertEqual(self.conversions, 1)
+
+        # A copy of the same content is a hit too
+        copy = os.path.join(self.directory, "copy.pdf")
+        shutil.copy(self.path, copy)
+        self.read(copy)
+        self.assertEqual(self.conversions, 1)
+
+        # Another converter, converter version or options are misses
+        self.read(self.path, converter="unstructured")
+        self.read(self.path, options={"pages": [1]})
+        self.assertEqual(self.conversions, 3)
+
+        # And so are other readers of the same converter, or other versions of their output
+        self.read(self.path, reader="reader:read_pdf@1")
+        self.read(self.path, reader="reader:read_pdf@2")
+        self.read(self.path, reader="reader:read_pdf_pages@1")
+        self.read(self.path, reader="reader:read_pdf@2")
+        self.assertEqual(self.conversions, 6)
+
+        stats = self.cache.stats()
+        self.assertEqual(stats["hits"], 3)
+        self.assertEqual(stats["misses"], 6)
+
+    def test_changed(self):
+        self.read(self.path)
+        Path(self.path).write_bytes(b"%PDF revenue down 5%")
+        os.utime(self.path, ns=(0, 10**9))
+
+        self.assertEqual(self.read(self.path), "%PDF REVENUE DOWN 5%")
+        self.assertEqual(self.conversions, 2)
+
+    def test_content(self):
+        content = Path(self.path).read_bytes()
+        self.assertEqual(self.cache.digest_of(content), self.cache.digest_of(self.path))
+
+        with open(self.path, "rb") as fd:
+            fd.read(4)
+            self.assertEqual(self.cache.digest_of(fd), self.cache.digest_of(content[4:]))
+            self.assertEqual(fd.tell(), 4)
+
+    def test_digest_by_stat(self):
+        digest = self.cache.digest_of(self.path)
+
+        # Not hashed again while the size and modification time stay the same
+        stat = os.stat(self.path)
+        Path(self.path).write_bytes(b"%PDF revenue up 99%")
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertEqual(self.cache.digest_of(self.path), digest)
+
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        self.assertNotEqual(self.cache.digest_of(self.path), digest)
+
+    def test_pickle(self):
+        self.read(self.path)
+        cache = pickle.loads(pickle.dumps(self.cache))
+        self.assertEqual(cache.directory, self.cache.directory)
+        self.assertEqual(cache.get_or_convert(self.path, lambda: self.convert(self.path), "pymupdf4llm"), "%PDF REVENUE UP 10%")
+        self.assertEqual(self.conversions, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
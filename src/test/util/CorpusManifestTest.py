@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from util.CorpusManifest import CorpusManifest
+
+
+class CorpusManifestTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        for ticker, quarter in [("msft", "FY2Q25"), ("msft", "FY1Q25"), ("nvda", "FY4Q25")]:
+            path = Path(self.root) / ticker / f"{quarter}.txt"
+            path.parent.mkdir(exist_ok=True)
+            path.write_text(f"{ticker} {quarter} revenue")
+        Path(self.root, "msft", "logo.bin").write_bytes(b"\x00\x01\x02")
+
+        self.processed = []
+        self.removed = []
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def process(self, path: str, text: str) -> dict:
+        if "fail" in text:
+            raise RuntimeError("Cannot chunk")
+        self.processed.append(path)
+        return {"chunks": [f"{path}#{i}" for i in range(len(text.split()))]}
+
+    def remove(self, path: str, artifacts: dict):
+        self.removed.append((path, artifacts["chunks"][0]))
+
+    def ingest(self) -> CorpusManifest.Changes:
+        self.processed, self.removed = [], []
+        return CorpusManifest(self.root).ingest(self.process, self.remove, workers=1)
+
+    def test_incremental(self):
+        changes = self.ingest()
+        self.assertEqual(changes.added, ["msft/FY1Q25.txt", "msft/FY2Q25.txt", "nvda/FY4Q25.txt"])
+        self.assertEqual(len(self.processed), 3)
+
+        # Nothing changed
+        changes = self.ingest()
+        self.assertEqual((changes.unchanged, self.processed, self.removed), (3, [], []))
+
+        # Touched, changed, deleted and added
+        os.utime(Path(self.root, "msft", "FY1Q25.txt"), ns=(0, 10**9))
+        Path(self.root, "msft", "FY2Q25.txt").write_text("msft FY2Q25 revenue restated")
+        os.remove(Path(self.root, "nvda", "FY4Q25.txt"))
+        Path(self.root, "nvda", "FY1Q26.txt").write_text("nvda FY1Q26 revenue")
+
+        changes = self.ingest()
+        self.assertEqual(changes.added, ["nvda/FY1Q26.txt"])
+        self.assertEqual(changes.changed, ["msft/FY2Q25.txt"])
+        self.assertEqual(changes.deleted, ["nvda/FY4Q25.txt"])
+        self.assertEqual(changes.unchanged, 1)
+        self.assertEqual(sorted(self.processed), ["msft/FY2Q25.txt", "nvda/FY1Q26.txt"])
+        self.assertEqual(sorted(self.removed), [
+            ("msft/FY2Q25.txt", "msft/FY2Q25.txt#0"), ("nvda/FY4Q25.txt", "nvda/FY4Q25.txt#0")
+        ])
+
+        manifest = CorpusManifest(self.root)
+        self.assertEqual(sorted(manifest.entries), ["msft/FY1Q25.txt", "msft/FY2Q25.txt", "nvda/FY1Q26.txt"])
+        self.assertEqual(len(manifest.entries["msft/FY2Q25.txt"].artifacts["chunks"]), 4)
+        self.assertEqual(manifest.entries["msft/FY1Q25.txt"].mtime_ns, 10**9)
+
+    def test_failed(self):
+        Path(self.root, "msft", "FY2Q25.txt").write_text("fail")
+        changes = self.ingest()
+        self.assertEqual(changes.failed, ["msft/FY2Q25.txt"])
+        self.assertNotIn("msft/FY2Q25.txt", CorpusManifest(self.root).entries)
+
+        # Retried next time
+        changes = self.ingest()
+        self.assertEqual(changes.added, ["msft/FY2Q25.txt"])
+
+
+if __name__ == '__main__':
+    unittest.main()
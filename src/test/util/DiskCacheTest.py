@@ -0,0 +1,54 @@
+import tempfile
+import time
+import unittest
+
+from util.DiskCache import DiskCache
+
+
+class DiskCacheTest(unittest.TestCase):
+    def test_get_put(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = DiskCache(directory)
+            self.assertIsNone(cache.get("missing"))
+
+            cache.put("question", {"answer": 42})
+            self.assertEqual(cache.get("question"), {"answer": 42})
+
+            # A second instance sees the same entries
+            self.assertEqual(DiskCache(directory).get("question"), {"answer": 42})
+
+            stats = cache.stats()
+            print(stats)
+            self.assertEqual(stats["hits"], 1)
+            self.assertEqual(stats["misses"], 1)
+            self.assertEqual(stats["entries"], 1)
+
+    def test_size_eviction(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = DiskCache(directory, max_size=300)
+            for i in range(10):
+                cache.put(f"key {i}", "x" * 50)
+                time.sleep(0.01)
+
+            self.assertLessEqual(cache.stats()["size"], 300)
+            self.assertGreater(cache.stats()["evictions"], 0)
+            self.assertIsNone(cache.get("key 0"))        # Oldest evicted first
+            self.assertEqual(cache.get("key 9"), "x" * 50)
+
+    def test_age_eviction(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = DiskCache(directory, max_age=0.05)
+            cache.put("stale", "value")
+            self.assertEqual(cache.get("stale"), "value")
+
+            time.sleep(0.1)
+            self.assertIsNone(cache.get("stale"))
+            self.assertEqual(cache.stats()["entries"], 0)
+
+    def test_make_key(self):
+        self.assertEqual(DiskCache.make_key("a", {"x": 1, "y": 2}), DiskCache.make_key("a", {"y": 2, "x": 1}))
+        self.assertNotEqual(DiskCache.make_key("a", 1), DiskCache.make_key("a", 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import os
+import tempfile
+import time
+import unittest
+from typing import Callable, List
+
+from util.DocumentReader import DocumentReader
+
+
+class DocumentReaderBenchmarkTest(unittest.TestCase):
+    """
+    Throughput of reading a corpus of generated Word documents, by the fast XML reader and by `unstructured`.
+    Set DOCX_BENCHMARK_FILES for a larger corpus.
+    """
+    FILES = int(os.environ.get("DOCX_BENCHMARK_FILES", 20))
+    SECTIONS = 20
+
+    @classmethod
+    def setUpClass(cls):
+        import docx
+
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.paths = []
+        for i in range(cls.FILES):
+            document = docx.Document()
+            document.add_heading(f"Earnings call digest {i}", 0)
+            for section in range(cls.SECTIONS):
+                document.add_heading(f"Segment {section}", 1)
+                document.add_paragraph(f"Revenue of segment {section} grew {section + i}% year over year. " * 5)
+                document.add_paragraph("Demand stayed strong", style="List Bullet")
+                document.add_paragraph("Margins expanded", style="List Bullet")
+                table = document.add_table(rows=4, cols=3)
+                for r in range(4):
+                    for c in range(3):
+                        table.cell(r, c).text = f"{r}-{c}"
+            cls.paths.append(os.path.join(cls.directory.name, f"digest{i}.docx"))
+            document.save(cls.paths[-1])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def run_corpus(self, name: str, read: Callable[[str], str]) -> float:
+        texts: List[str] = []
+        start = time.monotonic()
+        for path in self.paths:
+            texts.append(read(path))
+        elapsed = time.monotonic() - start
+
+        print(f"{name:30s} {len(self.paths) / elapsed:8.1f} files/s  {elapsed / len(self.paths) * 1000:8.1f} ms/file")
+        self.assertTrue(all(f"# Segment {self.SECTIONS - 1}" in text for text in texts))
+        return elapsed
+
+    def test_throughput(self):
+        fast = self.run_corpus("fast XML reader", lambda path: DocumentReader.read_docx(path))
+
+        try:
+            import unstructured
+        except ImportError:
+            self.skipTest("unstructured is not installed to compare with")
+
+        slow = self.run_corpus("unstructured", lambda path: DocumentReader.read_docx(path, fast=False))
+        print(f"Speed up: {slow / fast:.1f}x")
+        self.assertLess(fast, slow)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,19 @@
+import importlib.util
+import io
 import os.path
+import shutil
+import subprocess
+import sys
+import tempfile
 import unittest
+import zipfile
 from pathlib import Path
+from unittest import mock
 
 import pptx2md
 import pymupdf4llm
 
+from util.ConversionCache import ConversionCache
 from util.DocumentReader import DocumentReader
 
 
@@ -53,6 +62,143 @@ class DocumentReaderTest(unittest.TestCase):
 
         self.assertGreater(len(md_text), 0)
 
+    def test_read_pdf_pages(self):
+        input_file = f"{self.TEST_DIR}/test_document.pdf"
+        pages = list(DocumentReader.read_pdf_pages(input_file))
+        self.assertEqual([p.number for p in pages], [1, 2])
+        self.assertTrue(all(len(p.text) > 0 for p in pages))
+
+        self.assertEqual([p.number for p in DocumentReader.read_pdf_pages(input_file, pages=[2], batch_size=4)], [2])
+        self.assertEqual(DocumentReader.read(input_file, pages=[2]), pages[1].text)
+        self.assertEqual(DocumentReader.read(input_file, pages=(p for p in [2])), pages[1].text)
+        self.assertEqual(DocumentReader.read(input_file, pages=[]), "")
+        with self.assertRaises(ValueError):
+            list(DocumentReader.read_pdf_pages(input_file, pages=range(1, 4)))
+
+    @classmethod
+    def make_deck(cls, path: str, titles: list[str]):
+        from pptx import Presentation
+
+        deck = Presentation()
+        for title in titles:
+            slide = deck.slides.add_slide(deck.slide_layouts[1])
+            slide.shapes.title.text = title
+            slide.placeholders[1].text_frame.text = f"Details of {title.lower()}"
+        deck.save(path)
+
+    def test_read_ppt_slides(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # Decks of the same name are read concurrently without clobbering each other
+            paths = []
+            for quarter in ["FY1Q25", "FY2Q25"]:
+                os.makedirs(os.path.join(directory, quarter))
+                paths.append(os.path.join(directory, quarter, "deck.pptx"))
+                self.make_deck(paths[-1], [f"{quarter} revenue", f"{quarter} outlook"])
+
+            results = list(DocumentReader.read_many(paths, workers=2))
+            self.assertIn("FY1Q25 revenue", results[0].text)
+            self.assertIn("FY2Q25 revenue", results[1].text)
+
+            slides = list(DocumentReader.read_ppt_slides(paths[0]))
+            self.assertEqual([s.number for s in slides], [1, 2])
+            self.assertIn("FY1Q25 outlook", slides[1].text)
+            self.assertNotIn("FY1Q25 revenue", slides[1].text)
+
+    def test_read_ppt_as_pptx2md(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "deck.pptx")
+            self.make_deck(path, ["Revenue", "Revenue", "Outlook"])
+
+            output_path = Path(directory) / "deck.md"
+            pptx2md.convert(pptx2md.ConversionConfig(
+                pptx_path=Path(path), output_path=output_path, image_dir=None, disable_image=True
+            ))
+            expected = output_path.read_text(encoding="utf-8")
+
+            self.assertEqual(DocumentReader.read_ppt(path), expected)
+            with open(path, "rb") as fd:
+                self.assertEqual(DocumentReader.read_ppt(fd), expected)
+
+            # The title repeated on the second slide is dropped there too
+            slides = [s.text for s in DocumentReader.read_ppt_slides(path)]
+            self.assertEqual("".join(slides), expected)
+            self.assertEqual(len(slides), 3)
+            self.assertNotIn("# Revenue", slides[1])
+
+            # Other versions of pptx2md convert through a temporary file
+            with mock.patch.object(ConversionCache, "version_of", return_value="3.0.0"):
+                self.assertEqual(DocumentReader.read_ppt(Path(path).read_bytes()), expected)
+
+    def test_read_docx_fast(self):
+        import docx
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "report.docx")
+            document = docx.Document()
+            document.add_heading("Microsoft FY2Q25", 0)
+            document.add_heading("Revenue", 2)
+            document.add_paragraph("Revenue was $69.6 billion.")
+            document.add_paragraph("Cloud grew", style="List Bullet")
+            document.add_paragraph("Azure grew 31%", style="List Bullet 2")
+            table = document.add_table(rows=2, cols=2)
+            for r, row in enumerate([("Segment", "Revenue"), ("Cloud | AI", "$40.9B")]):
+                for c, value in enumerate(row):
+                    table.cell(r, c).text = value
+            document.save(path)
+
+            md_text = DocumentReader.read(path)
+            self.assertEqual(md_text, (
+                "# Microsoft FY2Q25\n\n## Revenue\n\nRevenue was $69.6 billion.\n\n- Cloud grew\n\n    - Azure grew 31%\n\n"
+                "\n| Segment | Revenue |\n|---|---|\n| Cloud \\| AI | $40.9B |\n"
+            ))
+
+    def test_read_docx_merged_cells(self):
+        import docx
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "segments.docx")
+            document = docx.Document()
+            table = document.add_table(rows=3, cols=3)
+            for r, row in enumerate([("Segment", "FY2Q25", ""), ("Cloud", "Azure", "$25.5B"), ("", "Other", "$15.4B")]):
+                for c, value in enumerate(row):
+                    table.cell(r, c).text = value
+            table.cell(0, 1).merge(table.cell(0, 2))
+            table.cell(1, 0).merge(table.cell(2, 0))
+            document.save(path)
+
+            # Merged cells are repeated, rather than shifting the following cells to the left
+            self.assertEqual(DocumentReader.read(path), (
+                "\n| Segment | FY2Q25 | FY2Q25 |\n|---|---|---|\n"
+                "| Cloud | Azure | $25.5B |\n| Cloud | Other | $15.4B |\n"
+            ))
+
+    def test_read_docx_malformed(self):
+        import docx
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "segments.docx")
+            document = docx.Document()
+            table = document.add_table(rows=1, cols=2)
+            table.cell(0, 0).merge(table.cell(0, 1))
+            document.save(path)
+
+            # A malformed attribute, read by unstructured instead
+            with zipfile.ZipFile(path) as archive:
+                parts = {name: archive.read(name) for name in archive.namelist()}
+            parts["word/document.xml"] = parts["word/document.xml"].replace(
+                b'<w:gridSpan w:val="2"/>', b'<w:gridSpan w:val="x"/>'
+            )
+            with zipfile.ZipFile(path, "w") as archive:
+                for name, data in parts.items():
+                    archive.writestr(name, data)
+
+            with self.assertLogs(level="INFO") as logs:
+                try:
+                    DocumentReader.read_docx(path)
+                except ImportError:
+                    pass    # unstructured is not installed
+            self.assertIn("with unstructured: ValueError", logs.output[0])
+
     def test_read_docx(self):
         input_file = Path(self.TEST_DIR) / "test_word.docx"
         md_text = DocumentReader.read(str(input_file))
@@ -67,6 +213,212 @@ class DocumentReaderTest(unittest.TestCase):
 
         self.assertGreater(len(md_text), 0)
 
+    def test_read_many(self):
+        with tempfile.TemporaryDirectory() as directory:
+            paths = []
+            for i in range(6):
+                paths.append(os.path.join(directory, f"doc{i}.md"))
+                Path(paths[-1]).write_text(f"# Document {i}")
+            paths.insert(3, os.path.join(directory, "missing.txt"))
+            paths.insert(5, os.path.join(directory, "unsupported.xyz"))
+
+            results = list(DocumentReader.read_many(paths, workers=4))
+            self.assertEqual([r.path for r in results], paths)
+            self.assertEqual([r.ok for r in results], [True, True, True, False, True, False, True, True])
+            self.assertEqual(results[0].text, "# Document 0")
+            self.assertIn("FileNotFoundError", results[3].error)
+
+            unordered = list(DocumentReader.read_many(paths, workers=4, ordered=False))
+            self.assertEqual(sorted(r.path for r in unordered), sorted(paths))
+
+    def test_conversion_cache(self):
+        input_file = f"{self.TEST_DIR}/test_document.pdf"
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ConversionCache(directory)
+            md_text = DocumentReader.read(input_file, conversion_cache=cache)
+            self.assertEqual(DocumentReader.read(input_file, conversion_cache=cache), md_text)
+            self.assertEqual(cache.stats()["hits"], 1)
+
+    def test_lazy_imports(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "notes.txt")
+            Path(path).write_text("Revenue up 10%")
+
+            script = f"""
+import sys
+from util.DocumentReader import DocumentReader
+assert DocumentReader.read({path!r}) == "Revenue up 10%"
+print(",".join(m for m in ["pymupdf4llm", "pptx2md", "unstructured", "html2text", "pandas"] if m in sys.modules))
+"""
+            result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, env={
+                **os.environ, "PYTHONPATH": os.pathsep.join(sys.path)
+            })
+            self.assertEqual(result.returncode, 0, result.stderr)
+            self.assertEqual(result.stdout.strip(), "")
+
+    def test_sniff(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "report")
+            shutil.copy(f"{self.TEST_DIR}/test_document.pdf", path)
+            self.assertEqual(DocumentReader.sniff(path), ".pdf")
+            self.assertGreater(len(DocumentReader.read(path)), 0)
+
+            path = os.path.join(directory, "README")
+            Path(path).write_text("營收成長")
+            self.assertEqual(DocumentReader.sniff(path), ".txt")
+
+            path = os.path.join(directory, "blob.bin")
+            Path(path).write_bytes(b"\x00\x01\x02")
+            with self.assertRaises(ValueError):
+                DocumentReader.read(path)
+
+    def test_register(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "digest.ecd")
+            Path(path).write_bytes(b"ECD\x00\x01")
+            unnamed = os.path.join(directory, "digest")
+            shutil.copy(path, unnamed)
+
+            with self.assertRaises(ValueError):
+                DocumentReader.read(path)
+
+            # Imported on first use
+            DocumentReader.register([".ecd"], "os.path:basename", signature=b"ECD\x00")
+            self.assertEqual(DocumentReader.read(path), "digest.ecd")
+            self.assertEqual(DocumentReader.read(unnamed), "digest")
+
+            # Cached by the reader and the version of its output, not only by the converter package
+            cache = ConversionCache(os.path.join(directory, "cache"))
+            DocumentReader.register([".ecd"], "os.path:basename", converter="pandas")
+            self.assertEqual(DocumentReader.reader_of(path).identity, "os.path:basename@1")
+            self.assertEqual(DocumentReader.read(path, conversion_cache=cache), "digest.ecd")
+            DocumentReader.register([".ecd"], "os.path:dirname", converter="pandas")
+            self.assertEqual(DocumentReader.read(path, conversion_cache=cache), directory)
+            DocumentReader.register([".ecd"], "os.path:basename", converter="pandas", version=2)
+            self.assertEqual(DocumentReader.read(path, conversion_cache=cache), "digest.ecd")
+            self.assertEqual(cache.stats()["hits"], 0)
+
+    def test_read_xlsx_blocks(self):
+        from openpyxl import Workbook
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "model.xlsx")
+            workbook = Workbook(write_only=True)
+            revenue = workbook.create_sheet("Revenue")
+            revenue.append(["Quarter", "Segment", "Revenue"])
+            for i in range(2500):
+                revenue.append([f"Q{i % 4 + 1}", "Cloud | AI" if i % 2 else "Devices", 1000.0 + i])
+            notes = workbook.create_sheet("Notes")
+            notes.append(["Note"])
+            notes.append([None])
+            notes.append(["Line one\nline two"])
+            notes.append(["Restated", "See FY2Q25"])
+            workbook.save(path)
+
+            blocks = list(DocumentReader.read_xlsx_blocks(path))
+            self.assertEqual([(b.sheet, b.first_row) for b in blocks], [
+                ("Revenue", 2), ("Revenue", 1002), ("Revenue", 2002), ("Notes", 3)
+            ])
+            self.assertTrue(blocks[1].text.startswith("| Quarter | Segment | Revenue |\n|---|---|---|\n| Q1 | Devices | 2000 |"))
+            self.assertIn("| Q2 | Cloud \\| AI | 1001 |", blocks[0].text)
+            self.assertIn("| Line one<br>line two |", blocks[3].text)
+
+            blocks = list(DocumentReader.read_xlsx_blocks(path, sheets=[1, "Revenue"], max_rows=10, block_rows=None))
+            self.assertEqual([b.sheet for b in blocks], ["Notes", "Revenue"])
+            self.assertEqual(blocks[1].text.count("\n"), 12)
+            with self.assertRaises(ValueError):
+                list(DocumentReader.read_xlsx_blocks(path, sheets="Costs"))
+
+            # Rows longer than the header widen the table
+            md_text = DocumentReader.read(path, sheets="Notes")
+            self.assertEqual(
+                md_text, "| Note |  |\n|---|---|\n| Line one<br>line two |  |\n| Restated | See FY2Q25 |\n"
+            )
+            self.assertIn("\nNotes:\n| Note |", DocumentReader.read(path))
+
+            # Options of pandas.read_excel() are still read by pandas, and unknown options are errors
+            md_text = DocumentReader.read(path, sheets="Revenue", max_rows=2, usecols="A:B")
+            self.assertEqual(md_text.split("\n")[0].split(), ["|", "Quarter", "|", "Segment", "|"])
+            self.assertEqual(md_text.count("Devices"), 1)
+            with self.assertRaises(TypeError):
+                list(DocumentReader.read_xlsx_blocks(path, usecols="A:B"))
+
+    def test_read_xlsx_named_xls(self):
+        from openpyxl import Workbook
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "model.xls")
+            workbook = Workbook()
+            workbook.active.append(["Quarter", "Revenue"])
+            workbook.active.append(["FY2Q25", 69632])
+            workbook.save(path)
+
+            # Streamed by openpyxl, not loaded by pandas with xlrd
+            blocks = list(DocumentReader.read_xlsx_blocks(path))
+            self.assertEqual(blocks[0].text, "| Quarter | Revenue |\n|---|---|\n| FY2Q25 | 69632 |\n")
+
+    @unittest.skipUnless(importlib.util.find_spec("xlrd"), "xlrd is not installed")
+    def test_read_xls_without_suffix(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "workbook")
+            shutil.copy(Path(self.TEST_DIR) / "test_workbook.xls", path)
+
+            blocks = list(DocumentReader.read_xlsx_blocks(path))
+            self.assertEqual([b.sheet for b in blocks], ["Revenue"])
+            self.assertEqual(
+                blocks[0].text, "| Quarter | Revenue |\n|---|---|\n| FY2Q25 | 69632 |\n| FY1Q25 | 65585 |\n"
+            )
+            self.assertEqual(DocumentReader.read(path), blocks[0].text)
+
+    def test_read_content(self):
+        import docx
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "report.docx")
+            document = docx.Document()
+            document.add_heading("Revenue", 1)
+            document.add_paragraph("Revenue was $69.6 billion.")
+            document.save(path)
+
+            md_text = DocumentReader.read(path)
+            content = Path(path).read_bytes()
+            self.assertEqual(DocumentReader.read(content), md_text)
+            self.assertEqual(DocumentReader.read(memoryview(content)), md_text)
+            self.assertEqual(DocumentReader.read(content, file_type="docx"), md_text)
+            with open(path, "rb") as fd:
+                self.assertEqual(DocumentReader.read(fd), md_text)
+
+            # Streams that cannot seek
+            r, w = os.pipe()
+            os.write(w, content)
+            os.close(w)
+            with os.fdopen(r, "rb") as fd:
+                self.assertEqual(DocumentReader.read(fd), md_text)
+
+            pdf = f"{self.TEST_DIR}/test_document.pdf"
+            self.assertEqual(DocumentReader.read(io.BytesIO(Path(pdf).read_bytes())), DocumentReader.read(pdf))
+            self.assertEqual(DocumentReader.read(b"Revenue up 10%", file_type=".md"), "Revenue up 10%")
+
+            # Buffers read from are not held after reading, even by the traceback of a failed read
+            fd = io.BytesIO(Path(pdf).read_bytes())
+            DocumentReader.read(fd)
+            fd.close()
+            fd = io.BytesIO(b"%PDF-1.7 truncated")
+            try:
+                DocumentReader.read(fd)
+                self.fail("Read a truncated PDF")
+            except Exception:
+                fd.close()
+
+            with self.assertRaises(ValueError):
+                DocumentReader.read(b"\x00\x01\x02")
+
+            cache = ConversionCache(os.path.join(directory, "cache"))
+            fd = io.BytesIO(content)
+            self.assertEqual(DocumentReader.read(fd, conversion_cache=cache), md_text)
+            self.assertEqual(DocumentReader.read(content, conversion_cache=cache), md_text)
+            self.assertEqual(cache.stats()["hits"], 1)
+
 
 if __name__ == '__main__':
     unittest.main()